@@ -0,0 +1,393 @@
+"""
+Benchmarks for the forest trees.
+@author: Lia Nemeth
+
+Measures insert, search, remove, traversals and pickling for every tree
+type, across tree sizes and key distributions, and reports ops/sec, peak
+memory and tree height. Results can be saved as a baseline and compared
+against later runs:
+
+    python benchmarks/bench.py --sizes 1e3 1e4 --save-baseline base.json
+    python benchmarks/bench.py --sizes 1e3 1e4 --baseline base.json
+
+Key distributions:
+    sorted - keys are inserted and looked up in increasing order
+    random - keys are inserted in random order and looked up uniformly
+    zipf   - keys are inserted in random order and looked up following a
+             Zipf law, a few hot keys get most of the lookups
+"""
+
+import argparse
+import gc
+import json
+import os
+import pickle
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from forest.BinaryTree import (BinaryTree, BinarySearchTree, RedBlackTree,
+                               AVLTree, Treap, SplayTree)
+from forest.NaryTree import NaryTree
+from forest.BTree import BTree
+from forest.ArrayTree import ArrayRedBlackTree
+
+DISTRIBUTIONS = ['sorted', 'random', 'zipf']
+SEARCH_TREES = {
+    'BinarySearchTree': BinarySearchTree,
+    'RedBlackTree': RedBlackTree,
+    'AVLTree': AVLTree,
+    'Treap': Treap,
+    'SplayTree': SplayTree,
+    'BTree': BTree,
+    'ArrayRedBlackTree': ArrayRedBlackTree,
+}
+TREES = ['BinaryTree'] + list(SEARCH_TREES) + ['NaryTree']
+# an unbalanced tree fed sorted keys becomes a list, inserting gets O(n^2)
+DEGENERATE_LIMIT = 20000
+NARY_FANOUT = 8
+# each measure keeps the best of REPEAT runs, set by --repeat
+REPEAT = 3
+ZIPF_EXPONENT = 1.1
+
+
+def lookup_keys(size, distribution, count, seed):
+    """
+    The keys looked up by the search benchmark
+    """
+    rng = random.Random(seed)
+    if distribution == 'sorted':
+        return [i % size for i in range(count)]
+    if distribution == 'random':
+        return [rng.randrange(size) for _ in range(count)]
+    # the key of rank r is picked with probability ~ 1 / r ** s
+    weights = []
+    total = 0.0
+    for rank in range(1, size + 1):
+        total += 1.0 / rank ** ZIPF_EXPONENT
+        weights.append(total)
+    ranks = list(range(size))
+    rng.shuffle(ranks)
+    return rng.choices(ranks, cum_weights=weights, k=count)
+
+
+def insert_keys(size, distribution, seed):
+    keys = list(range(size))
+    if distribution != 'sorted':
+        random.Random(seed).shuffle(keys)
+    return keys
+
+
+def height(tree):
+    """
+    Iterative height, it works on degenerate trees too
+    """
+    if isinstance(tree, (BTree, ArrayRedBlackTree)):
+        return tree.get_height()
+    if isinstance(tree, BinarySearchTree) and tree.is_empty():
+        return 0
+    levels = 0
+    level = [tree]
+    while level:
+        levels += 1
+        if isinstance(tree, NaryTree):
+            level = [child for node in level for child in node.children]
+        else:
+            level = [child for node in level
+                     for child in (node.left, node.right) if child is not None]
+    return levels
+
+
+def timed(function, count, setup=None):
+    """
+    Runs function REPEAT times, returns the best ops/sec for count
+    operations. If setup is given, its result is passed to function and
+    the time it takes is not counted.
+    """
+    best = None
+    for _ in range(REPEAT):
+        arg = setup() if setup else None
+        gc.collect()
+        start = time.perf_counter()
+        if setup:
+            function(arg)
+        else:
+            function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return count / best if best > 0 else float('inf')
+
+
+def peak_memory(build):
+    """
+    Peak traced memory in bytes while build runs
+    """
+    gc.collect()
+    tracemalloc.start()
+    tree = build()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del tree
+    return peak
+
+
+def build_search_tree(cls, keys):
+    tree = cls()
+    for key in keys:
+        tree[key] = key
+    return tree
+
+
+def build_binary_tree(size):
+    """
+    A complete BinaryTree with keys in level order, built bottom up
+    """
+    nodes = [BinaryTree(key=i, item=i) for i in range(size)]
+    for i in range(size - 1, 0, -1):
+        parent = nodes[(i - 1) // 2]
+        if i % 2:
+            parent.left = nodes[i]
+        else:
+            parent.right = nodes[i]
+    return nodes[0]
+
+
+def build_nary_tree(size):
+    """
+    An NaryTree where every node has NARY_FANOUT children, in level order
+    """
+    root = NaryTree(key=0, item=0)
+    level = [root]
+    key = 1
+    while key < size:
+        children = []
+        for node in level:
+            for _ in range(NARY_FANOUT):
+                if key == size:
+                    break
+                children.append(node.add_child(key=key, item=key))
+                key += 1
+        level = children
+    return root
+
+
+def measure_pickle(tree, size, results):
+    """
+    Pickling throughput, in nodes per second
+    """
+    try:
+        data = []
+        results['pickle.dumps'] = timed(
+            lambda: data.append(pickle.dumps(tree, pickle.HIGHEST_PROTOCOL)),
+            size)
+        results['pickle.loads'] = timed(lambda: pickle.loads(data[0]), size)
+    except RecursionError:
+        results['pickle.dumps'] = 'RecursionError'
+
+
+def bench_search_tree(name, size, distribution, memory, seed):
+    cls = SEARCH_TREES[name]
+    results = {}
+    if (cls is BinarySearchTree and distribution == 'sorted' and
+            size > DEGENERATE_LIMIT):
+        return {'skipped': 'degenerate'}
+    keys = insert_keys(size, distribution, seed)
+    queries = lookup_keys(size, distribution, min(size, 100000), seed)
+    trees = []
+    results['insert'] = timed(
+        lambda: trees.append(build_search_tree(cls, keys)), size)
+    tree = trees[-1]
+    del trees[:]
+    results['height'] = height(tree)
+    if memory:
+        results['peak_memory'] = peak_memory(
+            lambda: build_search_tree(cls, keys))
+    search = tree.search
+    results['search'] = timed(lambda: [search(key) for key in queries],
+                              len(queries))
+    if hasattr(tree, 'finger_search'):
+        finger_search = tree.finger_search
+        results['finger_search'] = timed(
+            lambda: [finger_search(key) for key in queries], len(queries))
+    if hasattr(tree, 'search_many'):
+        results['search_many'] = timed(lambda: tree.search_many(queries),
+                                       len(queries))
+    results['in_order'] = timed(lambda: [node for node in tree], size)
+    if hasattr(tree, 'iter_pre_order'):
+        results['pre_order'] = timed(
+            lambda: [node for node in tree.iter_pre_order()], size)
+        results['post_order'] = timed(
+            lambda: [node for node in tree.iter_post_order()], size)
+        results['level_order'] = timed(
+            lambda: [node for node in tree.iter_level_order()], size)
+    measure_pickle(tree, size, results)
+    removed = insert_keys(size, distribution, seed + 1)[:size // 2]
+
+    def remove(tree):
+        for key in removed:
+            del tree[key]
+    results['remove'] = timed(remove, len(removed),
+                              setup=lambda: build_search_tree(cls, keys))
+    return results
+
+
+def bench_traversals(tree, size, results, seed):
+    results['height'] = height(tree)
+    results['pre_order'] = timed(
+        lambda: [node for node in tree.iter_pre_order()], size)
+    results['post_order'] = timed(
+        lambda: [node for node in tree.iter_post_order()], size)
+    results['level_order'] = timed(
+        lambda: [node for node in tree.iter_level_order()], size)
+    targets = [random.Random(seed).randrange(size) for _ in range(10)]
+    if isinstance(tree, NaryTree):
+        results['traversal'] = timed(tree.traversal, size)
+    else:
+        results['in_order'] = timed(
+            lambda: [node for node in tree.iter_in_order()], size)
+    results['breadth_first_search'] = timed(
+        lambda: [tree.breadth_first_search(key) for key in targets],
+        len(targets))
+    measure_pickle(tree, size, results)
+
+
+def bench_binary_tree(size, distribution, memory, seed):
+    # the shape of a BinaryTree doesn't depend on the keys
+    if distribution != 'random':
+        return {'skipped': 'distribution'}
+    results = {}
+    trees = []
+    results['build'] = timed(lambda: trees.append(build_binary_tree(size)),
+                             size)
+    del trees[1:]
+    if memory:
+        results['peak_memory'] = peak_memory(lambda: build_binary_tree(size))
+    bench_traversals(trees[0], size, results, seed)
+    return results
+
+
+def bench_nary_tree(size, distribution, memory, seed):
+    if distribution != 'random':
+        return {'skipped': 'distribution'}
+    results = {}
+    trees = []
+    results['add_child'] = timed(lambda: trees.append(build_nary_tree(size)),
+                                 size)
+    del trees[1:]
+    if memory:
+        results['peak_memory'] = peak_memory(lambda: build_nary_tree(size))
+    bench_traversals(trees[0], size, results, seed)
+    return results
+
+
+def run(trees, sizes, distributions, memory, seed):
+    """
+    Returns {"tree/distribution/size": {operation: value}}
+    """
+    report = {}
+    for size in sizes:
+        for name in trees:
+            for distribution in distributions:
+                if name == 'BinaryTree':
+                    results = bench_binary_tree(size, distribution, memory,
+                                                seed)
+                elif name == 'NaryTree':
+                    results = bench_nary_tree(size, distribution, memory,
+                                              seed)
+                else:
+                    results = bench_search_tree(name, size, distribution,
+                                                memory, seed)
+                if 'skipped' in results and results['skipped'] != 'degenerate':
+                    continue
+                label = '{0}/{1}/{2}'.format(name, distribution, size)
+                report[label] = results
+                print_results(label, results)
+    return report
+
+
+def format_value(operation, value):
+    if isinstance(value, str):
+        return value
+    if operation == 'peak_memory':
+        if value < 2 ** 20:
+            return '{0:.1f} KiB'.format(value / 2.0 ** 10)
+        return '{0:.1f} MiB'.format(value / 2.0 ** 20)
+    if operation == 'height':
+        return str(value)
+    return '{0:,.0f} ops/s'.format(value)
+
+
+def print_results(label, results):
+    print(label)
+    for operation, value in results.items():
+        print('    {0:<22}{1}'.format(operation,
+                                      format_value(operation, value)))
+    sys.stdout.flush()
+
+
+def compare(report, baseline, threshold):
+    """
+    Prints the throughput changes against a baseline report.
+    Returns the number of regressions worse than threshold.
+    """
+    regressions = 0
+    print('\ncompared to baseline (threshold {0:.0%})'.format(threshold))
+    for label, results in sorted(report.items()):
+        for operation, value in results.items():
+            old = baseline.get(label, {}).get(operation)
+            if (operation in ('height', 'peak_memory') or
+                    not isinstance(value, float) or
+                    not isinstance(old, float)):
+                continue
+            change = value / old - 1
+            flag = ''
+            if change < -threshold:
+                flag = '  REGRESSION'
+                regressions += 1
+            print('    {0:<40}{1:<22}{2:+.1%}{3}'.format(label, operation,
+                                                        change, flag))
+    return regressions
+
+
+def main(argv=None):
+    global REPEAT
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', nargs='+', default=['1e3', '1e4', '1e5'],
+                        help='tree sizes, up to 1e7 (default 1e3 1e4 1e5)')
+    parser.add_argument('--trees', nargs='+', default=TREES, choices=TREES)
+    parser.add_argument('--distributions', nargs='+', default=DISTRIBUTIONS,
+                        choices=DISTRIBUTIONS)
+    parser.add_argument('--no-memory', action='store_true',
+                        help='skip the peak memory measurement')
+    parser.add_argument('--repeat', type=int, default=REPEAT,
+                        help='runs per measure, the best one is kept (3)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the results as JSON')
+    parser.add_argument('--baseline', help='compare against a JSON baseline')
+    parser.add_argument('--save-baseline', help='write the results as the '
+                                                'new baseline')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='slowdown reported as a regression (0.2)')
+    args = parser.parse_args(argv)
+    REPEAT = args.repeat
+    sizes = [int(float(size)) for size in args.sizes]
+    report = run(args.trees, sizes, args.distributions, not args.no_memory,
+                 args.seed)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""
+Aggregate Tree, a Red Black Tree augmented with subtree aggregates
+@author: Lia Nemeth
+"""
+
+import operator
+from forest.BinaryTree import RedBlackTree
+
+
+def _item(node):
+    return node.item
+
+
+class AggregateTree(RedBlackTree):
+    """
+    A Red Black Tree where every node keeps summary, the combined value of
+    its subtree in key order (en.wikipedia.org/wiki/Segment_tree has the
+    same idea over an array). A range is covered by O(log n) nodes and
+    subtrees, so aggregate(lo, hi) is O(log n) however many keys it spans.
+    summary is maintained by update_metadata, so the rotations, the
+    repairs and removals keep it right.
+    Subclasses pick the aggregate with three class attributes:
+        combine - an associative function of two summaries
+        identity - the aggregate of an empty range
+        value - the value of a single node, its item by default
+    SumTree, MinTree and MaxTree are ready made, aggregate_tree builds
+    others. Change items with update_item, a direct assignment leaves the
+    summaries above the node stale.
+    """
+    combine = staticmethod(operator.add)
+    identity = 0
+    value = staticmethod(_item)
+
+    def __init__(self, key=None, item=None, left=None, right=None,
+                 black=True):
+        self.summary = self.identity
+        super(AggregateTree, self).__init__(key=key, item=item, left=left,
+                                            right=right, black=black)
+        if key is not None and left is None and right is None:
+            # insert_many defers update_metadata, a new node needs its
+            # summary before the rotations combine it
+            self.summary = self.value(self)
+
+    def update_metadata(self):
+        changed = super(AggregateTree, self).update_metadata()
+        if self.key is None and self.is_leaf():
+            summary = self.identity
+        else:
+            summary = self.value(self)
+            if self._left is not None:
+                summary = self.combine(self._left.summary, summary)
+            if self._right is not None:
+                summary = self.combine(summary, self._right.summary)
+        if summary != self.summary:
+            self.summary = summary
+            changed = True
+        return changed
+
+    def _insert(self, key, item):
+        empty = self.is_empty()
+        super(AggregateTree, self)._insert(key, item)
+        if empty:
+            # the key was set on the root, not through a child link
+            self.update_metadata()
+
+    def update_item(self, key, item):
+        """
+        Sets the item of the node with key, inserting it if it is missing,
+        and updates the summaries above it, in O(log n)
+        Returns:
+            the node
+        """
+        node = self.search(key)
+        if node is None:
+            return self.insert(key, item)
+        node.item = item
+        node.propagate_metadata()
+        return node
+
+    def aggregate(self, lo=None, hi=None):
+        """
+        Combines the values of the nodes with lo <= key < hi, in key order
+        and in O(log n): the nodes on the paths to lo and hi are combined
+        with the summaries of the subtrees between the two paths.
+        Args:
+            lo - *optional* the lower bound, included
+            hi - *optional* the upper bound, excluded
+        Returns:
+            the aggregate, identity for an empty range
+        """
+        combine = self.combine
+        # the node where the paths to lo and hi part
+        tree = None if self.is_empty() else self
+        while tree is not None:
+            if lo is not None and tree.key < lo:
+                tree = tree.right
+            elif hi is not None and not tree.key < hi:
+                tree = tree.left
+            else:
+                break
+        if tree is None:
+            return self.identity
+        result = self.value(tree)
+        # down the left subtree: a node above lo comes with its right
+        # subtree, and both go before what was found above them
+        node = tree.left
+        if lo is None:
+            if node is not None:
+                result = combine(node.summary, result)
+        else:
+            while node is not None:
+                if node.key < lo:
+                    node = node.right
+                    continue
+                part = self.value(node)
+                if node.right is not None:
+                    part = combine(part, node.right.summary)
+                result = combine(part, result)
+                node = node.left
+        # down the right subtree, the other way around
+        node = tree.right
+        if hi is None:
+            if node is not None:
+                result = combine(result, node.summary)
+        else:
+            while node is not None:
+                if not node.key < hi:
+                    node = node.left
+                    continue
+                if node.left is not None:
+                    result = combine(result, node.left.summary)
+                result = combine(result, self.value(node))
+                node = node.right
+        return result
+
+
+def aggregate_tree(combine, identity=None, value=None, name='AggregateTree'):
+    """
+    Returns an AggregateTree subclass for another aggregate. Pickling needs
+    the class at module level: subclass AggregateTree there instead.
+    Args:
+        combine - an associative function of two summaries
+        identity - *optional* the aggregate of an empty range
+        value - *optional* the value of a node, its item by default
+    """
+    attributes = {'combine': staticmethod(combine), 'identity': identity}
+    if value is not None:
+        attributes['value'] = staticmethod(value)
+    return type(name, (AggregateTree,), attributes)
+
+
+class SumTree(AggregateTree):
+    """
+    Range sums of the items
+    """
+
+
+class MinTree(AggregateTree):
+    """
+    Range minimums of the items, None for an empty range
+    """
+    combine = staticmethod(min)
+    identity = None
+
+
+class MaxTree(AggregateTree):
+    """
+    Range maximums of the items, None for an empty range
+    """
+    combine = staticmethod(max)
+    identity = None
@@ -0,0 +1,592 @@
+"""
+Array backed Binary Search Tree implementations.
+Nodes are not Python objects: keys, items, links and colors live in
+parallel columns and a node is just an index into them.
+@author: Lia Nemeth
+"""
+
+from array import array
+from operator import itemgetter
+
+# index of the sentinel slot, it plays the role of None
+NIL = 0
+
+
+class ArrayNode(object):
+    """
+    A lightweight view over one slot of an array backed tree.
+    Views are only created when a caller asks for a node, and they become
+    meaningless once their node is removed from the tree.
+    """
+    __slots__ = ('tree', 'index')
+
+    def __init__(self, tree, index):
+        self.tree = tree
+        self.index = index
+
+    def _view(self, index):
+        if index != NIL:
+            return ArrayNode(self.tree, index)
+
+    @property
+    def key(self):
+        return self.tree._keys[self.index]
+
+    @property
+    def item(self):
+        return self.tree._items[self.index]
+
+    @item.setter
+    def item(self, val):
+        self.tree._items[self.index] = val
+
+    @property
+    def left(self):
+        return self._view(self.tree._left[self.index])
+
+    @property
+    def right(self):
+        return self._view(self.tree._right[self.index])
+
+    @property
+    def parent(self):
+        return self._view(self.tree._parent[self.index])
+
+    @property
+    def black(self):
+        return bool(self.tree._black[self.index])
+
+    def is_leaf(self):
+        return (self.tree._left[self.index] == NIL and
+                self.tree._right[self.index] == NIL)
+
+    def __eq__(self, other):
+        return (isinstance(other, ArrayNode) and self.tree is other.tree and
+                self.index == other.index)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((id(self.tree), self.index))
+
+    def __str__(self):
+        return '<{type} - {key} : {item}>'.format(type=type(self).__name__,
+                                                   key=self.key,
+                                                   item=self.item)
+
+
+class ArrayBinarySearchTree(object):
+    """
+    A Binary Search Tree that stores its nodes in parallel columns:
+    keys and items in lists (or a typed array for numeric keys) and the
+    child and parent links in typed arrays of indexes.
+    Slot 0 is the NIL sentinel, freed slots are recycled by later inserts.
+    This implementation doesn't take care of any balancing of the  tree.
+    """
+    def __init__(self, key=None, item=None, key_typecode=None):
+        """
+        Constructor method
+        Args:
+            key - *optional* The key of the first node
+            item - *optional* The item of the first node
+            key_typecode - *optional* An array module typecode ('q', 'd'...)
+                           to store numeric keys unboxed
+        """
+        if key_typecode:
+            self._keys = array(key_typecode, [0])
+        else:
+            self._keys = [None]
+        self._items = [None]
+        self._left = array('q', [NIL])
+        self._right = array('q', [NIL])
+        self._parent = array('q', [NIL])
+        self._free = []
+        self._root = NIL
+        self._size = 0
+        if key is not None:
+            self.insert(key, item)
+
+    @classmethod
+    def from_sorted(cls, items, key_typecode=None):
+        """
+        Builds a balanced tree in O(n), filling the columns directly.
+        Args:
+            items - an iterable of (key, item) pairs sorted by key
+            key_typecode - *optional* see the constructor
+        """
+        tree = cls(key_typecode=key_typecode)
+        items = list(items)
+        size = len(items)
+        if not size:
+            return tree
+        # slot i + 1 holds items[i], so slots are in key order
+        tree._keys.extend(key for key, _ in items)
+        tree._items.extend(item for _, item in items)
+        tree._grow(size)
+        tree._size = size
+        left = tree._left
+        right = tree._right
+        parent = tree._parent
+        height = size.bit_length()
+        stack = [(0, size, NIL, 1)]
+        while stack:
+            lo, hi, father, depth = stack.pop()
+            mid = (lo + hi) // 2
+            index = mid + 1
+            parent[index] = father
+            if father == NIL:
+                tree._root = index
+            elif index < father:
+                left[father] = index
+            else:
+                right[father] = index
+            tree._bulk_node(index, depth, height)
+            if lo < mid:
+                stack.append((lo, mid, index, depth + 1))
+            if mid + 1 < hi:
+                stack.append((mid + 1, hi, index, depth + 1))
+        return tree
+
+    @classmethod
+    def from_items(cls, items, key_typecode=None):
+        """
+        Builds a balanced tree in O(n log n) from unsorted (key, item) pairs
+        """
+        return cls.from_sorted(sorted(items, key=itemgetter(0)),
+                               key_typecode=key_typecode)
+
+    def _grow(self, size):
+        """
+        Appends size empty slots to the link columns
+        """
+        empty = array('q', [NIL]) * size
+        self._left.extend(empty)
+        self._right.extend(empty)
+        self._parent.extend(empty)
+
+    def _bulk_node(self, index, depth, height):
+        """
+        Called for each slot of a bulk loaded tree
+        Args:
+            depth - the node depth, the root has depth 1
+            height - the height of the tree being built
+        """
+        pass
+
+    def __len__(self):
+        return self._size
+
+    def __str__(self):
+        return '<{type} - {size} nodes>'.format(type=type(self).__name__,
+                                                size=self._size)
+
+    @property
+    def root(self):
+        """
+        A view of the root node, or None if the tree is empty
+        """
+        if self._root != NIL:
+            return ArrayNode(self, self._root)
+
+    def node(self, index):
+        """
+        Returns a view of the node stored in the slot index
+        """
+        return ArrayNode(self, index)
+
+    def _allocate(self, key, item, parent):
+        """
+        Stores a new node, reusing a freed slot if there is one.
+        Returns the slot index.
+        """
+        if self._free:
+            index = self._free.pop()
+            self._keys[index] = key
+            self._items[index] = item
+            self._left[index] = NIL
+            self._right[index] = NIL
+            self._parent[index] = parent
+        else:
+            index = len(self._items)
+            self._keys.append(key)
+            self._items.append(item)
+            self._left.append(NIL)
+            self._right.append(NIL)
+            self._parent.append(parent)
+        self._size += 1
+        return index
+
+    def _release(self, index):
+        """
+        Drops the references held by a slot and marks it as free
+        """
+        self._keys[index] = self._keys[NIL]
+        self._items[index] = None
+        self._free.append(index)
+        self._size -= 1
+
+    def _find(self, key):
+        keys = self._keys
+        left = self._left
+        right = self._right
+        index = self._root
+        while index != NIL:
+            node_key = keys[index]
+            if key == node_key:
+                return index
+            elif key < node_key:
+                index = left[index]
+            else:
+                index = right[index]
+        return NIL
+
+    def _minimum(self, index):
+        left = self._left
+        while left[index] != NIL:
+            index = left[index]
+        return index
+
+    def search(self, key):
+        """
+        Classic search algorithm on BST
+        Args:
+          key - The key for the node that is being searched
+        Returns:
+            A view of the node, or None if the key is not in the tree
+        """
+        index = self._find(key)
+        if index != NIL:
+            return ArrayNode(self, index)
+
+    def __getitem__(self, key):
+        return self.search(key)
+
+    def __contains__(self, key):
+        return self._find(key) != NIL
+
+    def _insert(self, key, item):
+        """
+        Plain BST insert, returns the slot index of the new node
+        """
+        keys = self._keys
+        parent = NIL
+        index = self._root
+        while index != NIL:
+            parent = index
+            if key < keys[index]:
+                index = self._left[index]
+            else:
+                index = self._right[index]
+        new = self._allocate(key, item, parent)
+        if parent == NIL:
+            self._root = new
+        elif key < keys[parent]:
+            self._left[parent] = new
+        else:
+            self._right[parent] = new
+        return new
+
+    def insert(self, key, item):
+        """
+        Insert a new item in the BST
+        Args:
+            key - the item key
+            item - the item value
+        Returns:
+            A view of the new node
+        """
+        return ArrayNode(self, self._insert(key, item))
+
+    def __setitem__(self, key, val):
+        self.insert(key, val)
+
+    def __delitem__(self, key):
+        self.remove(key)
+
+    def _transplant(self, old, new):
+        """
+        Replaces the subtree rooted at old by the subtree rooted at new
+        """
+        parent = self._parent[old]
+        if parent == NIL:
+            self._root = new
+        elif old == self._left[parent]:
+            self._left[parent] = new
+        else:
+            self._right[parent] = new
+        self._parent[new] = parent
+
+    def remove(self, key):
+        """
+        Remove an item of the tree.
+        Raises KeyError if the key is not in the tree.
+        """
+        index = self._find(key)
+        if index == NIL:
+            raise KeyError(key)
+        left = self._left
+        right = self._right
+        parent = self._parent
+        if left[index] == NIL:
+            self._transplant(index, right[index])
+        elif right[index] == NIL:
+            self._transplant(index, left[index])
+        else:
+            successor = self._minimum(right[index])
+            if parent[successor] != index:
+                self._transplant(successor, right[successor])
+                right[successor] = right[index]
+                parent[right[successor]] = successor
+            self._transplant(index, successor)
+            left[successor] = left[index]
+            parent[left[successor]] = successor
+        parent[NIL] = NIL
+        self._release(index)
+
+    def _in_order_indexes(self):
+        left = self._left
+        right = self._right
+        stack = []
+        index = self._root
+        while index != NIL or stack:
+            if index != NIL:
+                stack.append(index)
+                index = left[index]
+            else:
+                index = stack.pop()
+                yield index
+                index = right[index]
+
+    def __iter__(self):
+        """
+        Default iterator returns a generator in order traversal of node views
+        """
+        for index in self._in_order_indexes():
+            yield ArrayNode(self, index)
+
+    def in_order(self, visit=None, *args, **kwargs):
+        """
+        In-order traversal.
+        Args:
+            visit - *optional* A callable object
+            *args - Will be passed to visit
+            **kwargs -  Will be passed to visit
+        Returns:
+            a list containing views of all nodes in order
+        """
+        l = []
+        for node in self:
+            if visit:
+                visit(node, *args, **kwargs)
+            l.append(node)
+        return l
+
+    def keys(self):
+        keys = self._keys
+        return [keys[index] for index in self._in_order_indexes()]
+
+    def get_height(self):
+        """
+        Iterative get Height method, an empty tree has height 0
+        """
+        left = self._left
+        right = self._right
+        height = 0
+        stack = [(self._root, 1)] if self._root != NIL else []
+        while stack:
+            index, depth = stack.pop()
+            if depth > height:
+                height = depth
+            if left[index] != NIL:
+                stack.append((left[index], depth + 1))
+            if right[index] != NIL:
+                stack.append((right[index], depth + 1))
+        return height
+
+
+class ArrayRedBlackTree(ArrayBinarySearchTree):
+    """
+    A Red Black Tree stored in parallel columns, colors are kept in a
+    byte array (1 for black, 0 for red). The NIL sentinel is black.
+    """
+    def __init__(self, key=None, item=None, key_typecode=None):
+        self._black = array('b', [1])
+        super(ArrayRedBlackTree, self).__init__(key=key, item=item,
+                                                key_typecode=key_typecode)
+
+    def _grow(self, size):
+        super(ArrayRedBlackTree, self)._grow(size)
+        self._black.extend(array('b', [0]) * size)
+
+    def _bulk_node(self, index, depth, height):
+        # all the leaves of a bulk loaded tree are on the last two levels,
+        # painting the last level red keeps the black height even
+        self._black[index] = depth < height or depth == 1
+
+    def _allocate(self, key, item, parent):
+        index = super(ArrayRedBlackTree, self)._allocate(key, item, parent)
+        # new nodes are painted red
+        if index == len(self._black):
+            self._black.append(0)
+        else:
+            self._black[index] = 0
+        return index
+
+    def _rotate_left(self, index):
+        left = self._left
+        right = self._right
+        parent = self._parent
+        nnew = right[index]
+        right[index] = left[nnew]
+        if left[nnew] != NIL:
+            parent[left[nnew]] = index
+        self._transplant(index, nnew)
+        left[nnew] = index
+        parent[index] = nnew
+
+    def _rotate_right(self, index):
+        left = self._left
+        right = self._right
+        parent = self._parent
+        nnew = left[index]
+        left[index] = right[nnew]
+        if right[nnew] != NIL:
+            parent[right[nnew]] = index
+        self._transplant(index, nnew)
+        right[nnew] = index
+        parent[index] = nnew
+
+    def insert(self, key, item):
+        index = self._insert(key, item)
+        self._repair_insert(index)
+        return ArrayNode(self, index)
+
+    def _repair_insert(self, index):
+        black = self._black
+        left = self._left
+        right = self._right
+        parent = self._parent
+        while not black[parent[index]]:
+            father = parent[index]
+            grandpa = parent[father]
+            if father == left[grandpa]:
+                uncle = right[grandpa]
+                if not black[uncle]:
+                    black[father] = 1
+                    black[uncle] = 1
+                    black[grandpa] = 0
+                    index = grandpa
+                    continue
+                if index == right[father]:
+                    index = father
+                    self._rotate_left(index)
+                    father = parent[index]
+                black[father] = 1
+                black[grandpa] = 0
+                self._rotate_right(grandpa)
+            else:
+                uncle = left[grandpa]
+                if not black[uncle]:
+                    black[father] = 1
+                    black[uncle] = 1
+                    black[grandpa] = 0
+                    index = grandpa
+                    continue
+                if index == left[father]:
+                    index = father
+                    self._rotate_right(index)
+                    father = parent[index]
+                black[father] = 1
+                black[grandpa] = 0
+                self._rotate_left(grandpa)
+        black[self._root] = 1
+
+    def remove(self, key):
+        """
+        Remove an item of the tree, keeping it balanced.
+        Raises KeyError if the key is not in the tree.
+        """
+        index = self._find(key)
+        if index == NIL:
+            raise KeyError(key)
+        black = self._black
+        left = self._left
+        right = self._right
+        parent = self._parent
+        removed_black = black[index]
+        if left[index] == NIL:
+            child = right[index]
+            self._transplant(index, child)
+        elif right[index] == NIL:
+            child = left[index]
+            self._transplant(index, child)
+        else:
+            successor = self._minimum(right[index])
+            removed_black = black[successor]
+            child = right[successor]
+            if parent[successor] == index:
+                parent[child] = successor
+            else:
+                self._transplant(successor, child)
+                right[successor] = right[index]
+                parent[right[successor]] = successor
+            self._transplant(index, successor)
+            left[successor] = left[index]
+            parent[left[successor]] = successor
+            black[successor] = black[index]
+        if removed_black:
+            self._repair_remove(child)
+        parent[NIL] = NIL
+        black[NIL] = 1
+        self._release(index)
+
+    def _repair_remove(self, index):
+        black = self._black
+        left = self._left
+        right = self._right
+        parent = self._parent
+        while index != self._root and black[index]:
+            father = parent[index]
+            if index == left[father]:
+                sibling = right[father]
+                if not black[sibling]:
+                    black[sibling] = 1
+                    black[father] = 0
+                    self._rotate_left(father)
+                    sibling = right[father]
+                if black[left[sibling]] and black[right[sibling]]:
+                    black[sibling] = 0
+                    index = father
+                    continue
+                if black[right[sibling]]:
+                    black[left[sibling]] = 1
+                    black[sibling] = 0
+                    self._rotate_right(sibling)
+                    sibling = right[father]
+                black[sibling] = black[father]
+                black[father] = 1
+                black[right[sibling]] = 1
+                self._rotate_left(father)
+            else:
+                sibling = left[father]
+                if not black[sibling]:
+                    black[sibling] = 1
+                    black[father] = 0
+                    self._rotate_right(father)
+                    sibling = left[father]
+                if black[right[sibling]] and black[left[sibling]]:
+                    black[sibling] = 0
+                    index = father
+                    continue
+                if black[left[sibling]]:
+                    black[right[sibling]] = 1
+                    black[sibling] = 0
+                    self._rotate_left(sibling)
+                    sibling = left[father]
+                black[sibling] = black[father]
+                black[father] = 1
+                black[left[sibling]] = 1
+                self._rotate_right(father)
+            index = self._root
+        black[index] = 1
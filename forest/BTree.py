@@ -0,0 +1,358 @@
+"""
+B+ Tree implementation, keys are packed in sorted lists per node
+@author: Lia Nemeth
+"""
+
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+# what search returns, it mimics a node with a key and an item
+Entry = namedtuple('Entry', ['key', 'item'])
+
+
+class BTreeNode(object):
+    """
+    A node of a B+ Tree.
+    Leaves keep keys and items in two parallel lists and are linked to
+    their right sibling. Internal nodes keep separator keys and children:
+    children[i] holds the keys k with keys[i - 1] <= k < keys[i].
+    """
+    __slots__ = ('keys', 'items', 'children', 'next')
+
+    def __init__(self, leaf=True):
+        self.keys = []
+        self.items = [] if leaf else None
+        self.children = None if leaf else []
+        self.next = None
+
+    def is_leaf(self):
+        return self.children is None
+
+    def __str__(self):
+        return '<{type} - {keys}>'.format(type=type(self).__name__,
+                                          keys=self.keys)
+
+
+class BTree(object):
+    """
+    A B+ Tree (en.wikipedia.org/wiki/B%2B_tree) mapping keys to items.
+    Every node but the root holds between order // 2 and order keys, all
+    items live in the leaves and the leaves are linked for range scans.
+    Keys are unique: inserting an existing key replaces its item.
+    """
+    def __init__(self, order=64):
+        """
+        Constructor method
+        Args:
+            order - the maximum number of keys per node, at least 3
+        """
+        if order < 3:
+            raise ValueError('order must be at least 3')
+        self.order = order
+        self.root = BTreeNode()
+        self._size = 0
+
+    @classmethod
+    def from_sorted(cls, items, order=64):
+        """
+        Builds a tree in O(n) by packing sorted (key, item) pairs into
+        leaves, and the leaves into parents, bottom up.
+        Keys must be unique.
+        """
+        tree = cls(order)
+        items = list(items)
+        if not items:
+            return tree
+        # leave some room in each node, so the next inserts don't split
+        fill = max(order * 3 // 4, order // 2 + 1)
+        level = []
+        for start in range(0, len(items), fill):
+            leaf = BTreeNode()
+            chunk = items[start:start + fill]
+            leaf.keys = [key for key, _ in chunk]
+            leaf.items = [item for _, item in chunk]
+            if level:
+                level[-1].next = leaf
+            level.append(leaf)
+        cls._fix_last(level, order)
+        while len(level) > 1:
+            parents = []
+            for start in range(0, len(level), fill + 1):
+                parent = BTreeNode(leaf=False)
+                parent.children = level[start:start + fill + 1]
+                parent.keys = [cls._lowest(child)
+                               for child in parent.children[1:]]
+                parents.append(parent)
+            cls._fix_last(parents, order)
+            level = parents
+        tree.root = level[0]
+        tree._size = len(items)
+        return tree
+
+    @classmethod
+    def _fix_last(cls, level, order):
+        """
+        The last node of a bulk loaded level may be too small: it is either
+        merged with the one before, or they share their entries evenly.
+        """
+        if len(level) < 2:
+            return
+        previous, last = level[-2:]
+        if last.is_leaf():
+            if len(last.keys) >= order // 2:
+                return
+            keys = previous.keys + last.keys
+            items = previous.items + last.items
+            if len(keys) <= order:
+                previous.keys = keys
+                previous.items = items
+                previous.next = None
+                level.pop()
+            else:
+                mid = len(keys) // 2
+                previous.keys, last.keys = keys[:mid], keys[mid:]
+                previous.items, last.items = items[:mid], items[mid:]
+        else:
+            if len(last.children) > order // 2:
+                return
+            children = previous.children + last.children
+            if len(children) <= order + 1:
+                previous.children = children
+                level.pop()
+            else:
+                mid = len(children) // 2
+                previous.children, last.children = (children[:mid],
+                                                    children[mid:])
+                last.keys = [cls._lowest(child)
+                             for child in last.children[1:]]
+            previous.keys = [cls._lowest(child)
+                             for child in previous.children[1:]]
+
+    @staticmethod
+    def _lowest(node):
+        while not node.is_leaf():
+            node = node.children[0]
+        return node.keys[0]
+
+    def __len__(self):
+        return self._size
+
+    def __str__(self):
+        return '<{type} - order {order}, {size} keys>'.format(
+            type=type(self).__name__, order=self.order, size=self._size)
+
+    def _find_leaf(self, key):
+        node = self.root
+        while node.children is not None:
+            node = node.children[bisect_right(node.keys, key)]
+        return node
+
+    def search(self, key):
+        """
+        Search a key, descending with a binary search inside each node
+        Returns:
+            an Entry with key and item, or None if the key is not found
+        """
+        leaf = self._find_leaf(key)
+        i = bisect_left(leaf.keys, key)
+        if i < len(leaf.keys) and leaf.keys[i] == key:
+            return Entry(leaf.keys[i], leaf.items[i])
+
+    def __getitem__(self, key):
+        return self.search(key)
+
+    def __contains__(self, key):
+        leaf = self._find_leaf(key)
+        i = bisect_left(leaf.keys, key)
+        return i < len(leaf.keys) and leaf.keys[i] == key
+
+    def insert(self, key, item):
+        """
+        Insert a new item, or replace the item of an existing key
+        Args:
+            key - the item key
+            item - the item value
+        """
+        split = self._insert(self.root, key, item)
+        if split is not None:
+            separator, right = split
+            root = BTreeNode(leaf=False)
+            root.keys = [separator]
+            root.children = [self.root, right]
+            self.root = root
+
+    def __setitem__(self, key, val):
+        self.insert(key, val)
+
+    def _insert(self, node, key, item):
+        """
+        Recursive insert. Returns (separator, new right node) if node was
+        split, None otherwise.
+        """
+        if node.children is None:
+            i = bisect_left(node.keys, key)
+            if i < len(node.keys) and node.keys[i] == key:
+                node.items[i] = item
+                return
+            node.keys.insert(i, key)
+            node.items.insert(i, item)
+            self._size += 1
+            if len(node.keys) > self.order:
+                return self._split_leaf(node)
+            return
+        i = bisect_right(node.keys, key)
+        split = self._insert(node.children[i], key, item)
+        if split is None:
+            return
+        separator, right = split
+        node.keys.insert(i, separator)
+        node.children.insert(i + 1, right)
+        if len(node.keys) > self.order:
+            return self._split_internal(node)
+
+    def _split_leaf(self, node):
+        mid = len(node.keys) // 2
+        right = BTreeNode()
+        right.keys = node.keys[mid:]
+        right.items = node.items[mid:]
+        del node.keys[mid:]
+        del node.items[mid:]
+        right.next = node.next
+        node.next = right
+        return right.keys[0], right
+
+    def _split_internal(self, node):
+        mid = len(node.keys) // 2
+        separator = node.keys[mid]
+        right = BTreeNode(leaf=False)
+        right.keys = node.keys[mid + 1:]
+        right.children = node.children[mid + 1:]
+        del node.keys[mid:]
+        del node.children[mid + 1:]
+        return separator, right
+
+    def remove(self, key):
+        """
+        Remove an item of the tree.
+        Raises KeyError if the key is not in the tree.
+        """
+        self._remove(self.root, key)
+        root = self.root
+        if root.children is not None and len(root.children) == 1:
+            self.root = root.children[0]
+
+    def __delitem__(self, key):
+        self.remove(key)
+
+    def _remove(self, node, key):
+        """
+        Recursive remove, children left with too few keys borrow from
+        or merge with a sibling on the way back up.
+        """
+        if node.children is None:
+            i = bisect_left(node.keys, key)
+            if i == len(node.keys) or node.keys[i] != key:
+                raise KeyError(key)
+            del node.keys[i]
+            del node.items[i]
+            self._size -= 1
+            return
+        i = bisect_right(node.keys, key)
+        child = node.children[i]
+        self._remove(child, key)
+        if len(child.keys) < self.order // 2:
+            self._fix_child(node, i)
+
+    def _fix_child(self, node, i):
+        child = node.children[i]
+        minimum = self.order // 2
+        left = node.children[i - 1] if i > 0 else None
+        right = node.children[i + 1] if i + 1 < len(node.children) else None
+        if left is not None and len(left.keys) > minimum:
+            if child.children is None:
+                child.keys.insert(0, left.keys.pop())
+                child.items.insert(0, left.items.pop())
+                node.keys[i - 1] = child.keys[0]
+            else:
+                child.keys.insert(0, node.keys[i - 1])
+                child.children.insert(0, left.children.pop())
+                node.keys[i - 1] = left.keys.pop()
+        elif right is not None and len(right.keys) > minimum:
+            if child.children is None:
+                child.keys.append(right.keys.pop(0))
+                child.items.append(right.items.pop(0))
+                node.keys[i] = right.keys[0]
+            else:
+                child.keys.append(node.keys[i])
+                child.children.append(right.children.pop(0))
+                node.keys[i] = right.keys.pop(0)
+        elif left is not None:
+            self._merge(node, i - 1)
+        elif right is not None:
+            self._merge(node, i)
+
+    def _merge(self, node, i):
+        """
+        Merges node.children[i + 1] into node.children[i]
+        """
+        left = node.children[i]
+        right = node.children.pop(i + 1)
+        separator = node.keys.pop(i)
+        if left.children is None:
+            left.keys += right.keys
+            left.items += right.items
+            left.next = right.next
+        else:
+            left.keys.append(separator)
+            left.keys += right.keys
+            left.children += right.children
+
+    def _first_leaf(self):
+        node = self.root
+        while node.children is not None:
+            node = node.children[0]
+        return node
+
+    def __iter__(self):
+        """
+        Iterates over Entries in key order, following the leaf links
+        """
+        leaf = self._first_leaf()
+        while leaf is not None:
+            for entry in zip(leaf.keys, leaf.items):
+                yield Entry(*entry)
+            leaf = leaf.next
+
+    def range(self, lo=None, hi=None):
+        """
+        Lazily iterates over the Entries with lo <= key < hi in key order
+        Args:
+            lo - *optional* the lower bound, included
+            hi - *optional* the upper bound, excluded
+        """
+        if lo is None:
+            leaf = self._first_leaf()
+            i = 0
+        else:
+            leaf = self._find_leaf(lo)
+            i = bisect_left(leaf.keys, lo)
+        while leaf is not None:
+            keys = leaf.keys
+            end = len(keys) if hi is None else bisect_left(keys, hi)
+            for j in range(i, end):
+                yield Entry(keys[j], leaf.items[j])
+            if end < len(keys):
+                return
+            leaf = leaf.next
+            i = 0
+
+    def get_height(self):
+        """
+        All the leaves are on the same level
+        """
+        height = 1
+        node = self.root
+        while node.children is not None:
+            node = node.children[0]
+            height += 1
+        return height
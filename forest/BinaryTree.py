@@ -3,8 +3,36 @@ Binary Tree implementations, recursive and iterative traversals
 @author: Lia Nemeth
 """
 
+import heapq
+import random
+import threading
 import weakref
-from forest.utils import Queue, Stack
+from bisect import bisect_left
+from contextlib import contextmanager
+from itertools import groupby, takewhile
+from operator import itemgetter
+from forest import aio, parallel
+from forest.ancestors import AncestorIndex
+from forest.utils import LFUCache, LRUCache, Queue, Stack
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# marks a key missing from the lookup cache, None is a cached result
+_MISSING = object()
+
+# the lookup cache policies of enable_cache
+CACHES = {'lru': LRUCache, 'lfu': LFUCache}
+
+# insert_many and remove_many rebuild the tree when the batch has more
+# than a tree size / REBUILD_RATIO keys
+REBUILD_RATIO = 4
+
+# the nodes whose metadata update is deferred, per thread, see
+# BinaryTree._deferred_metadata
+_deferred = threading.local()
 
 
 def copy_node(origin, destination):
@@ -15,11 +43,31 @@ def copy_node(origin, destination):
         destination.right = origin.right
 
 
+def _visit_all(nodes, visit, args, kwargs):
+    """
+    Calls visit on every node, returns the nodes in a list
+    """
+    l = []
+    for node in nodes:
+        if visit:
+            visit(node, *args, **kwargs)
+        l.append(node)
+    return l
+
+
 class BinaryTree(object):
     """
     A generic Binary Tree implementation (en.wikipedia.org/wiki/Binary_tree)
     Used as super-class to other binary trees
+    Every node caches the size and the height of its subtree, the left and
+    right setters keep them up to date. The hot paths of the search trees,
+    insert and the rotations, link nodes directly and update only what
+    changed.
     """
+
+    # the AncestorIndex of the tree, built on the root when needed
+    _ancestors = None
+
     def __init__(self, key=None, item=None, left=None, right=None):
         """
         Constructor method
@@ -31,9 +79,16 @@ class BinaryTree(object):
         """
         self.key = key
         self.item = item
-        self.left = left
-        self.right = right
+        self.size = 1
+        self.height = 1
         self._parent = None
+        self._left = None
+        self._right = None
+        # a new leaf has nothing to tell its subtree or the root
+        if left is not None:
+            self.left = left
+        if right is not None:
+            self.right = right
 
     def __getstate__(self):
         """
@@ -41,18 +96,20 @@ class BinaryTree(object):
         It removes the weakref to parent, because they would  be dead references
         if we were to unpikcle.
         """
-        self._parent = None
-        return self.__dict__
+        state = self.__dict__.copy()
+        state['_parent'] = None
+        state.pop('_ancestors', None)
+        return state
 
     def __setstate__(self, state):
         """
         Recreates the trees including the weakref to parent.
         """
         self.__dict__ = state
-        if self._left:
-            self._left.parent = weakref.ref(self)
-        if self._right:
-            self._right.parent = weakref.ref(self)
+        if self._left is not None:
+            self._left._parent = weakref.ref(self)
+        if self._right is not None:
+            self._right._parent = weakref.ref(self)
 
     @property
     def parent(self):
@@ -74,6 +131,7 @@ class BinaryTree(object):
         self._left = val
         if self._left is not  None:
             self._left._parent = weakref.ref(self)
+        self.propagate_metadata()
 
     @property
     def right(self):
@@ -87,6 +145,145 @@ class BinaryTree(object):
         self._right = val
         if self._right is not None:
             self._right._parent = weakref.ref(self)
+        self.propagate_metadata()
+
+    def _set_children(self, left, right):
+        """
+        Links both children of a node built bottom up, and only updates
+        that node: it has no parent yet
+        """
+        self._left = left
+        self._right = right
+        ref = weakref.ref(self)
+        if left is not None:
+            left._parent = ref
+        if right is not None:
+            right._parent = ref
+        self.update_metadata()
+
+    def update_metadata(self):
+        """
+        Recomputes whatever a node caches about its subtree from its
+        children. Subclasses that augment their nodes extend it.
+        Returns:
+            True if anything changed
+        """
+        size = 1
+        height = 0
+        if self._left is not None:
+            size += self._left.size
+            height = self._left.height
+        if self._right is not None:
+            size += self._right.size
+            if self._right.height > height:
+                height = self._right.height
+        height += 1
+        if size == self.size and height == self.height:
+            return False
+        self.size = size
+        self.height = height
+        return True
+
+    def propagate_metadata(self):
+        """
+        Updates the cached data of this node and then of its ancestors,
+        up to the first node left unchanged. The root is told in any case:
+        a rotation changes the shape of the tree, not the size of the
+        subtrees above it.
+        """
+        stale = getattr(_deferred, 'nodes', None)
+        if stale is not None:
+            stale.append(self)
+            return
+        tree = self
+        changed = True
+        while True:
+            if changed:
+                changed = tree.update_metadata()
+            parent = tree.parent
+            if parent is None:
+                tree._invalidate_caches()
+                return
+            tree = parent
+
+    def _update_path(self):
+        """
+        Updates the cached data of this node and then of its ancestors,
+        up to the first node left unchanged, without telling the root:
+        for the writes that link nodes themselves and tell it once.
+        """
+        stale = getattr(_deferred, 'nodes', None)
+        if stale is not None:
+            stale.append(self)
+            return
+        tree = self
+        while tree is not None and tree.update_metadata():
+            tree = tree.parent
+
+    def _invalidate_caches(self):
+        """
+        Called on the root when the shape of the tree changed, subclasses
+        drop whatever they derived from it.
+        """
+        self._ancestors = None
+
+    @contextmanager
+    def _deferred_metadata(self):
+        """
+        Batches the metadata updates of a block: the setters only record
+        their node, and at the end the recorded nodes and their ancestors
+        are updated once each, children first. A batch of k changes costs
+        one pass over the union of their paths instead of k climbs to the
+        root. Rotations and rebalancing still update the nodes they move.
+        """
+        if getattr(_deferred, 'nodes', None) is not None:
+            # already batching
+            yield
+            return
+        stale = _deferred.nodes = []
+        try:
+            yield
+        finally:
+            _deferred.nodes = None
+            # node id: [node, recorded children not updated yet]
+            pending = {}
+            for node in stale:
+                child = None
+                while node is not None:
+                    entry = pending.get(id(node))
+                    if entry is not None:
+                        if child is not None:
+                            entry[1] += 1
+                        break
+                    pending[id(node)] = [node, 0 if child is None else 1]
+                    child = node
+                    node = node.parent
+            ready = [node for node, count in pending.values() if not count]
+            while ready:
+                node = ready.pop()
+                node.update_metadata()
+                parent = node.parent
+                if parent is None:
+                    node._invalidate_caches()
+                    continue
+                entry = pending[id(parent)]
+                entry[1] -= 1
+                if not entry[1]:
+                    ready.append(parent)
+
+    def ancestor_index(self):
+        """
+        Returns an AncestorIndex for O(1) ancestor and lowest common
+        ancestor queries. It is built in O(n log n) the first time and
+        kept on the root until the tree changes; an index of a subtree is
+        not kept.
+        """
+        index = self._ancestors
+        if index is None:
+            index = AncestorIndex(self, BinaryTree._children)
+            if self.parent is None:
+                self._ancestors = index
+        return index
 
     def __str__(self):
         return '<{type} - {key} : {item}>'.format(type=type(self).__name__,
@@ -101,22 +298,38 @@ class BinaryTree(object):
 
     def get_height(self):
         """
-        Recursive get Height method
-        Get lef height, get righ height, returns the  highest value + 1
+        The height is cached on every node, a leaf has height 1
         """
-        hl = self.left.get_height() if self.left else 0
-        hr = self.right.get_height() if self.right else 0
-        # returns the highest height
-        if (hl > hr):
-            # + 1 --> counting self
-            return hl + 1
-        else:
-            # + 1 --> counting self
-            return hr + 1
+        return self.height
+
+    def __len__(self):
+        """
+        The number of nodes in this subtree, it is cached on every node
+        """
+        return self.size
+
+    def __bool__(self):
+        # a node is always true, even when __len__ says the tree is empty
+        return True
+
+    __nonzero__ = __bool__
+
+    def depth(self):
+        """
+        The level of this node, the root is on level 1.
+        Rotations move whole subtrees up and down, so binary trees don't
+        cache it: this climbs the parents, O(depth).
+        """
+        depth = 1
+        tree = self.parent
+        while tree is not None:
+            depth += 1
+            tree = tree.parent
+        return depth
 
     def in_order(self, visit=None, *args, **kwargs):
         """
-        Recursive in-order traversal.
+        In-order traversal.
         Args:
             visit - *optional* A callable object
             *args - Will be passed to visit
@@ -124,31 +337,51 @@ class BinaryTree(object):
         Returns:
             a list containing all nodes in order
         """
-        l = []
-        if self.left:
-            l += self.left.in_order(visit=visit, *args, **kwargs)
-        if visit:
-            visit(self, *args, **kwargs)
-        l += [self]
-        if self.right:
-            l += self.right.in_order(visit=visit, *args, **kwargs)
-        return l
+        return _visit_all(self.iter_in_order(), visit, args, kwargs)
 
     def __iter__(self):
         """
         Default iterator returns a generator in order traversal
         """
-        if self.left:
-            for node in self.left:
-                yield node
-        yield self
-        if self.right:
-            for node in self.right:
-                yield node
+        return self.iter_in_order()
+
+    def __aiter__(self):
+        """
+        `async for` iterates in order, like iter
+        """
+        return aio.aiter_nodes(self.iter_in_order())
+
+    def aiter_visit(self, visit, concurrency=8, order='in',
+                    ordered=True):
+        """
+        Asynchronous traversal: runs visit on every node with at most
+        concurrency visits running at once, and yields (node, result)
+        pairs. Nodes are only taken from the tree when a slot is free.
+        Args:
+            visit - a function or a coroutine function, called with each
+                    node
+            concurrency - *optional* the most visits running at once
+            order - *optional* 'pre', 'in', 'post' or 'level'
+            ordered - *optional* yield in the traversal order, or in the
+                      order the visits complete
+        """
+        if order not in ('pre', 'in', 'post', 'level'):
+            raise ValueError('unknown order {order}'.format(order=order))
+        nodes = getattr(self, 'iter_{order}_order'.format(order=order))()
+        return aio.avisit(nodes, visit, concurrency, ordered)
+
+    async def atraverse(self, visit, concurrency=8, order='in'):
+        """
+        Awaits visit on every node, concurrency at a time.
+        Returns:
+            a list of the results of visit, in the traversal order
+        """
+        return [result async for _, result in
+                self.aiter_visit(visit, concurrency, order)]
 
     def pre_order(self, visit=None, *args, **kwargs):
         """
-        Recursive pre-order traversal.
+        Pre-order traversal.
         Args:
             visit - *optional* A callable object
             *args - Will be passed to visit
@@ -156,18 +389,11 @@ class BinaryTree(object):
         Returns:
             a list containing all nodes pre order
         """
-        l = [self]
-        if visit:
-            visit(self, *args, **kwargs)
-        if self.left:
-            l += self.left.pre_order(visit=visit, *args, **kwargs)
-        if self.right:
-            l += self.right.pre_order(visit=visit, *args, **kwargs)
-        return l
+        return _visit_all(self.iter_pre_order(), visit, args, kwargs)
 
     def post_order(self, visit=None, *args, **kwargs):
         """
-        Recursive post-order traversal.
+        Post-order traversal.
         Args:
             visit - *optional* A callable object
             *args - Will be passed to visit
@@ -175,15 +401,108 @@ class BinaryTree(object):
         Returns:
             a list containing all nodes post order
         """
-        l = []
-        if self.left:
-            l += self.left.post_order(visit=visit, *args, **kwargs)
-        if self.right:
-            l += self.right.post_order(visit=visit, *args, **kwargs)
-        if visit:
-            visit(self, *args, **kwargs)
-        l += [self]
-        return l
+        return _visit_all(self.iter_post_order(), visit, args, kwargs)
+
+    def _children(self):
+        return [child for child in (self.left, self.right)
+                if child is not None]
+
+    def parallel_map(self, func, executor=None, order='in', pieces=None):
+        """
+        Calls func on every node, on a pool of workers: the tree is cut into
+        disjoint subtrees and each one is sent as a single task.
+        Args:
+            func - called with each node
+            executor - *optional* a concurrent.futures executor, by default
+                       a ProcessPoolExecutor is created and shut down
+            order - *optional* 'pre', 'in' or 'post'
+            pieces - *optional* how many subtrees to cut the tree into
+        Returns:
+            a list of the results of func, in the traversal order
+        """
+        return parallel.parallel_map(self, BinaryTree._children, func, order,
+                                     executor, pieces)
+
+    def map_reduce(self, map_fn, reduce_fn, initial=parallel._MISSING,
+                   executor=None, order='in', pieces=None):
+        """
+        Maps every node on a pool of workers and folds the results with
+        reduce_fn, in the traversal order. reduce_fn must be associative,
+        each subtree is reduced by its worker.
+        Args:
+            initial - *optional* the value to start from, required for an
+                      empty tree
+        """
+        return parallel.map_reduce(self, BinaryTree._children, map_fn,
+                                   reduce_fn, order, initial, executor,
+                                   pieces)
+
+    def iter_in_order(self):
+        """
+        Lazy in-order traversal, it keeps a stack of O(height) nodes
+        """
+        stack = []
+        tree = self
+        while tree is not None or stack:
+            if tree is not None:
+                stack.append(tree)
+                tree = tree.left
+            else:
+                tree = stack.pop()
+                yield tree
+                tree = tree.right
+
+    def iter_pre_order(self):
+        """
+        Lazy pre-order traversal, it keeps a stack of O(height) nodes
+        """
+        stack = [self]
+        while stack:
+            tree = stack.pop()
+            yield tree
+            if tree.right is not None:
+                stack.append(tree.right)
+            if tree.left is not None:
+                stack.append(tree.left)
+
+    def iter_post_order(self):
+        """
+        Lazy post-order traversal, it keeps a stack of O(height) nodes
+        """
+        stack = []
+        tree = self
+        last = None
+        while tree is not None or stack:
+            if tree is not None:
+                stack.append(tree)
+                tree = tree.left
+            else:
+                top = stack[-1]
+                if top.right is not None and top.right is not last:
+                    tree = top.right
+                else:
+                    last = stack.pop()
+                    yield last
+
+    def iter_level_order(self, max_depth=None):
+        """
+        Lazy level-order traversal, it keeps the nodes of one level
+        Args:
+            max_depth - *optional* stop after this level, the root is on
+                        level 1
+        """
+        level = [self]
+        depth = 0
+        while level and depth != max_depth:
+            depth += 1
+            children = []
+            for tree in level:
+                yield tree
+                if tree.left is not None:
+                    children.append(tree.left)
+                if tree.right is not None:
+                    children.append(tree.right)
+            level = children
 
     def breadth_first_search(self, key):
         """
@@ -207,6 +526,19 @@ class BinaryTree(object):
             if p.left is not None:
                 queue.enqueue(p.left)
 
+    def search_level_order(self, predicate, max_depth=None):
+        """
+        Lazy Breadth First Search for every node matching a predicate.
+        Args:
+            predicate - A callable object that takes a node
+            max_depth - *optional* do not look below this level
+        Returns:
+            a generator of the matching nodes, level by level
+        """
+        for node in self.iter_level_order(max_depth):
+            if predicate(node):
+                yield node
+
     def in_order_iterative(self):
         """
         Iterative in order method. returns a list of all  nodes.
@@ -214,8 +546,8 @@ class BinaryTree(object):
         stack = Stack()
         tree = self
         l = []
-        while tree or not stack.is_empty():
-            if tree:
+        while tree is not None or not stack.is_empty():
+            if tree is not None:
                 stack.push(tree)
                 tree = tree.left
             else:
@@ -236,9 +568,9 @@ class BinaryTree(object):
         while not stack.is_empty():
             tree = stack.pop()
             output.enqueue(tree)
-            if tree.right:
+            if tree.right is not None:
                 stack.push(tree.right)
-            if tree.left:
+            if tree.left is not None:
                 stack.push(tree.left)
         while not output.is_empty():
             l.append(output.dequeue())
@@ -258,9 +590,9 @@ class BinaryTree(object):
         while not stack.is_empty():
             tree = stack.pop()
             output.push(tree)
-            if tree.left:
+            if tree.left is not None:
                 stack.push(tree.left)
-            if tree.right:
+            if tree.right is not None:
                 stack.push(tree.right)
         while not output.is_empty():
             l.append(output.pop())
@@ -273,24 +605,545 @@ class BinarySearchTree(BinaryTree):
     This implementation doesn't take care of any balancing of the  tree.
     """
 
+    # sorted keys and nodes, built on the root by search_many
+    _snapshot = None
+    # the node found by the last finger_search, kept on the root
+    _finger = None
+    # the lookup cache in front of search, see enable_cache
+    _cache = None
+    # True when search changes the shape of the tree
+    mutating_search = False
+
+    def __getstate__(self):
+        state = super(BinarySearchTree, self).__getstate__()
+        # the cache holds a lock, it and the other derived data are cheap
+        # to build again
+        for name in ('_cache', '_snapshot', '_finger'):
+            state.pop(name, None)
+        return state
+
+    def _invalidate_caches(self):
+        super(BinarySearchTree, self)._invalidate_caches()
+        self._snapshot = None
+        self._finger = None
+        if self._cache is not None:
+            self._cache.clear()
+
+    def __len__(self):
+        return 0 if self.is_empty() else self.size
+
+    def enable_cache(self, capacity=128, policy='lru'):
+        """
+        Puts a bounded cache of search results in front of search and
+        __getitem__, for trees where a few hot keys get most lookups.
+        Misses are cached too. Anything that changes the shape of the tree,
+        inserts, removes and the rotations they make, empties the cache:
+        it pays off on read mostly trees.
+        Args:
+            capacity - *optional* the most keys kept
+            policy - *optional* 'lru' evicts the least recently used key,
+                     'lfu' the least frequently used one
+        Returns:
+            the cache, see cache_info
+        """
+        if self.parent is not None:
+            raise ValueError('the lookup cache lives on the root of a tree')
+        if policy not in CACHES:
+            raise ValueError('unknown policy {policy}'.format(policy=policy))
+        self._cache = CACHES[policy](capacity)
+        return self._cache
+
+    def disable_cache(self):
+        self._cache = None
+
+    def cache_info(self):
+        """
+        Returns:
+            (hits, misses, maxsize, currsize) of the lookup cache, or None
+            if it is not enabled
+        """
+        if self._cache is not None:
+            return self._cache.info()
+
     def search(self, key):
         """
         Classic search algorithm on BST
         Args:
           key - The key for the node that is being searched
         """
-        tree = self
-        while tree:
-            if key == tree.key:
+        cache = self._cache
+        if cache is not None:
+            tree = cache.get(key, _MISSING)
+            if tree is not _MISSING:
                 return tree
+        tree = self._find(key)
+        if cache is not None:
+            cache.put(key, tree)
+        return tree
+
+    def _find(self, key):
+        """
+        The descent of search, without the lookup cache
+        """
+        tree = None if self.is_empty() else self
+        while tree is not None:
+            if key == tree.key:
+                break
             elif key < tree.key:
                 tree = tree.left
             else:
                 tree = tree.right
+        return tree
 
     def __getitem__(self, key):
         return self.search(key)
 
+    def finger_search(self, key, finger=None):
+        """
+        Search that starts from a node close to the key instead of the root:
+        it climbs from the finger up to the first ancestor whose subtree
+        holds the key, then goes down. Looking up a key d positions away
+        from the finger costs O(log d) in the balanced trees, instead of
+        O(log n), at worst O(height).
+        Args:
+          key - The key for the node that is being searched
+          finger - *optional* a node of this tree, by default the node the
+                   last finger_search found. It is forgotten when the tree
+                   changes shape.
+        """
+        if finger is None:
+            finger = self._finger
+            if finger is None:
+                finger = None if self.is_empty() else self
+        tree = finger
+        if tree is not None and not key == tree.key:
+            if key < tree.key:
+                while tree.parent is not None and not tree.parent.key < key:
+                    tree = tree.parent
+            else:
+                while tree.parent is not None and not key < tree.parent.key:
+                    tree = tree.parent
+            # the cache is the root's: a subtree must not use it, and
+            # nodes found below the root must not go into it
+            tree = BinarySearchTree._find(tree, key)
+        if tree is not None and self.parent is None:
+            self._finger = tree
+        return tree
+
+    def _get_snapshot(self):
+        """
+        Returns the sorted keys and nodes of the tree, and the keys as a
+        NumPy array when NumPy is available and the keys are numbers.
+        The snapshot of a root lives until the tree changes shape, the one
+        of a subtree is not kept: only the root is told about changes.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            nodes = [] if self.is_empty() else list(self.iter_in_order())
+            keys = [node.key for node in nodes]
+            array = None
+            if numpy is not None and keys:
+                array = numpy.asarray(keys)
+                if array.dtype.kind not in 'iuf':
+                    array = None
+            snapshot = (keys, nodes, array)
+            if self.parent is None:
+                self._snapshot = snapshot
+        return snapshot
+
+    def _locate_many(self, keys):
+        """
+        Returns the snapshot nodes and, for each key, its position in them
+        or -1 if the key is not in the tree
+        """
+        sorted_keys, nodes, array = self._get_snapshot()
+        size = len(sorted_keys)
+        if array is not None:
+            keys = numpy.asarray(keys)
+            if keys.dtype.kind in 'iuf':
+                found = numpy.searchsorted(array, keys)
+                clipped = numpy.minimum(found, size - 1)
+                hits = (found < size) & (array[clipped] == keys)
+                return nodes, numpy.where(hits, found, -1).tolist()
+        positions = []
+        for key in keys:
+            i = bisect_left(sorted_keys, key)
+            positions.append(i if i < size and sorted_keys[i] == key else -1)
+        return nodes, positions
+
+    def search_many(self, keys, default=None):
+        """
+        Looks up a batch of keys at once, with a binary search over a sorted
+        snapshot of the tree. With NumPy and numeric keys the whole batch is
+        one vectorized searchsorted call.
+        Args:
+            keys - a sequence or a NumPy array of keys
+            default - *optional* what to return for missing keys
+        Returns:
+            a list with the item of each key
+        """
+        nodes, positions = self._locate_many(keys)
+        return [nodes[i].item if i >= 0 else default for i in positions]
+
+    def contains_many(self, keys):
+        """
+        Returns a list of booleans telling which keys are in the tree, or a
+        NumPy boolean array when NumPy is available.
+        """
+        nodes, positions = self._locate_many(keys)
+        if numpy is not None:
+            return numpy.asarray(positions, dtype=numpy.int64) >= 0
+        return [i >= 0 for i in positions]
+
+    def min(self):
+        """
+        Returns the node with the smallest key, or None if the tree is empty
+        """
+        if self.is_empty():
+            return None
+        tree = self
+        while tree.left is not None:
+            tree = tree.left
+        return tree
+
+    def max(self):
+        """
+        Returns the node with the largest key, or None if the tree is empty
+        """
+        if self.is_empty():
+            return None
+        tree = self
+        while tree.right is not None:
+            tree = tree.right
+        return tree
+
+    def floor(self, key):
+        """
+        Returns the node with the largest key <= key, or None
+        """
+        tree = None if self.is_empty() else self
+        found = None
+        while tree is not None:
+            if key < tree.key:
+                tree = tree.left
+            else:
+                found = tree
+                if key == tree.key:
+                    break
+                tree = tree.right
+        return found
+
+    def ceiling(self, key):
+        """
+        Returns the node with the smallest key >= key, or None
+        """
+        tree = None if self.is_empty() else self
+        found = None
+        while tree is not None:
+            if tree.key < key:
+                tree = tree.right
+            else:
+                found = tree
+                if key == tree.key:
+                    break
+                tree = tree.left
+        return found
+
+    def successor(self):
+        """
+        Returns the next node in order, or None if this is the last one
+        """
+        if self.right is not None:
+            return self.right.min()
+        tree = self
+        parent = tree.parent
+        while parent is not None and tree is parent.right:
+            tree = parent
+            parent = tree.parent
+        return parent
+
+    def predecessor(self):
+        """
+        Returns the previous node in order, or None if this is the first one
+        """
+        if self.left is not None:
+            return self.left.max()
+        tree = self
+        parent = tree.parent
+        while parent is not None and tree is parent.left:
+            tree = parent
+            parent = tree.parent
+        return parent
+
+    def range(self, lo=None, hi=None):
+        """
+        Lazy in-order iteration over the nodes with lo <= key < hi,
+        subtrees outside the bounds are never visited.
+        Args:
+            lo - *optional* the lower bound, included
+            hi - *optional* the upper bound, excluded
+        """
+        stack = []
+        tree = None if self.is_empty() else self
+        while tree is not None or stack:
+            if tree is not None:
+                if lo is not None and tree.key < lo:
+                    # the node and its left subtree are below the range
+                    tree = tree.right
+                else:
+                    stack.append(tree)
+                    tree = tree.left
+            else:
+                tree = stack.pop()
+                if hi is not None and not tree.key < hi:
+                    return
+                yield tree
+                tree = tree.right
+
+    def rank(self, key):
+        """
+        Returns the number of keys smaller than key, in O(height)
+        """
+        tree = None if self.is_empty() else self
+        rank = 0
+        while tree is not None:
+            if tree.key < key:
+                rank += 1
+                if tree.left is not None:
+                    rank += tree.left.size
+                tree = tree.right
+            else:
+                tree = tree.left
+        return rank
+
+    def select(self, index):
+        """
+        Returns the node with the index-th smallest key, counting from 0,
+        in O(height). Raises IndexError if there is no such node.
+        """
+        if self.is_empty() or not 0 <= index < self.size:
+            raise IndexError(index)
+        tree = self
+        while True:
+            left = tree.left.size if tree.left is not None else 0
+            if index < left:
+                tree = tree.left
+            elif index == left:
+                return tree
+            else:
+                index -= left + 1
+                tree = tree.right
+
+    @classmethod
+    def from_sorted(cls, items):
+        """
+        Builds a balanced tree in O(n), without any insert call.
+        Args:
+            items - an iterable of (key, item) pairs sorted by key
+        Returns:
+            the root of the new tree
+        """
+        items = list(items)
+        if not items:
+            return cls()
+        height = len(items).bit_length()
+        return cls._build_sorted(items, 0, len(items), 1, height)
+
+    @classmethod
+    def from_items(cls, items):
+        """
+        Builds a balanced tree in O(n log n) from unsorted (key, item) pairs
+        """
+        return cls.from_sorted(sorted(items, key=itemgetter(0)))
+
+    @classmethod
+    def _build_sorted(cls, items, lo, hi, depth, height):
+        """
+        Recursively roots the subtree of items[lo:hi] at its middle item
+        """
+        mid = (lo + hi) // 2
+        key, item = items[mid]
+        node = cls._bulk_node(key, item, depth, height)
+        left = right = None
+        if lo < mid:
+            left = cls._build_sorted(items, lo, mid, depth + 1, height)
+        if mid + 1 < hi:
+            right = cls._build_sorted(items, mid + 1, hi, depth + 1, height)
+        if left is not None or right is not None:
+            node._set_children(left, right)
+        return node
+
+    @classmethod
+    def _bulk_node(cls, key, item, depth, height):
+        """
+        Creates a node of a bulk loaded tree
+        Args:
+            depth - the node depth, the root has depth 1
+            height - the height of the tree being built
+        """
+        return cls(key, item)
+
+    def _merge(self, other, keep_left, keep_both, keep_right):
+        """
+        Walks the keys of two trees in order, at the same time, and keeps
+        (key, item) pairs according to where the key is found
+        """
+        left = iter(()) if self.is_empty() else self.iter_in_order()
+        right = iter(()) if other.is_empty() else other.iter_in_order()
+        a = next(left, None)
+        b = next(right, None)
+        while a is not None or b is not None:
+            if b is None or (a is not None and a.key < b.key):
+                if keep_left:
+                    yield a.key, a.item
+                a = next(left, None)
+            elif a is None or b.key < a.key:
+                if keep_right:
+                    yield b.key, b.item
+                b = next(right, None)
+            else:
+                if keep_both:
+                    yield keep_both(a, b)
+                a = next(left, None)
+                b = next(right, None)
+
+    def union(self, other):
+        """
+        Returns a new tree with the keys of both trees, in O(n + m).
+        The item of other wins when a key is in both.
+        """
+        return type(self).from_sorted(self._merge(
+            other, True, lambda a, b: (b.key, b.item), True))
+
+    def intersection(self, other):
+        """
+        Returns a new tree with the keys found in both trees, and the
+        items of this one, in O(n + m)
+        """
+        return type(self).from_sorted(self._merge(
+            other, False, lambda a, b: (a.key, a.item), False))
+
+    def difference(self, other):
+        """
+        Returns a new tree with the keys of this tree that are not in
+        other, in O(n + m)
+        """
+        return type(self).from_sorted(self._merge(other, True, None, False))
+
+    def _detach(self):
+        """
+        Unlinks the children of a node without a parent, returns them.
+        A root loses its lookup cache, it may not stay a root.
+        """
+        if self._cache is not None:
+            self._cache = None
+        left, right = self.left, self.right
+        self.left = None
+        self.right = None
+        if left is not None:
+            left._parent = None
+        if right is not None:
+            right._parent = None
+        return left, right
+
+    @classmethod
+    def _join3(cls, left, node, right):
+        """
+        Joins two trees, or None, and a single node whose key falls between
+        theirs. Balanced trees override it to stay balanced.
+        Returns:
+            the root of the joined tree
+        """
+        node.left = left
+        node.right = right
+        return node
+
+    def _root_or_none(self):
+        if self.parent is not None:
+            raise ValueError('split and join work on whole trees')
+        return None if self.is_empty() else self
+
+    def split(self, key):
+        """
+        Splits the tree in two: the keys smaller than key and the others.
+        It reuses the nodes, the tree must not be used afterwards.
+        Joining the subtrees met on the way down costs O(height) for the
+        balanced trees.
+        Returns:
+            (left, right), two trees of this type
+        """
+        cls = type(self)
+        root = self._root_or_none()
+        # the nodes on the way down, each with the subtree that stays on
+        # its side of the split
+        path = []
+        while root is not None:
+            left, right = root._detach()
+            if root.key < key:
+                path.append((root, left))
+                root = right
+            else:
+                path.append((root, right))
+                root = left
+        lower = upper = None
+        for node, subtree in reversed(path):
+            if node.key < key:
+                lower = cls._join3(subtree, node, lower)
+            else:
+                upper = cls._join3(upper, node, subtree)
+        return (lower if lower is not None else cls(),
+                upper if upper is not None else cls())
+
+    @classmethod
+    def _split_first(cls, root):
+        """
+        Takes the smallest node out of a tree.
+        Returns:
+            (the smallest node, the root of the rest or None)
+        """
+        path = []
+        while root is not None:
+            left, right = root._detach()
+            path.append((root, right))
+            root = left
+        first, rest = path.pop()
+        for node, right in reversed(path):
+            rest = cls._join3(rest, node, right)
+        return first, rest
+
+    @classmethod
+    def join(cls, left, right):
+        """
+        Joins two trees where every key of left is smaller than or equal to
+        every key of right, in O(height) for the balanced trees. It reuses
+        the nodes, left and right must not be used afterwards.
+        Returns:
+            the joined tree
+        """
+        left_root = left._root_or_none()
+        right_root = right._root_or_none()
+        if left_root is None:
+            return right
+        if right_root is None:
+            return left
+        if right.min().key < left.max().key:
+            raise ValueError('the keys of left must come before the keys '
+                             'of right')
+        first, rest = cls._split_first(right_root)
+        return cls._join3(left_root, first, rest)
+
+    def is_empty(self):
+        """
+        An empty tree is a root without key, as left by removing its last node
+        """
+        return self.key is None and self.is_leaf()
+
+    def _new_node(self, key, item):
+        """
+        Creates a node to be inserted in this tree
+        """
+        return type(self)(key, item)
+
     def insert(self, key, item):
         """
         Insert a new item in the BST
@@ -298,21 +1151,52 @@ class BinarySearchTree(BinaryTree):
             key - the item key
             item - the item value
         """
+        if self.is_empty():
+            self.key = key
+            self.item = item
+            self._invalidate_caches()
+            return self
         tree = self
         aux = tree
-        while tree:
-            aux = tree
-            if key < tree.key:
-                tree = tree.left
-            else:
-                tree = tree.right
-        newtree = BinarySearchTree(key, item)
+        try:
+            while tree is not None:
+                aux = tree
+                if key < tree.key:
+                    tree = tree._left
+                else:
+                    tree = tree._right
+                # the new node will be in this subtree
+                aux.size += 1
+        except Exception:
+            # a key that does not compare leaves the sizes as they were
+            tree = aux.parent if aux is not self else None
+            while tree is not None:
+                tree.size -= 1
+                tree = tree.parent if tree is not self else None
+            raise
+        newtree = self._new_node(key, item)
+        newtree._parent = weakref.ref(aux)
         if key < aux.key:
-            aux.left = newtree
+            aux._left = newtree
+        else:
+            aux._right = newtree
+        # the sizes are counted already, the heights and whatever
+        # subclasses cache only change up to the first node left unchanged
+        aux._update_path()
+        parent = self.parent
+        if parent is None:
+            self._invalidate_caches()
         else:
-            aux.right = newtree
+            parent.propagate_metadata()
         return newtree
 
+    def _insert(self, key, item):
+        """
+        Inserts without looking for the node that holds key afterwards,
+        trees that rotate override it
+        """
+        self.insert(key, item)
+
     def __setitem__(self, key, val):
         self.insert(key, val)
 
@@ -322,46 +1206,200 @@ class BinarySearchTree(BinaryTree):
     def remove(self, key):
         """
         Remove an item of the tree.
+        Raises KeyError if the key is not in the tree.
+        Returns:
+            the lowest node whose subtree changed, or None
         """
         node = self.search(key)
-        if not node.right and not node.left:
-            node.remove_node()
+        if node is None:
+            raise KeyError(key)
+        if node.right is None and node.left is None:
+            return node.remove_node()
         else:
-            node.remove_root()
+            return node.remove_root()
+
+    @contextmanager
+    def _batch(self):
+        """
+        Defers the metadata updates of a batch of changes, the lookup cache
+        is off meanwhile: it is only emptied once the batch is done
+        """
+        if self.parent is not None:
+            raise ValueError('batches work on whole trees')
+        cache, self._cache = self._cache, None
+        try:
+            with self._deferred_metadata():
+                yield
+        finally:
+            self._cache = cache
+            if cache is not None:
+                cache.clear()
+
+    def _rebuild(self, items):
+        """
+        Replaces the content of this root with a balanced tree of sorted
+        (key, item) pairs, in O(n)
+        """
+        tree = type(self).from_sorted(items)
+        # the old children go first, the new payload never meets them: an
+        # empty tree with children is not a valid tree
+        self.left = None
+        self.right = None
+        self._swap_payload(tree)
+        self.left = tree.left
+        self.right = tree.right
+
+    def insert_many(self, items):
+        """
+        Inserts a batch of (key, item) pairs. The batch is sorted, and the
+        sizes and heights above the new nodes are updated once for the
+        whole batch instead of once per insert. A batch bigger than the
+        tree / REBUILD_RATIO is merged with the keys of the tree instead,
+        and the tree rebuilt balanced, in O(n + k).
+        """
+        items = sorted(items, key=itemgetter(0))
+        if not items:
+            return
+        if len(items) * REBUILD_RATIO > len(self):
+            if self.parent is not None:
+                raise ValueError('batches work on whole trees')
+            current = [] if self.is_empty() else [
+                (node.key, node.item) for node in self.iter_in_order()]
+            # the new items come after the equal keys, as with insert
+            self._rebuild(heapq.merge(current, items, key=itemgetter(0)))
+            return
+        with self._batch():
+            for key, item in items:
+                self._insert(key, item)
+
+    def remove_many(self, keys):
+        """
+        Removes a batch of keys, a key listed twice removes two nodes. The
+        tree is left untouched if a key is missing. Like insert_many, it
+        updates the metadata once, or rebuilds the tree for big batches.
+        Raises KeyError if a key is not in the tree.
+        """
+        keys = sorted(keys)
+        if not keys:
+            return
+        if len(keys) * REBUILD_RATIO > len(self):
+            if self.parent is not None:
+                raise ValueError('batches work on whole trees')
+            kept = []
+            i = 0
+            for node in ([] if self.is_empty() else self.iter_in_order()):
+                if i < len(keys) and keys[i] < node.key:
+                    raise KeyError(keys[i])
+                if i < len(keys) and not node.key < keys[i]:
+                    i += 1
+                else:
+                    kept.append((node.key, node.item))
+            if i < len(keys):
+                raise KeyError(keys[i])
+            self._rebuild(kept)
+            return
+        for key, group in groupby(keys):
+            count = len(list(group))
+            if count == 1:
+                found = self.search(key) is not None
+            else:
+                found = count <= sum(1 for _ in takewhile(
+                    lambda node: not key < node.key, self.range(key)))
+            if not found:
+                raise KeyError(key)
+        with self._batch():
+            for key in keys:
+                self.remove(key)
 
     def remove_node(self):
         """
         Remove a node that is  not the root of the tree.
+        Returns the parent it was removed from.
         """
         parent = self.parent
-        if parent:
-            if parent.right == self:
+        if parent is not None:
+            if parent.right is self:
                 parent.right = None
             else:
                 parent.left = None
         else:
             self.key = None
             self.item = None
+            self._invalidate_caches()
+        return parent
 
     def remove_root(self):
+        """
+        Remove a node that has children, by pulling up its only child or
+        by replacing it with its in-order predecessor.
+        Returns the lowest node whose subtree changed.
+        """
         # The tree only has a left child
         if self.right is None and self.left is not None:
             copy_node(self.left, self)
+            return self
         # The tree only has a right child
         if self.left is None and self.right is not None:
             copy_node(self.right, self)
+            return self
         # The tree has two children
-        if self.left is None and self.right is not None:
-            node = self.left
-            while node:
-                tree = node
-                node = node.right
-            old_left = self.left
-            old_right = self.right
-            copy_node(tree, self)
-            tree.remove_node()
-            self.left = old_left
-            self.right = old_right
+        tree = self.left
+        while tree.right is not None:
+            tree = tree.right
+        self.key = tree.key
+        self.item = tree.item
+        if tree.left is None:
+            return tree.remove_node()
+        return tree.remove_root()
+
+    def _swap_payload(self, other):
+        """
+        Swaps everything a node carries with it, apart from its links
+        """
+        self.key, other.key = other.key, self.key
+        self.item, other.item = other.item, self.item
+
+    def rotate_left(self):
+        """
+        Left rotation, done in place: this node keeps its position and takes
+        the payload of its right child, so the root of a tree stays the
+        same object. The links are set directly and only the two nodes it
+        moves are updated: the callers update the ancestors, once, after
+        all their rotations.
+        """
+        nnew = self._right
+        assert nnew is not None
+        self._swap_payload(nnew)
+        a, b, c = self._left, nnew._left, nnew._right
+        nnew._left, nnew._right = a, b
+        self._left, self._right = nnew, c
+        ref = weakref.ref(nnew)
+        for child in (a, b):
+            if child is not None:
+                child._parent = ref
+        if c is not None:
+            c._parent = weakref.ref(self)
+        nnew.update_metadata()
+        self.update_metadata()
+
+    def rotate_right(self):
+        """
+        Right rotation, done in place like rotate_left
+        """
+        nnew = self._left
+        assert nnew is not None
+        self._swap_payload(nnew)
+        a, b, c = nnew._left, nnew._right, self._right
+        nnew._left, nnew._right = b, c
+        self._left, self._right = a, nnew
+        ref = weakref.ref(nnew)
+        for child in (b, c):
+            if child is not None:
+                child._parent = ref
+        if a is not None:
+            a._parent = weakref.ref(self)
+        nnew.update_metadata()
+        self.update_metadata()
 
 
 class RedBlackTree(BinarySearchTree):
@@ -371,77 +1409,406 @@ class RedBlackTree(BinarySearchTree):
                                            right=right)
         self.black = black
 
-    def insert(self, key, item):
+    @classmethod
+    def _bulk_node(cls, key, item, depth, height):
+        # all the leaves of a bulk loaded tree are on the last two levels,
+        # painting the last level red keeps the black height even
+        return cls(key, item, black=(depth < height or depth == 1))
+
+    def _swap_payload(self, other):
+        super(RedBlackTree, self)._swap_payload(other)
+        self.black, other.black = other.black, self.black
+
+    def _insert(self, key, item):
         newtree = super(RedBlackTree, self).insert(key, item)
         # new nodes are painted red
         newtree.black = False
-        self.repair_tree()
-        return newtree
+        newtree.repair_tree()
 
-    def get_uncle(self):
-        if self.parent is None:
-            return
-        if self == self.parent.left:
-            return self.parent.right
+    def insert(self, key, item):
+        self._insert(key, item)
+        # rotations move payloads around, find where the new key landed
+        return self.search(key)
+
+    @staticmethod
+    def _black_height(tree):
+        height = 0
+        while tree is not None:
+            if tree.black:
+                height += 1
+            tree = tree.left
+        return height
+
+    @classmethod
+    def _join3(cls, left, node, right):
+        """
+        The root of the higher tree keeps its place: the node is hung, red,
+        on its spine where the black heights match and repaired like an
+        insert.
+        """
+        for tree in (left, right):
+            if tree is not None:
+                tree.black = True
+        hl = cls._black_height(left)
+        hr = cls._black_height(right)
+        if hl == hr:
+            node.black = True
+            return super(RedBlackTree, cls)._join3(left, node, right)
+        node.black = False
+        if hl > hr:
+            root, tree, height = left, left, hl
+            while tree is not None and not (tree.black and height == hr):
+                height -= 1 if tree.black else 0
+                parent, tree = tree, tree.right
+            node.left = tree
+            node.right = right
+            parent.right = node
         else:
-            return self.parent.left
+            root, tree, height = right, right, hr
+            while tree is not None and not (tree.black and height == hl):
+                height -= 1 if tree.black else 0
+                parent, tree = tree, tree.left
+            node.left = left
+            node.right = tree
+            parent.left = node
+        node.repair_tree()
+        return root
 
-    def repair_tree(self):
-        uncle = self.get_uncle()
+    def get_uncle(self):
+        """
+        The sibling of this node's parent
+        """
         parent = self.parent
-        grandpa = None
-        if parent:
-            grandpa = self.parent.parent or None
         if parent is None:
-            self.black = True
-        elif parent.black:
             return
-        elif uncle is not None and uncle.black is not True:
-            parent.black = True
-            uncle.black = True
-            if grandpa:
+        grandpa = parent.parent
+        if grandpa is None:
+            return
+        if parent is grandpa.left:
+            return grandpa.right
+        else:
+            return grandpa.left
+
+    def repair_tree(self):
+        """
+        Restores the red black properties after this red node was inserted
+        """
+        node = self
+        while True:
+            parent = node.parent
+            if parent is None:
+                node.black = True
+                return
+            if parent.black:
+                return
+            uncle = node.get_uncle()
+            grandpa = parent.parent
+            if uncle is not None and not uncle.black:
+                parent.black = True
+                uncle.black = True
                 grandpa.black = False
-                grandpa.repair_tree()
-        elif grandpa is not None:
-            if self == parent.left and parent == grandpa.right:
-                parent.rotate_left()
-                self = self.left
-            elif self == parent.right and parent == grandpa.left:
-                parent.rotate_right()
-                self = self.right
-            if self == parent.left:
+                node = grandpa
+                continue
+            if parent is grandpa.left:
+                if node is parent.right:
+                    parent.rotate_left()
                 grandpa.rotate_right()
+                grandpa.right.black = False
             else:
+                if node is parent.left:
+                    parent.rotate_right()
                 grandpa.rotate_left()
-            parent.black = True
-            grandpa.black = False
+                grandpa.left.black = False
+            # rotations are in place, grandpa now holds the subtree root
+            grandpa.black = True
+            # they only updated the nodes they moved
+            parent = grandpa.parent
+            if parent is not None:
+                parent._update_path()
+            return
 
-    def rotate_left(self):
-        nnew = self.right
-        parent = self.parent
-        assert nnew is not None
-        self.right = nnew.left
-        nnew.left = self
-        self.parent = nnew
-        if self.right is not None:
-            self.right.parent = self
-        if parent is not None:
-            if self == parent.left:
-                parent.left = nnew
-            elif self == parent.right:
-                parent.right = nnew
 
-    def rotate_right(self):
-        nnew = self.left
-        parent = self.parent
-        assert nnew is not None
-        self.left = nnew.right
-        nnew.right = self
-        self.parent = nnew
-        if self.left is not None:
-            self.left.parent = self
+class AVLTree(BinarySearchTree):
+    """
+    An AVL Tree (en.wikipedia.org/wiki/AVL_tree)
+    The heights of the two child subtrees of any node differ by at most
+    one, both insert and remove rebalance the tree.
+    """
+
+    def balance_factor(self):
+        hl = self._left.height if self._left is not None else 0
+        hr = self._right.height if self._right is not None else 0
+        return hl - hr
+
+    def rebalance(self):
+        """
+        Rotates this node if its subtrees heights differ by more than one
+        """
+        balance = self.balance_factor()
+        if balance > 1:
+            if self.left.balance_factor() < 0:
+                self.left.rotate_left()
+            self.rotate_right()
+        elif balance < -1:
+            if self.right.balance_factor() > 0:
+                self.right.rotate_right()
+            self.rotate_left()
+
+    def _rebalance_path(self, tree):
+        while tree is not None:
+            tree.update_metadata()
+            tree.rebalance()
+            tree = tree.parent
+
+    @classmethod
+    def _join3(cls, left, node, right):
+        """
+        The root of the higher tree keeps its place: the node is hung on
+        its spine where the heights differ by at most one, and the path
+        above is rebalanced.
+        """
+        hl = left.height if left is not None else 0
+        hr = right.height if right is not None else 0
+        if hl > hr + 1:
+            tree = left
+            while tree is not None and tree.height > hr + 1:
+                parent, tree = tree, tree.right
+            node.left = tree
+            node.right = right
+            parent.right = node
+            left._rebalance_path(parent)
+            return left
+        if hr > hl + 1:
+            tree = right
+            while tree is not None and tree.height > hl + 1:
+                parent, tree = tree, tree.left
+            node.left = left
+            node.right = tree
+            parent.left = node
+            right._rebalance_path(parent)
+            return right
+        return super(AVLTree, cls)._join3(left, node, right)
+
+    def _insert(self, key, item):
+        newtree = super(AVLTree, self).insert(key, item)
+        self._rebalance_path(newtree.parent)
+
+    def insert(self, key, item):
+        self._insert(key, item)
+        # rotations move payloads around, find where the new key landed
+        return self.search(key)
+
+    def remove(self, key):
+        tree = super(AVLTree, self).remove(key)
+        self._rebalance_path(tree)
+
+
+class Treap(BinarySearchTree):
+    """
+    A randomized Treap (en.wikipedia.org/wiki/Treap)
+    Keys are in search tree order and random priorities are in heap order,
+    which keeps the expected height logarithmic through inserts and removes.
+    """
+
+    def __init__(self, key=None, item=None, left=None, right=None,
+                 priority=None):
+        super(Treap, self).__init__(key=key, item=item, left=left,
+                                    right=right)
+        self.priority = random.random() if priority is None else priority
+
+    @classmethod
+    def from_sorted(cls, items):
+        tree = super(Treap, cls).from_sorted(items)
+        # hand out priorities in decreasing order, level by level,
+        # so every parent outranks its children
+        level = [tree]
+        nodes = []
+        while level:
+            nodes += level
+            level = [child for node in level
+                     for child in (node.left, node.right)
+                     if child is not None]
+        priorities = sorted((random.random() for node in nodes), reverse=True)
+        for node, priority in zip(nodes, priorities):
+            node.priority = priority
+        return tree
+
+    def _swap_payload(self, other):
+        super(Treap, self)._swap_payload(other)
+        self.priority, other.priority = other.priority, self.priority
+
+    def insert(self, key, item):
+        node = super(Treap, self).insert(key, item)
+        # bubble the new node up until the heap order is restored
+        parent = node.parent
+        while parent is not None and parent.priority < node.priority:
+            if node is parent.left:
+                parent.rotate_right()
+            else:
+                parent.rotate_left()
+            node = parent
+            parent = node.parent
         if parent is not None:
-            if self == parent.left:
-                parent.left = nnew
-            elif self == parent.right:
-                parent.right = nnew
+            # the rotations only updated the nodes they moved
+            parent._update_path()
+        return node
+
+    @classmethod
+    def _join3(cls, left, node, right):
+        """
+        The node becomes the root and sinks below the children that
+        outrank it, like a removal that stops half way
+        """
+        root = super(Treap, cls)._join3(left, node, right)
+        while True:
+            child = node.left
+            if child is None or (node.right is not None and
+                                 node.right.priority > child.priority):
+                child = node.right
+            if child is None or child.priority <= node.priority:
+                # every rotation updated its nodes before the ones below
+                # moved, update the whole path
+                tree = node.parent
+                while tree is not None:
+                    tree.update_metadata()
+                    tree = tree.parent
+                return root
+            if child is node.left:
+                node.rotate_right()
+                node = node.right
+            else:
+                node.rotate_left()
+                node = node.left
+
+    def remove(self, key):
+        node = self.search(key)
+        if node is None:
+            raise KeyError(key)
+        # sink the node down to a leaf, keeping the heap order
+        while not node.is_leaf():
+            if node.left is None or (node.right is not None and
+                                     node.right.priority > node.left.priority):
+                node.rotate_left()
+                node = node.left
+            else:
+                node.rotate_right()
+                node = node.right
+        return node.remove_node()
+
+
+class SplayTree(BinarySearchTree):
+    """
+    A Splay Tree (en.wikipedia.org/wiki/Splay_tree)
+    Every search, insert and remove moves the node it reached up to the
+    root with rotations, so recently used keys stay near the top. There is
+    no balance guarantee, but any sequence of m operations costs
+    O(m log n), and much less on skewed or sequential access: reaching a
+    key d positions away from the last one costs O(log d) amortized.
+    Searches change the shape of the tree, lookups are writes for
+    ConcurrentTree and the like.
+    """
+    mutating_search = True
+
+    def _splay(self, node):
+        """
+        Moves the payload of node up to this node with zig-zig and zig-zag
+        steps, in O(depth). Rotations are done in place, so the payload
+        climbs while the nodes keep their places.
+        """
+        while node is not self:
+            parent = node.parent
+            grandparent = parent.parent if parent is not self else None
+            if grandparent is None:
+                if node is parent.left:
+                    parent.rotate_right()
+                else:
+                    parent.rotate_left()
+                node = parent
+                continue
+            if node is parent.left:
+                if parent is grandparent.left:
+                    grandparent.rotate_right()
+                    grandparent.rotate_right()
+                else:
+                    parent.rotate_right()
+                    grandparent.rotate_left()
+            else:
+                if parent is grandparent.right:
+                    grandparent.rotate_left()
+                    grandparent.rotate_left()
+                else:
+                    parent.rotate_left()
+                    grandparent.rotate_right()
+            node = grandparent
+        # the rotations updated the nodes on the path, not the ones above
+        self.propagate_metadata()
+
+    def search(self, key):
+        """
+        Splays the node with key, or the last node met when it is missing
+        Returns:
+            this node, that now holds key, or None
+        """
+        cache = self._cache
+        if cache is not None:
+            tree = cache.get(key, _MISSING)
+            if tree is not _MISSING:
+                return tree
+        tree = self._splay_key(key)
+        if cache is not None:
+            cache.put(key, tree)
+        return tree
+
+    def _splay_key(self, key):
+        """
+        The descent and splay of search, without the lookup cache
+        """
+        tree = None if self.is_empty() else self
+        last = None
+        while tree is not None:
+            last = tree
+            if key == tree.key:
+                break
+            elif key < tree.key:
+                tree = tree.left
+            else:
+                tree = tree.right
+        if last is None:
+            return None
+        if last is not self:
+            # the splay empties the cache
+            self._splay(last)
+        return self if tree is not None else None
+
+    def insert(self, key, item):
+        """
+        Inserts like an unbalanced tree, then splays the new node
+        Returns:
+            this node, that now holds key
+        """
+        node = super(SplayTree, self).insert(key, item)
+        self._splay(node)
+        return self
+
+    def remove(self, key):
+        """
+        Splays the node with key, then replaces it with the largest key on
+        its left, splayed up to the top of the left subtree.
+        Raises KeyError if the key is not in the tree.
+        """
+        # a cache hit would not splay, the key must be at the root
+        if self._splay_key(key) is None:
+            raise KeyError(key)
+        left, right = self.left, self.right
+        if left is None and right is None:
+            return self.remove_node()
+        if left is not None:
+            tree = left
+            while tree.right is not None:
+                tree = tree.right
+            left._splay(tree)
+            # the largest key has no right child now
+            left.right = right
+            right = left
+        copy_node(right, self)
+        return self
@@ -0,0 +1,158 @@
+"""
+A thread safe layer over the Binary Search Trees
+@author: Lia Nemeth
+"""
+
+from bisect import bisect_left
+from contextlib import contextmanager
+from forest.BinaryTree import RedBlackTree
+from forest.BTree import Entry
+from forest.utils import RWLock
+
+
+class ConcurrentTree(object):
+    """
+    Shares one Binary Search Tree between threads.
+    Lookups take a read lock and run in parallel, insert and remove take
+    the write lock, so rotations never happen under a reader. Lookups of a
+    tree whose search rotates, a SplayTree, take the write lock too.
+    Lookups return Entries, not nodes: rotations move keys between nodes,
+    so a node is only meaningful while the lock is held.
+    Iterating works on a snapshot of the entries, taken the first time
+    it is needed after a write and shared by every reader until the next
+    one: iterators never hold the lock and never see a half done write.
+    """
+    def __init__(self, tree=None):
+        """
+        Constructor method
+        Args:
+            tree - *optional* the tree to share, an empty RedBlackTree by
+                   default. It must not be used directly afterwards.
+        """
+        self.tree = tree if tree is not None else RedBlackTree()
+        self.lock = RWLock()
+        # (entries, keys) as of the last write, None when stale
+        self._snapshot = None
+
+    def __str__(self):
+        return '<{type} - {tree}>'.format(type=type(self).__name__,
+                                          tree=self.tree)
+
+    def __len__(self):
+        with self.lock.read_locked():
+            return len(self.tree)
+
+    def _lookup_locked(self):
+        # lookups of trees whose searches rotate, like SplayTree, are writes
+        if getattr(self.tree, 'mutating_search', False):
+            return self.lock.write_locked()
+        return self.lock.read_locked()
+
+    def search(self, key):
+        """
+        Returns:
+            an Entry with key and item, or None if the key is not found
+        """
+        with self._lookup_locked():
+            node = self.tree.search(key)
+            if node is not None:
+                return Entry(node.key, node.item)
+
+    def __getitem__(self, key):
+        return self.search(key)
+
+    def get(self, key, default=None):
+        entry = self.search(key)
+        return default if entry is None else entry.item
+
+    def __contains__(self, key):
+        with self._lookup_locked():
+            return self.tree.search(key) is not None
+
+    def search_many(self, keys, default=None):
+        with self.lock.read_locked():
+            return self.tree.search_many(keys, default)
+
+    def contains_many(self, keys):
+        with self.lock.read_locked():
+            return self.tree.contains_many(keys)
+
+    def insert(self, key, item):
+        with self.lock.write_locked():
+            self.tree.insert(key, item)
+            self._snapshot = None
+
+    def __setitem__(self, key, val):
+        self.insert(key, val)
+
+    def remove(self, key):
+        """
+        Raises KeyError if the key is not in the tree
+        """
+        with self.lock.write_locked():
+            self.tree.remove(key)
+            self._snapshot = None
+
+    def __delitem__(self, key):
+        self.remove(key)
+
+    def insert_many(self, items):
+        with self.lock.write_locked():
+            self.tree.insert_many(items)
+            self._snapshot = None
+
+    def remove_many(self, keys):
+        """
+        Raises KeyError, and removes nothing, if a key is not in the tree
+        """
+        with self.lock.write_locked():
+            self.tree.remove_many(keys)
+            self._snapshot = None
+
+    @contextmanager
+    def writing(self):
+        """
+        Holds the write lock for a batch of changes made directly on the
+        tree:
+            with shared.writing() as tree:
+                ...
+        """
+        with self.lock.write_locked():
+            try:
+                yield self.tree
+            finally:
+                self._snapshot = None
+
+    def _get_snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        with self.lock.read_locked():
+            # several readers may rebuild it at once, they build the same
+            snapshot = self._snapshot
+            if snapshot is None:
+                tree = self.tree
+                entries = () if tree.is_empty() else tuple(
+                    Entry(node.key, node.item) for node in tree)
+                snapshot = (entries, [entry.key for entry in entries])
+                self._snapshot = snapshot
+            return snapshot
+
+    def snapshot(self):
+        """
+        Returns:
+            a tuple of the Entries in key order, as of the last write
+        """
+        return self._get_snapshot()[0]
+
+    def __iter__(self):
+        return iter(self.snapshot())
+
+    def range(self, lo=None, hi=None):
+        """
+        Iterates over the Entries with lo <= key < hi of a snapshot
+        """
+        entries, keys = self._get_snapshot()
+        start = 0 if lo is None else bisect_left(keys, lo)
+        end = len(entries) if hi is None else bisect_left(keys, hi)
+        return iter(entries[start:end])
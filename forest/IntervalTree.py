@@ -0,0 +1,100 @@
+"""
+Interval Tree, an augmented Red Black Tree
+@author: Lia Nemeth
+"""
+
+from forest.BinaryTree import RedBlackTree
+
+
+class IntervalTree(RedBlackTree):
+    """
+    An Interval Tree (en.wikipedia.org/wiki/Interval_tree#Augmented_tree)
+    Keys are closed intervals, (low, high) tuples, ordered by low. Every
+    node also keeps max_end, the highest end in its subtree: a subtree
+    whose max_end is below a query can be skipped whole. max_end is
+    maintained by update_metadata, so the rotations and the repairs keep
+    it right.
+    """
+
+    def __init__(self, key=None, item=None, left=None, right=None,
+                 black=True):
+        self.max_end = key[1] if key is not None else None
+        super(IntervalTree, self).__init__(key=key, item=item, left=left,
+                                           right=right, black=black)
+
+    def update_metadata(self):
+        changed = super(IntervalTree, self).update_metadata()
+        end = self.key[1] if self.key is not None else None
+        for child in (self._left, self._right):
+            if child is not None and (end is None or child.max_end > end):
+                end = child.max_end
+        if end != self.max_end:
+            self.max_end = end
+            changed = True
+        return changed
+
+    def _insert(self, key, item):
+        low, high = key
+        if high < low:
+            raise ValueError('{key} ends before it starts'.format(key=key))
+        empty = self.is_empty()
+        super(IntervalTree, self)._insert((low, high), item)
+        if empty:
+            # the key was set on the root, not through a child link
+            self.update_metadata()
+
+    def insert(self, key, item):
+        """
+        Insert an interval
+        Args:
+            key - a (low, high) tuple, with low <= high
+            item - the item value
+        """
+        return super(IntervalTree, self).insert(tuple(key), item)
+
+    def add(self, low, high, item=None):
+        return self.insert((low, high), item)
+
+    def overlap(self, low, high):
+        """
+        Lazily yields the nodes whose interval overlaps [low, high], ordered
+        by their start, in O(log n + k) for k results
+        """
+        stack = []
+        tree = None if self.is_empty() else self
+        while tree is not None or stack:
+            if tree is not None:
+                if tree.max_end < low:
+                    # everything below ends before the query starts
+                    tree = None
+                else:
+                    stack.append(tree)
+                    tree = tree.left
+            else:
+                tree = stack.pop()
+                if high < tree.key[0]:
+                    # this one and all the next ones start after the query
+                    return
+                if not tree.key[1] < low:
+                    yield tree
+                tree = tree.right
+
+    def stab(self, point):
+        """
+        Lazily yields the nodes whose interval contains point
+        """
+        return self.overlap(point, point)
+
+    def find_overlap(self, low, high):
+        """
+        Returns any one node overlapping [low, high], or None, in O(log n)
+        """
+        tree = None if self.is_empty() else self
+        while tree is not None:
+            start, end = tree.key
+            if not (high < start or end < low):
+                return tree
+            if tree.left is not None and not tree.left.max_end < low:
+                tree = tree.left
+            else:
+                tree = tree.right
@@ -0,0 +1,400 @@
+"""
+A compact binary file format for trees, read back through mmap.
+@author: Lia Nemeth
+
+The file is a header, the pickled keys and items of every node, and a
+table of fixed size node records in level order:
+
+    header: magic, version, kind, node count, table offset
+    record: key offset, key length, item offset, item length,
+            left (or first child), right (or number of children),
+            parent, flags
+
+Keys and items are pickled, only open files you trust.
+"""
+
+import mmap
+import pickle
+import shutil
+import struct
+import tempfile
+from forest.BinaryTree import (BinaryTree, BinarySearchTree, RedBlackTree,
+                               AVLTree)
+from forest.NaryTree import NaryTree
+from forest.utils import Queue
+
+MAGIC = b'FORESTMM'
+VERSION = 1
+HEADER = struct.Struct('<8sBB6xQQ')
+RECORD = struct.Struct('<QIQIqqqB')
+NONE = -1
+BLACK = 1
+
+# the kind byte of the header tells which class was dumped
+KINDS = [BinaryTree, BinarySearchTree, RedBlackTree, AVLTree, NaryTree]
+
+
+def dump(tree, path):
+    """
+    Writes a tree to path in one level order pass. The node records are
+    spooled to a temporary file and copied after the keys and items, so
+    memory does not grow with the tree.
+    Supports BinaryTree, BinarySearchTree, RedBlackTree, AVLTree and
+    NaryTree.
+    """
+    if type(tree) not in KINDS:
+        raise ValueError('can not dump a {type}'.format(
+            type=type(tree).__name__))
+    nary = isinstance(tree, NaryTree)
+    with open(path, 'wb') as f, tempfile.TemporaryFile() as table:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, 0, 0))
+        offset = HEADER.size
+        queue = Queue()
+        empty = isinstance(tree, BinarySearchTree) and tree.is_empty()
+        if not empty:
+            queue.enqueue((tree, NONE))
+        count = 0
+        # the index the next enqueued node will get
+        next_index = 1
+        while not queue.is_empty():
+            node, parent = queue.dequeue()
+            key = pickle.dumps(node.key, pickle.HIGHEST_PROTOCOL)
+            item = pickle.dumps(node.item, pickle.HIGHEST_PROTOCOL)
+            f.write(key)
+            f.write(item)
+            if nary:
+                # level order keeps the children of a node contiguous
+                first, second = next_index, len(node.children)
+                children = node.children
+            else:
+                first = second = NONE
+                children = []
+                if node.left is not None:
+                    first = next_index + len(children)
+                    children.append(node.left)
+                if node.right is not None:
+                    second = next_index + len(children)
+                    children.append(node.right)
+            for child in children:
+                queue.enqueue((child, count))
+            next_index += len(children)
+            flags = BLACK if getattr(node, 'black', False) else 0
+            table.write(RECORD.pack(offset, len(key), offset + len(key),
+                                    len(item), first, second, parent, flags))
+            offset += len(key) + len(item)
+            count += 1
+        table.seek(0)
+        shutil.copyfileobj(table, f)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, KINDS.index(type(tree)), count,
+                            offset))
+
+
+def open_tree(path):
+    """
+    Maps a dumped tree, returns a MappedBinarySearchTree for search trees,
+    a MappedNaryTree for n-ary trees and a MappedBinaryTree otherwise.
+    """
+    with open(path, 'rb') as f:
+        header = f.read(HEADER.size)
+    if len(header) < HEADER.size or not header.startswith(MAGIC):
+        raise ValueError('{path} is not a tree file'.format(path=path))
+    cls = KINDS[HEADER.unpack(header)[2]]
+    if issubclass(cls, NaryTree):
+        return MappedNaryTree(path)
+    if issubclass(cls, BinarySearchTree):
+        return MappedBinarySearchTree(path)
+    return MappedBinaryTree(path)
+
+
+def load(path):
+    """
+    Reads a dumped tree back into regular nodes, without recursion
+    """
+    with MappedTree(path) as mapped:
+        return mapped.materialize()
+
+
+class MappedNode(object):
+    """
+    A view over one record of a mapped tree. The key and the item are
+    unpickled the first time they are read.
+    """
+    __slots__ = ('tree', 'index', '_record', '_key', '_item')
+
+    def __init__(self, tree, index):
+        self.tree = tree
+        self.index = index
+        self._record = tree._record(index)
+        self._key = self._item = None
+
+    def _view(self, index):
+        if index != NONE:
+            return MappedNode(self.tree, index)
+
+    @property
+    def key(self):
+        if self._key is None:
+            self._key = self.tree._load(self._record[0], self._record[1])
+        return self._key
+
+    @property
+    def item(self):
+        if self._item is None:
+            self._item = self.tree._load(self._record[2], self._record[3])
+        return self._item
+
+    @property
+    def left(self):
+        return self._view(self._record[4])
+
+    @property
+    def right(self):
+        return self._view(self._record[5])
+
+    @property
+    def children(self):
+        first, count = self._record[4], self._record[5]
+        return [MappedNode(self.tree, i) for i in range(first, first + count)]
+
+    @property
+    def parent(self):
+        return self._view(self._record[6])
+
+    @property
+    def black(self):
+        return bool(self._record[7] & BLACK)
+
+    def is_leaf(self):
+        if self.tree.nary:
+            return self._record[5] == 0
+        return self._record[4] == NONE and self._record[5] == NONE
+
+    def __eq__(self, other):
+        return (isinstance(other, MappedNode) and self.tree is other.tree and
+                self.index == other.index)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((id(self.tree), self.index))
+
+    def __str__(self):
+        return '<{type} - {key} : {item}>'.format(type=type(self).__name__,
+                                                   key=self.key,
+                                                   item=self.item)
+
+
+class MappedTree(object):
+    """
+    A read only tree over a file written by dump. The file is mapped, not
+    read: opening is O(1) and the pages are shared by every process that
+    maps the same file. Pickling a MappedTree only sends its path.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        except ValueError:
+            # an empty file can not be mapped
+            self._file.close()
+            raise ValueError('{path} is not a tree file'.format(path=path))
+        magic, version, kind, count, table = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError('{path} is not a tree file'.format(path=path))
+        self.kind = KINDS[kind]
+        self.nary = issubclass(self.kind, NaryTree)
+        self._count = count
+        self._table = table
+
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def __str__(self):
+        return '<{type} - {path}, {size} nodes>'.format(
+            type=type(self).__name__, path=self.path, size=self._count)
+
+    def _record(self, index):
+        return RECORD.unpack_from(self._map,
+                                  self._table + index * RECORD.size)
+
+    def _load(self, offset, length):
+        return pickle.loads(self._map[offset:offset + length])
+
+    def _key(self, index):
+        record = self._record(index)
+        return self._load(record[0], record[1])
+
+    @property
+    def root(self):
+        """
+        A view of the root node, or None if the tree is empty
+        """
+        if self._count:
+            return MappedNode(self, 0)
+
+    def node(self, index):
+        return MappedNode(self, index)
+
+    def iter_level_order(self):
+        """
+        Records are stored in level order, so this is a linear scan
+        """
+        for index in range(self._count):
+            yield MappedNode(self, index)
+
+    def materialize(self):
+        """
+        Builds regular nodes for the whole tree
+        """
+        cls = self.kind
+        if not self._count:
+            return cls()
+        records = [self._record(i) for i in range(self._count)]
+        nodes = []
+        for record in records:
+            node = cls(self._load(record[0], record[1]),
+                       self._load(record[2], record[3]))
+            if cls is RedBlackTree:
+                node.black = bool(record[7] & BLACK)
+            nodes.append(node)
+        # children come after their parents, linking backwards means each
+        # subtree is complete before it is attached
+        for index in range(self._count - 1, -1, -1):
+            node = nodes[index]
+            first, second = records[index][4], records[index][5]
+            if self.nary:
+                node.children = nodes[first:first + second]
+                for child in node.children:
+                    child._set_parent(node)
+                node.update_metadata()
+            else:
+                if first != NONE:
+                    node.left = nodes[first]
+                if second != NONE:
+                    node.right = nodes[second]
+        if self.nary:
+            nodes[0]._update_depths()
+        return nodes[0]
+
+
+class MappedBinaryTree(MappedTree):
+    """
+    A read only mapped Binary Tree
+    """
+    def iter_in_order(self):
+        stack = []
+        index = 0 if self._count else NONE
+        while index != NONE or stack:
+            if index != NONE:
+                stack.append(index)
+                index = self._record(index)[4]
+            else:
+                index = stack.pop()
+                yield MappedNode(self, index)
+                index = self._record(index)[5]
+
+    def __iter__(self):
+        return self.iter_in_order()
+
+    def get_height(self):
+        height = 0
+        stack = [(0, 1)] if self._count else []
+        while stack:
+            index, depth = stack.pop()
+            height = max(height, depth)
+            record = self._record(index)
+            for child in (record[4], record[5]):
+                if child != NONE:
+                    stack.append((child, depth + 1))
+        return height
+
+
+class MappedBinarySearchTree(MappedBinaryTree):
+    """
+    A read only mapped Binary Search Tree, lookups descend through the
+    records and only unpickle the keys on their path.
+    """
+    def _find(self, key):
+        index = 0 if self._count else NONE
+        while index != NONE:
+            record = self._record(index)
+            node_key = self._load(record[0], record[1])
+            if key == node_key:
+                return index
+            elif key < node_key:
+                index = record[4]
+            else:
+                index = record[5]
+        return NONE
+
+    def search(self, key):
+        """
+        Returns a view of the node with key, or None
+        """
+        index = self._find(key)
+        if index != NONE:
+            return MappedNode(self, index)
+
+    def __getitem__(self, key):
+        return self.search(key)
+
+    def __contains__(self, key):
+        return self._find(key) != NONE
+
+
+class MappedNaryTree(MappedTree):
+    """
+    A read only mapped N-ary Tree
+    """
+    def iter_pre_order(self):
+        if not self._count:
+            return
+        stack = [0]
+        while stack:
+            index = stack.pop()
+            yield MappedNode(self, index)
+            first, count = self._record(index)[4:6]
+            stack.extend(range(first + count - 1, first - 1, -1))
+
+    def __iter__(self):
+        return self.iter_pre_order()
+
+    def traversal(self, visit=None, *args, **kwargs):
+        l = []
+        for node in self.iter_pre_order():
+            if visit:
+                visit(node, *args, **kwargs)
+            l.append(node)
+        return l
+
+    def get_height(self):
+        if not self._count:
+            return 0
+        # the last record is on the deepest level
+        height = 1
+        index = self._record(self._count - 1)[6]
+        while index != NONE:
+            height += 1
+            index = self._record(index)[6]
+        return height
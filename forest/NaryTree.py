@@ -4,18 +4,530 @@ N-ary Tree implementations.
 """
 
 import weakref
+from array import array
+from forest import aio, parallel
+from forest.ancestors import AncestorIndex
 
 
-class NaryTree(object):
+# marks a missing child, None can be a key
+_MISSING = object()
+
+
+def _shared_prefix(previous, path, limit):
     """
-    A generic N-ary tree implementation, that uses a list to store
-    its children.
+    The length of the common prefix of two key lists, at most limit
     """
+    shared = 0
+    for a, b in zip(previous[:limit], path):
+        if a != b:
+            break
+        shared += 1
+    return shared
+
+
+class BaseNaryTree(object):
+    """
+    What every N-ary tree node shares, subclasses decide how the node is
+    stored and how it points to its parent.
+    Every node caches the size and the height of its subtree and its own
+    depth, add_child keeps them up to date.
+    """
+    __slots__ = ()
+
+    # nodes with at least this many children index them by key, None
+    # turns the index off
+    child_index_threshold = 16
+
     def __init__(self, key=None, item=None, children=None, parent=None):
         self.key = key
         self.item = item
-        self.children = children or []
-        self._parent = weakref.ref(parent) if parent else None
+        self.children = children or self._no_children()
+        self._set_parent(parent)
+        self._depth = parent._depth + 1 if parent is not None else 1
+        self.size = 1
+        self.height = 1
+        if self.children:
+            for child in self.children:
+                child._set_parent(self)
+            self._update_depths()
+            self.update_metadata()
+
+    def __str__(self):
+        return '<{type} - {key} : {item}>'.format(type=type(self).__name__, 
+                                                   key=self.key, 
+                                                   item=self.item)
+    def is_leaf(self):
+        return len(self.children) == 0
+
+    def get_height(self):
+        """
+        The height is cached on every node, a leaf has height 1
+        """
+        return self.height
+
+    def __len__(self):
+        """
+        The number of nodes in this subtree, it is cached on every node
+        """
+        return self.size
+
+    def __bool__(self):
+        # a node is always true, whatever its size
+        return True
+
+    __nonzero__ = __bool__
+
+    def depth(self):
+        """
+        The level of this node, the root is on level 1
+        """
+        return self._depth
+
+    def update_metadata(self):
+        """
+        Recomputes size and height from the children, O(fan-out).
+        Returns:
+            True if anything changed
+        """
+        size = 1
+        height = 0
+        for child in self.children:
+            size += child.size
+            if child.height > height:
+                height = child.height
+        height += 1
+        if size == self.size and height == self.height:
+            return False
+        self.size = size
+        self.height = height
+        return True
+
+    def _update_depths(self):
+        """
+        Recomputes the depth of every node below this one
+        """
+        level = self.children
+        depth = self._depth
+        while level:
+            depth += 1
+            for node in level:
+                node._depth = depth
+            level = [child for node in level for child in node.children]
+
+    def _invalidate_caches(self):
+        """
+        Called on the root when the shape of the tree changed, subclasses
+        drop whatever they derived from it.
+        """
+        if getattr(self, '_ancestors', None) is not None:
+            self._ancestors = None
+
+    def ancestor_index(self):
+        """
+        Returns an AncestorIndex for O(1) ancestor and lowest common
+        ancestor queries. It is built in O(n log n) the first time and
+        kept on the root until add_child changes the tree.
+        """
+        index = getattr(self, '_ancestors', None)
+        if index is None:
+            index = AncestorIndex(self, BaseNaryTree._children)
+            if self.parent is None:
+                self._ancestors = index
+        return index
+
+    def traversal(self, visit=None, *args, **kwargs):
+        """
+        Pre-order traversal.
+        Args:
+            visit - *optional* A callable object
+            *args - Will be passed to visit
+            **kwargs -  Will be passed to visit
+        Returns:
+            a list containing all nodes pre order
+        """
+        l = []
+        for node in self.iter_pre_order():
+            if visit:
+                visit(node, *args, **kwargs)
+            l.append(node)
+        return l
+
+    def __aiter__(self):
+        """
+        `async for` iterates over the whole tree in pre-order, like
+        traversal
+        """
+        return aio.aiter_nodes(self.iter_pre_order())
+
+    def aiter_visit(self, visit, concurrency=8, order='pre',
+                    ordered=True):
+        """
+        Asynchronous traversal: runs visit on every node with at most
+        concurrency visits running at once, and yields (node, result)
+        pairs. Nodes are only taken from the tree when a slot is free.
+        Args:
+            visit - a function or a coroutine function, called with each
+                    node
+            concurrency - *optional* the most visits running at once
+            order - *optional* 'pre', 'post' or 'level'
+            ordered - *optional* yield in the traversal order, or in the
+                      order the visits complete
+        """
+        if order not in ('pre', 'post', 'level'):
+            raise ValueError('unknown order {order}'.format(order=order))
+        nodes = getattr(self, 'iter_{order}_order'.format(order=order))()
+        return aio.avisit(nodes, visit, concurrency, ordered)
+
+    async def atraverse(self, visit, concurrency=8, order='pre'):
+        """
+        Awaits visit on every node, concurrency at a time.
+        Returns:
+            a list of the results of visit, in the traversal order
+        """
+        return [result async for _, result in
+                self.aiter_visit(visit, concurrency, order)]
+
+    def _children(self):
+        return self.children
+
+    def compile(self):
+        """
+        Returns:
+            a frozen CompiledNaryTree copy of this subtree
+        """
+        return CompiledNaryTree.from_tree(self)
+
+    def parallel_map(self, func, executor=None, order='pre', pieces=None):
+        """
+        Calls func on every node, on a pool of workers: the tree is cut into
+        disjoint subtrees and each one is sent as a single task.
+        Args:
+            func - called with each node
+            executor - *optional* a concurrent.futures executor, by default
+                       a ProcessPoolExecutor is created and shut down
+            order - *optional* 'pre' or 'post'
+            pieces - *optional* how many subtrees to cut the tree into
+        Returns:
+            a list of the results of func, in the traversal order
+        """
+        if order == 'in':
+            raise ValueError('N-ary trees have no in-order')
+        return parallel.parallel_map(self, BaseNaryTree._children, func,
+                                     order, executor, pieces)
+
+    def map_reduce(self, map_fn, reduce_fn, initial=parallel._MISSING,
+                   executor=None, order='pre', pieces=None):
+        """
+        Maps every node on a pool of workers and folds the results with
+        reduce_fn, in the traversal order. reduce_fn must be associative,
+        each subtree is reduced by its worker.
+        """
+        if order == 'in':
+            raise ValueError('N-ary trees have no in-order')
+        return parallel.map_reduce(self, BaseNaryTree._children, map_fn,
+                                   reduce_fn, order, initial, executor,
+                                   pieces)
+
+    def iter_pre_order(self):
+        """
+        Lazy pre-order traversal, it keeps a stack of O(height) iterators
+        """
+        yield self
+        stack = [iter(self.children)]
+        while stack:
+            for child in stack[-1]:
+                yield child
+                stack.append(iter(child.children))
+                break
+            else:
+                stack.pop()
+
+    def iter_post_order(self):
+        """
+        Lazy post-order traversal, it keeps a stack of O(height) iterators
+        """
+        stack = [(self, iter(self.children))]
+        while stack:
+            node, children = stack[-1]
+            for child in children:
+                stack.append((child, iter(child.children)))
+                break
+            else:
+                stack.pop()
+                yield node
+
+    def iter_level_order(self, max_depth=None):
+        """
+        Lazy level-order traversal, it keeps the nodes of one level
+        Args:
+            max_depth - *optional* stop after this level, the root is on
+                        level 1
+        """
+        level = [self]
+        depth = 0
+        while level and depth != max_depth:
+            depth += 1
+            children = []
+            for node in level:
+                yield node
+                children.extend(node.children)
+            level = children
+
+    def search_level_order(self, predicate, max_depth=None):
+        """
+        Lazy Breadth First Search for every node matching a predicate.
+        Args:
+            predicate - A callable object that takes a node
+            max_depth - *optional* do not look below this level
+        Returns:
+            a generator of the matching nodes, level by level
+        """
+        for node in self.iter_level_order(max_depth):
+            if predicate(node):
+                yield node
+
+    def breadth_first_search(self, key, max_depth=None):
+        """
+        Returns the first node with key in level order, or None
+        """
+        for node in self.search_level_order(lambda node: node.key == key,
+                                            max_depth):
+            return node
+
+    def _child_map(self):
+        """
+        Returns the key to child dict of this node, or None below
+        child_index_threshold children. The dict is built the first time
+        and kept in sync by add_child and remove_child; a children list
+        replaced by another one is noticed, a list edited in place is not:
+        call invalidate_child_index after such edits.
+        """
+        children = self.children
+        if (self.child_index_threshold is None
+                or len(children) < self.child_index_threshold):
+            return None
+        index = getattr(self, '_child_index', None)
+        if index is None or index[0] is not children:
+            keys = {}
+            try:
+                # the first child with a key wins, as in a linear scan
+                for child in reversed(children):
+                    keys[child.key] = child
+            except TypeError:
+                # unhashable keys, stay with the scan
+                return None
+            index = self._child_index = [children, keys]
+        return index[1]
+
+    def invalidate_child_index(self):
+        """
+        Drops the key to child index, for children lists edited by hand
+        """
+        self._child_index = None
+
+    def get_child(self, key, default=None):
+        """
+        Returns the first child with key, or default. Nodes with many
+        children look it up in a hashed index, O(1), the others scan them.
+        """
+        keys = self._child_map()
+        if keys is not None:
+            return keys.get(key, default)
+        for child in self.children:
+            if child.key == key:
+                return child
+        return default
+
+    @staticmethod
+    def _path_keys(path, sep):
+        if isinstance(path, str):
+            return [key for key in path.split(sep) if key]
+        return list(path)
+
+    def resolve(self, path, sep='/'):
+        """
+        Walks down from this node, one child per key, in O(depth).
+        Args:
+            path - a sequence of keys, or a string of keys joined by sep
+            sep - *optional* the separator of string paths
+        Returns:
+            the node at the end of path, this node for an empty path
+        Raises:
+            KeyError if a key is missing on the way
+        """
+        node = self
+        for key in self._path_keys(path, sep):
+            node = node.get_child(key, _MISSING)
+            if node is _MISSING:
+                raise KeyError(path)
+        return node
+
+    def resolve_many(self, paths, sep='/'):
+        """
+        Resolves many paths, the prefix a path shares with the previous one
+        is not walked again: sorted paths cost one step per distinct node.
+        Returns:
+            a list of nodes in the order of paths, None for a missing path
+        """
+        result = []
+        # the keys of the previous path and the nodes along it
+        keys = []
+        nodes = [self]
+        for path in paths:
+            path = self._path_keys(path, sep)
+            shared = _shared_prefix(keys, path, len(nodes) - 1)
+            del nodes[shared + 1:]
+            for key in path[shared:]:
+                node = nodes[-1].get_child(key)
+                if node is None:
+                    break
+                nodes.append(node)
+            keys = path
+            result.append(nodes[-1] if len(nodes) == len(path) + 1
+                          else None)
+        return result
+
+    def add_paths(self, pairs, sep='/'):
+        """
+        Trie-style bulk insert: creates the missing nodes along every path,
+        with None items, and sets the item of the last one. Prefixes shared
+        with the previous path are not looked up again, and the sizes and
+        heights are updated once at the end instead of once per node.
+        Args:
+            pairs - (path, item) pairs, paths as in resolve
+            sep - *optional* the separator of string paths
+        Returns:
+            the last node of every path, in order
+        """
+        result = []
+        # nodes above the new ones, their metadata is stale
+        grown = {}
+        keys = []
+        nodes = [self]
+        for path, item in pairs:
+            path = self._path_keys(path, sep)
+            shared = _shared_prefix(keys, path, len(nodes) - 1)
+            del nodes[shared + 1:]
+            created = False
+            for key in path[shared:]:
+                parent = nodes[-1]
+                # below a new node everything is new
+                node = _MISSING if created else parent.get_child(key,
+                                                                 _MISSING)
+                if node is _MISSING:
+                    node = parent._append_child(key, None)
+                    created = True
+                nodes.append(node)
+            if created:
+                for node in nodes[:-1]:
+                    grown[id(node)] = node
+            nodes[-1].item = item
+            keys = path
+            result.append(nodes[-1])
+        if grown:
+            # children first, then up to the root
+            for node in sorted(grown.values(), key=lambda node: -node._depth):
+                node.update_metadata()
+            node = self.parent
+            root = self
+            while node is not None:
+                node.update_metadata()
+                root = node
+                node = node.parent
+            root._invalidate_caches()
+        return result
+
+    def __iter__(self):
+        yield self
+        for child in self.children:
+            yield child
+
+    def _append_child(self, key, item):
+        """
+        Creates and links a child, leaving the metadata to the caller
+        """
+        child = type(self)(key=key, item=item, parent=self)
+        self.children.append(child)
+        index = getattr(self, '_child_index', None)
+        if index is not None:
+            try:
+                index[1].setdefault(key, child)
+            except TypeError:
+                self._child_index = None
+        return child
+
+    def add_child(self, key=None, item=None, unique=False):
+        """
+        Appends a new leaf, O(depth)
+        Args:
+            unique - *optional* raise ValueError if a child already has key
+        """
+        if unique and self.get_child(key, _MISSING) is not _MISSING:
+            raise ValueError('{key} is already a child of {node}'.format(
+                key=key, node=self))
+        child = self._append_child(key, item)
+        # a new leaf adds one node to every ancestor, and can only make
+        # them higher: no need to look at the siblings
+        node = self
+        height = 2
+        while True:
+            node.size += 1
+            if node.height < height:
+                node.height = height
+            height = node.height + 1
+            parent = node.parent
+            if parent is None:
+                node._invalidate_caches()
+                return child
+            node = parent
+
+    def remove_child(self, child):
+        """
+        Unlinks a child, with its subtree, and updates the sizes and
+        heights above it, O(fan-out) per level
+        Raises ValueError if child is not a child of this node
+        Returns:
+            the child, now the root of its own tree
+        """
+        children = self.children
+        for position, node in enumerate(children):
+            if node is child:
+                break
+        else:
+            raise ValueError('{child} is not a child of {node}'.format(
+                child=child, node=self))
+        del children[position]
+        index = getattr(self, '_child_index', None)
+        if index is not None and index[1].get(child.key) is child:
+            # the next child with the same key takes its place
+            del index[1][child.key]
+            for node in children:
+                if node.key == child.key:
+                    index[1][child.key] = node
+                    break
+        child._set_parent(None)
+        child._depth = 1
+        child._update_depths()
+        node = self
+        while True:
+            node.update_metadata()
+            parent = node.parent
+            if parent is None:
+                node._invalidate_caches()
+                return child
+            node = parent
+
+
+class NaryTree(BaseNaryTree):
+    """
+    A generic N-ary tree implementation, that uses a list to store
+    its children.
+    """
+    def _no_children(self):
+        return []
+
+    def _set_parent(self, parent):
+        self._parent = weakref.ref(parent) if parent is not None else None
 
     @property
     def parent(self):
@@ -23,38 +535,279 @@ class NaryTree(object):
             return self._parent()
 
     def __getstate__(self):
-        self._parent = None
-        return self.__dict__
+        state = self.__dict__.copy()
+        state['_parent'] = None
+        state.pop('_ancestors', None)
+        state.pop('_child_index', None)
+        return state
 
     def __setstate__(self, state):
         self.__dict__ = state
         for child in self.children:
             child._parent = weakref.ref(self)
 
+
+class CompactNaryTree(BaseNaryTree):
+    """
+    A low overhead N-ary tree for very large trees: nodes have slots
+    instead of a __dict__, leaves share one empty tuple instead of owning
+    an empty list, and the parent is a plain reference instead of a
+    weakref. Parent and children point to each other, so a dropped tree
+    is freed by the garbage collector, not by reference counting.
+    """
+    __slots__ = ('key', 'item', 'children', '_parent', '_depth', 'size',
+                 'height', '_ancestors', '_child_index')
+
+    def _no_children(self):
+        # replaced by a list when the first child is added
+        return ()
+
+    def _set_parent(self, parent):
+        self._parent = parent
+
+    @property
+    def parent(self):
+        return self._parent
+
+    def __getstate__(self):
+        state = dict((name, getattr(self, name))
+                     for name in CompactNaryTree.__slots__
+                     if name not in ('_ancestors', '_child_index'))
+        state['_parent'] = None
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        for child in self.children:
+            child._parent = self
+
+    def _append_child(self, key, item):
+        if not self.children:
+            self.children = []
+        return super(CompactNaryTree, self)._append_child(key, item)
+
+
+class CompiledNode(object):
+    """
+    A view over one node of a CompiledNaryTree
+    """
+    __slots__ = ('tree', 'index')
+
+    def __init__(self, tree, index):
+        self.tree = tree
+        self.index = index
+
+    @property
+    def key(self):
+        return self.tree._keys[self.index]
+
+    @property
+    def item(self):
+        return self.tree._items[self.index]
+
+    @property
+    def parent(self):
+        parent = self.tree._parents[self.index]
+        if parent >= 0:
+            return CompiledNode(self.tree, parent)
+
+    @property
+    def children(self):
+        return [CompiledNode(self.tree, index)
+                for index in self.tree._child_indexes(self.index)]
+
+    def is_leaf(self):
+        return self.tree._sizes[self.index] == 1
+
+    def depth(self):
+        return self.tree._depths[self.index]
+
+    def __len__(self):
+        return self.tree._sizes[self.index]
+
+    def __bool__(self):
+        return True
+
+    __nonzero__ = __bool__
+
+    def __eq__(self, other):
+        return (isinstance(other, CompiledNode) and self.tree is other.tree
+                and self.index == other.index)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((id(self.tree), self.index))
+
     def __str__(self):
-        return '<{type} - {key} : {item}>'.format(type=type(self).__name__, 
-                                                   key=self.key, 
+        return '<{type} - {key} : {item}>'.format(type=type(self).__name__,
+                                                   key=self.key,
                                                    item=self.item)
-    def is_leaf(self):
-        return len(self.children) == 0
+
+
+class CompiledNaryTree(object):
+    """
+    A frozen N-ary tree in flat arrays, for read mostly trees.
+    Nodes are numbered in pre-order, so the subtree of node i is the range
+    i to i + size[i]: its first child is i + 1 and the next sibling of a
+    node j is j + size[j]. Keys and items live in two lists, sizes, parents
+    and depths in typed arrays, and a pre-order traversal is a linear scan
+    over them. Nodes are views, created when they are asked for.
+    """
+    def __init__(self):
+        self._keys = []
+        self._items = []
+        self._sizes = array('q')
+        self._parents = array('q')
+        self._depths = array('q')
+
+    @classmethod
+    def from_tree(cls, tree):
+        """
+        Compiles any N-ary tree, in one pre-order pass
+        """
+        compiled = cls()
+        keys = compiled._keys
+        items = compiled._items
+        parents = compiled._parents
+        depths = compiled._depths
+        # (node, index of its parent, depth)
+        stack = [(tree, -1, 1)]
+        while stack:
+            node, parent, depth = stack.pop()
+            index = len(keys)
+            keys.append(node.key)
+            items.append(node.item)
+            parents.append(parent)
+            depths.append(depth)
+            for child in reversed(node.children):
+                stack.append((child, index, depth + 1))
+        # children come after their parent: one backward pass adds them up
+        sizes = array('q', [1]) * len(keys)
+        for index in range(len(keys) - 1, 0, -1):
+            sizes[parents[index]] += sizes[index]
+        compiled._sizes = sizes
+        return compiled
+
+    def to_tree(self, cls=NaryTree):
+        """
+        Builds regular nodes back from the arrays
+        """
+        nodes = [cls(key=key, item=item)
+                 for key, item in zip(self._keys, self._items)]
+        children = [[] for _ in nodes]
+        for index in range(1, len(nodes)):
+            children[self._parents[index]].append(nodes[index])
+        # backwards, each subtree is complete before its parent is linked
+        for index in range(len(nodes) - 1, -1, -1):
+            node = nodes[index]
+            node._depth = self._depths[index]
+            if children[index]:
+                node.children = children[index]
+                for child in node.children:
+                    child._set_parent(node)
+                node.update_metadata()
+        return nodes[0]
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __str__(self):
+        return '<{type} - {size} nodes>'.format(type=type(self).__name__,
+                                                size=len(self))
+
+    @property
+    def root(self):
+        return CompiledNode(self, 0)
+
+    def node(self, index):
+        return CompiledNode(self, index)
 
     def get_height(self):
-        heights = [child.get_height() for child in self.children]
-        return max(heights) + 1 if heights else 1
+        return max(self._depths)
 
-    def traversal(self, visit=None, *args, **kwargs):
-        visit(self, *args, **kwargs)
-        l = [self]
-        for child in self.children:
-            l += child.traversal(visit, *args, **kwargs)
-        return l
+    def _child_indexes(self, index):
+        sizes = self._sizes
+        child = index + 1
+        end = index + sizes[index]
+        while child < end:
+            yield child
+            child += sizes[child]
+
+    def iter_pre_order(self):
+        """
+        Pre-order is the storage order: a linear scan
+        """
+        for index in range(len(self._keys)):
+            yield CompiledNode(self, index)
 
     def __iter__(self):
-        yield self
-        for child in self.children:
-            yield child
+        return self.iter_pre_order()
 
-    def add_child(self, key=None, item=None):
-        child = NaryTree(key=key, item=item, parent=self)
-        self.children.append(child)
-        return child
+    def iter_post_order(self):
+        """
+        A node comes after its subtree, that is once the scan leaves the
+        range of the subtree
+        """
+        sizes = self._sizes
+        stack = []
+        for index in range(len(self._keys)):
+            while stack and stack[-1] + sizes[stack[-1]] <= index:
+                yield CompiledNode(self, stack.pop())
+            stack.append(index)
+        while stack:
+            yield CompiledNode(self, stack.pop())
+
+    def iter_level_order(self, max_depth=None):
+        """
+        Lazy level-order traversal, it keeps the indexes of one level
+        Args:
+            max_depth - *optional* stop after this level, the root is on
+                        level 1
+        """
+        level = [0]
+        depth = 0
+        while level and depth != max_depth:
+            depth += 1
+            children = []
+            for index in level:
+                yield CompiledNode(self, index)
+                children.extend(self._child_indexes(index))
+            level = children
+
+    def traversal(self, visit=None, *args, **kwargs):
+        """
+        Pre-order traversal.
+        Args:
+            visit - *optional* A callable object
+            *args - Will be passed to visit
+            **kwargs -  Will be passed to visit
+        Returns:
+            a list containing all nodes pre order
+        """
+        l = []
+        for node in self.iter_pre_order():
+            if visit:
+                visit(node, *args, **kwargs)
+            l.append(node)
+        return l
+
+    def breadth_first_search(self, key, max_depth=None):
+        """
+        Returns the first node with key in level order, or None.
+        The keys are scanned in storage order, then the shallowest match
+        wins: no level by level walk is needed.
+        """
+        best = None
+        depths = self._depths
+        for index, node_key in enumerate(self._keys):
+            if node_key == key:
+                depth = depths[index]
+                if max_depth is not None and depth > max_depth:
+                    continue
+                if best is None or depth < depths[best]:
+                    best = index
+        if best is not None:
+            return CompiledNode(self, best)
@@ -0,0 +1,285 @@
+"""
+Persistent (immutable) AVL Tree, updates copy the path they change
+@author: Lia Nemeth
+"""
+
+from operator import itemgetter
+
+
+class PersistentNode(object):
+    """
+    An immutable node. Nodes are shared between versions, so they have no
+    parent link: the same node may hang under many parents.
+    """
+    __slots__ = ('key', 'item', 'left', 'right', 'height', 'size')
+
+    def __init__(self, key, item, left=None, right=None):
+        self.key = key
+        self.item = item
+        self.left = left
+        self.right = right
+        hl = left.height if left is not None else 0
+        hr = right.height if right is not None else 0
+        self.height = (hl if hl > hr else hr) + 1
+        self.size = 1 + (left.size if left is not None else 0) + \
+            (right.size if right is not None else 0)
+
+    def is_leaf(self):
+        return self.left is None and self.right is None
+
+    def __str__(self):
+        return '<{type} - {key} : {item}>'.format(type=type(self).__name__,
+                                                   key=self.key,
+                                                   item=self.item)
+
+
+def _height(node):
+    return node.height if node is not None else 0
+
+
+def _balance(key, item, left, right):
+    """
+    Builds a node over two AVL subtrees whose heights differ by at most 2,
+    rotating when they differ by 2. Only new nodes are created.
+    """
+    hl = _height(left)
+    hr = _height(right)
+    if hl > hr + 1:
+        if _height(left.left) >= _height(left.right):
+            return PersistentNode(left.key, left.item, left.left,
+                                  PersistentNode(key, item, left.right, right))
+        pivot = left.right
+        return PersistentNode(
+            pivot.key, pivot.item,
+            PersistentNode(left.key, left.item, left.left, pivot.left),
+            PersistentNode(key, item, pivot.right, right))
+    if hr > hl + 1:
+        if _height(right.right) >= _height(right.left):
+            return PersistentNode(right.key, right.item,
+                                  PersistentNode(key, item, left, right.left),
+                                  right.right)
+        pivot = right.left
+        return PersistentNode(
+            pivot.key, pivot.item,
+            PersistentNode(key, item, left, pivot.left),
+            PersistentNode(right.key, right.item, pivot.right, right.right))
+    return PersistentNode(key, item, left, right)
+
+
+def _insert(node, key, item):
+    if node is None:
+        return PersistentNode(key, item)
+    if key < node.key:
+        return _balance(node.key, node.item, _insert(node.left, key, item),
+                        node.right)
+    if node.key < key:
+        return _balance(node.key, node.item, node.left,
+                        _insert(node.right, key, item))
+    return PersistentNode(key, item, node.left, node.right)
+
+
+def _remove_min(node):
+    """
+    Returns the smallest node of a subtree and the subtree without it
+    """
+    if node.left is None:
+        return node, node.right
+    smallest, left = _remove_min(node.left)
+    return smallest, _balance(node.key, node.item, left, node.right)
+
+
+def _remove(node, key):
+    if node is None:
+        raise KeyError(key)
+    if key < node.key:
+        return _balance(node.key, node.item, _remove(node.left, key),
+                        node.right)
+    if node.key < key:
+        return _balance(node.key, node.item, node.left,
+                        _remove(node.right, key))
+    if node.left is None:
+        return node.right
+    if node.right is None:
+        return node.left
+    successor, right = _remove_min(node.right)
+    return _balance(successor.key, successor.item, node.left, right)
+
+
+def _build_sorted(items, lo, hi):
+    if lo >= hi:
+        return None
+    mid = (lo + hi) // 2
+    key, item = items[mid]
+    return PersistentNode(key, item, _build_sorted(items, lo, mid),
+                          _build_sorted(items, mid + 1, hi))
+
+
+class PersistentTree(object):
+    """
+    A persistent AVL Tree (en.wikipedia.org/wiki/Persistent_data_structure)
+    A tree is one version and never changes: insert and remove return a
+    new version sharing every untouched subtree with the old one, and only
+    copy the O(log n) nodes on the path to the change. Keeping a version
+    around is free, memory grows with the number of changes.
+    Keys are unique: inserting an existing key replaces its item.
+    """
+    __slots__ = ('root',)
+
+    def __init__(self, root=None):
+        """
+        Constructor method
+        Args:
+            root - *optional* the root PersistentNode, the tree is empty
+                   by default
+        """
+        self.root = root
+
+    @classmethod
+    def from_sorted(cls, items):
+        """
+        Builds a balanced version in O(n) from (key, item) pairs sorted
+        by key. Keys must be unique.
+        """
+        items = list(items)
+        return cls(_build_sorted(items, 0, len(items)))
+
+    @classmethod
+    def from_items(cls, items):
+        """
+        Builds a balanced version in O(n log n) from unsorted pairs
+        """
+        return cls.from_sorted(sorted(items, key=itemgetter(0)))
+
+    def __len__(self):
+        return self.root.size if self.root is not None else 0
+
+    def __str__(self):
+        return '<{type} - {size} keys>'.format(type=type(self).__name__,
+                                               size=len(self))
+
+    def is_empty(self):
+        return self.root is None
+
+    def get_height(self):
+        return _height(self.root)
+
+    def insert(self, key, item):
+        """
+        Returns:
+            a new version with key mapped to item
+        """
+        return type(self)(_insert(self.root, key, item))
+
+    def remove(self, key):
+        """
+        Returns:
+            a new version without key
+        Raises KeyError if the key is not in the tree.
+        """
+        return type(self)(_remove(self.root, key))
+
+    def search(self, key):
+        """
+        Returns:
+            the node with key, or None if the key is not found
+        """
+        node = self.root
+        while node is not None:
+            if key < node.key:
+                node = node.left
+            elif node.key < key:
+                node = node.right
+            else:
+                return node
+
+    def __getitem__(self, key):
+        return self.search(key)
+
+    def __contains__(self, key):
+        return self.search(key) is not None
+
+    def get(self, key, default=None):
+        node = self.search(key)
+        return default if node is None else node.item
+
+    def iter_in_order(self):
+        stack = []
+        node = self.root
+        while node is not None or stack:
+            if node is not None:
+                stack.append(node)
+                node = node.left
+            else:
+                node = stack.pop()
+                yield node
+                node = node.right
+
+    def __iter__(self):
+        return self.iter_in_order()
+
+    def range(self, lo=None, hi=None):
+        """
+        Lazy in-order iteration over the nodes with lo <= key < hi
+        Args:
+            lo - *optional* the lower bound, included
+            hi - *optional* the upper bound, excluded
+        """
+        stack = []
+        node = self.root
+        while node is not None or stack:
+            if node is not None:
+                if lo is not None and node.key < lo:
+                    node = node.right
+                else:
+                    stack.append(node)
+                    node = node.left
+            else:
+                node = stack.pop()
+                if hi is not None and not node.key < hi:
+                    return
+                yield node
+                node = node.right
+
+    def min(self):
+        node = self.root
+        while node is not None and node.left is not None:
+            node = node.left
+        return node
+
+    def max(self):
+        node = self.root
+        while node is not None and node.right is not None:
+            node = node.right
+        return node
+
+    def rank(self, key):
+        """
+        Returns the number of keys smaller than key, in O(log n)
+        """
+        node = self.root
+        rank = 0
+        while node is not None:
+            if node.key < key:
+                rank += 1 + (node.left.size if node.left is not None else 0)
+                node = node.right
+            else:
+                node = node.left
+        return rank
+
+    def select(self, index):
+        """
+        Returns the node with the index-th smallest key, counting from 0.
+        Raises IndexError if there is no such node.
+        """
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        node = self.root
+        while True:
+            left = node.left.size if node.left is not None else 0
+            if index < left:
+                node = node.left
+            elif index == left:
+                return node
+            else:
+                index -= left + 1
+                node = node.right
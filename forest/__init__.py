@@ -1,2 +1,9 @@
-from forest.BinaryTree import BinaryTree, BinarySearchTree
-from forest.NaryTree import NaryTree
+from forest.BinaryTree import (BinaryTree, BinarySearchTree, RedBlackTree,
+                               AVLTree, Treap, SplayTree)
+from forest.NaryTree import NaryTree, CompactNaryTree, CompiledNaryTree
+from forest.ArrayTree import ArrayBinarySearchTree, ArrayRedBlackTree
+from forest.BTree import BTree
+from forest.ConcurrentTree import ConcurrentTree
+from forest.PersistentTree import PersistentTree
+from forest.IntervalTree import IntervalTree
+from forest.AggregateTree import AggregateTree, SumTree, MinTree, MaxTree
@@ -0,0 +1,82 @@
+"""
+Asynchronous traversals, visitors may be coroutine functions
+@author: Lia Nemeth
+"""
+
+import asyncio
+import inspect
+from collections import deque
+
+# the nodes yielded between two passes through the event loop
+BATCH = 64
+
+# marks the end of the nodes
+_END = object()
+
+
+async def aiter_nodes(nodes):
+    """
+    Yields the nodes of a synchronous iterator, giving the event loop a
+    chance to run other tasks every BATCH nodes
+    """
+    count = 0
+    for node in nodes:
+        yield node
+        count += 1
+        if count == BATCH:
+            count = 0
+            await asyncio.sleep(0)
+
+
+async def _call(visit, node, args, kwargs):
+    result = visit(node, *args, **kwargs)
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+async def avisit(nodes, visit, concurrency, ordered, args=(), kwargs=None):
+    """
+    Runs visit on every node with at most concurrency visits running at a
+    time, yields (node, result) pairs.
+    The next node is only taken from nodes when a slot is free, so a lazy
+    traversal never runs ahead of the visitors.
+    Args:
+        nodes - an iterator of nodes
+        visit - a function or a coroutine function, called with each node
+        concurrency - the most visits running at once
+        ordered - yield in the order of nodes, a slow visit then holds
+                  back the ones after it; otherwise in completion order
+    """
+    if concurrency < 1:
+        raise ValueError('concurrency must be at least 1')
+    kwargs = kwargs or {}
+    nodes = iter(nodes)
+    # started visits, in the order of nodes
+    pending = deque()
+    try:
+        while True:
+            while len(pending) < concurrency:
+                node = next(nodes, _END)
+                if node is _END:
+                    break
+                task = asyncio.ensure_future(_call(visit, node, args,
+                                                   kwargs))
+                pending.append((node, task))
+            if not pending:
+                return
+            if ordered:
+                node, task = pending.popleft()
+            else:
+                await asyncio.wait([task for _, task in pending],
+                                   return_when=asyncio.FIRST_COMPLETED)
+                for entry in pending:
+                    if entry[1].done():
+                        break
+                pending.remove(entry)
+                node, task = entry
+            yield node, await task
+    finally:
+        # the caller stopped early or a visit failed
+        for _, task in pending:
+            task.cancel()
@@ -0,0 +1,122 @@
+"""
+Ancestor index: constant time ancestor and lowest common ancestor queries
+@author: Lia Nemeth
+"""
+
+from array import array
+
+
+class AncestorIndex(object):
+    """
+    Numbers the nodes in pre-order: the subtree of the node numbered i is
+    the range i to i + size[i], so "is a an ancestor of b" compares two
+    numbers. For the lowest common ancestor of u and v, numbered i < j,
+    the shallowest node numbered in i + 1 .. j is the child of the LCA on
+    the way to v: a sparse table answers that range minimum in O(1).
+    Building the index costs O(n log n) time and memory.
+    The index does not follow changes to the tree, trees keep it on their
+    root and drop it when their shape changes.
+    """
+    def __init__(self, root, children):
+        """
+        Constructor method
+        Args:
+            root - the root node
+            children - returns the children of a node
+        """
+        nodes = []
+        parents = array('q')
+        depths = array('q')
+        positions = {}
+        stack = [(root, -1, 1)]
+        while stack:
+            node, parent, depth = stack.pop()
+            positions[id(node)] = len(nodes)
+            nodes.append(node)
+            parents.append(parent)
+            depths.append(depth)
+            for child in reversed(children(node)):
+                stack.append((child, len(nodes) - 1, depth + 1))
+        # children are numbered after their parent, add them up backwards
+        sizes = array('q', [1]) * len(nodes)
+        for i in range(len(nodes) - 1, 0, -1):
+            sizes[parents[i]] += sizes[i]
+        self._nodes = nodes
+        self._parents = parents
+        self._depths = depths
+        self._sizes = sizes
+        self._positions = positions
+        self._table = self._build_table(depths)
+
+    @staticmethod
+    def _build_table(depths):
+        """
+        table[k][i] is the shallowest position in i .. i + 2**k - 1
+        """
+        table = [array('q', range(len(depths)))]
+        width = 1
+        while 2 * width <= len(depths):
+            previous = table[-1]
+            table.append(array('q', (
+                a if depths[a] <= depths[b] else b
+                for a, b in zip(previous, previous[width:]))))
+            width *= 2
+        return table
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def _position(self, node):
+        i = self._positions.get(id(node))
+        if i is None or self._nodes[i] is not node:
+            raise ValueError('{node} is not in this tree'.format(node=node))
+        return i
+
+    def _shallowest(self, lo, hi):
+        """
+        The shallowest position in lo .. hi, both included
+        """
+        k = (hi - lo + 1).bit_length() - 1
+        row = self._table[k]
+        a = row[lo]
+        b = row[hi - (1 << k) + 1]
+        return a if self._depths[a] <= self._depths[b] else b
+
+    def is_ancestor(self, ancestor, node):
+        """
+        True if ancestor is on the path from the root to node, node
+        included. O(1).
+        """
+        i = self._position(ancestor)
+        j = self._position(node)
+        return i <= j < i + self._sizes[i]
+
+    def lowest_common_ancestor(self, a, b):
+        """
+        Returns the deepest node that is an ancestor of both a and b. O(1).
+        """
+        i = self._position(a)
+        j = self._position(b)
+        if i == j:
+            return a
+        if i > j:
+            i, j = j, i
+        return self._nodes[self._parents[self._shallowest(i + 1, j)]]
+
+    def depth(self, node):
+        """
+        The level of node, the root is on level 1
+        """
+        return self._depths[self._position(node)]
+
+    def path(self, node):
+        """
+        Returns the nodes from the root down to node, O(depth)
+        """
+        i = self._position(node)
+        path = []
+        while i >= 0:
+            path.append(self._nodes[i])
+            i = self._parents[i]
+        path.reverse()
+        return path
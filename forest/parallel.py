@@ -0,0 +1,163 @@
+"""
+Parallel map and map/reduce over trees, on concurrent.futures executors
+@author: Lia Nemeth
+
+The tree is cut into disjoint subtrees: the biggest subtree is split into
+its children until there are enough pieces. Each piece goes to the
+executor as one task, the few nodes above the cut are mapped by the
+caller while the workers run. With a ProcessPoolExecutor a piece is
+pickled once, without its parent, so every node crosses the process
+boundary once; func and reduce_fn must then be picklable, module level
+functions. With a ThreadPoolExecutor nothing is copied.
+"""
+
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+
+ORDERS = ('pre', 'in', 'post')
+
+# tells map_reduce that no initial value was given
+_MISSING = object()
+
+
+def _map_piece(piece, func, order, reduce_fn):
+    """
+    Runs in the worker: maps a whole subtree in order, and reduces it to
+    one value if reduce_fn is given
+    """
+    nodes = getattr(piece, 'iter_{order}_order'.format(order=order))()
+    results = [func(node) for node in nodes]
+    if reduce_fn is None:
+        return results
+    return reduce(reduce_fn, results)
+
+
+def _split(root, children, pieces):
+    """
+    Returns the ids of the nodes above the cut and the roots of the
+    pieces, largest first
+    """
+    heap = [(-len(root), 0, root)]
+    counter = 1
+    top = set()
+    while len(heap) < pieces:
+        size, _, node = heap[0]
+        kids = children(node)
+        if not kids:
+            # the largest piece is a leaf, so are all the others
+            break
+        heapq.heappop(heap)
+        top.add(id(node))
+        for kid in kids:
+            heapq.heappush(heap, (-len(kid), counter, kid))
+            counter += 1
+    return top, [node for _, _, node in sorted(heap)]
+
+
+def _walk(root, children, top, order):
+    """
+    Walks the nodes above the cut in order, yields (True, node) for them
+    and (False, node) for the root of each piece, where the whole piece
+    comes in the order
+    """
+    stack = [(root, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if expanded:
+            yield True, node
+        elif id(node) not in top:
+            yield False, node
+        elif order == 'in':
+            if node.right is not None:
+                stack.append((node.right, False))
+            stack.append((node, True))
+            if node.left is not None:
+                stack.append((node.left, False))
+        else:
+            if order == 'post':
+                stack.append((node, True))
+            for kid in reversed(children(node)):
+                stack.append((kid, False))
+            if order == 'pre':
+                stack.append((node, True))
+
+
+def _run(root, children, func, order, executor, pieces, reduce_fn):
+    """
+    Yields, in order, the result of func on a node above the cut or the
+    results (or the reduced value) of a whole piece
+    """
+    if pieces is None:
+        pieces = 4 * (os.cpu_count() or 1)
+    top, roots = _split(root, children, pieces)
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor()
+    try:
+        futures = dict((id(node), executor.submit(_map_piece, node, func,
+                                                  order, reduce_fn))
+                       for node in roots)
+        for above, node in _walk(root, children, top, order):
+            if above:
+                yield True, func(node)
+            else:
+                yield False, futures[id(node)].result()
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+
+def parallel_map(root, children, func, order, executor=None, pieces=None):
+    """
+    Calls func on every node of the tree under root, in parallel.
+    Args:
+        root - the root node, an empty tree has a length of 0
+        children - returns the children of a node
+        func - called with each node
+        order - 'pre', 'in' or 'post'
+        executor - *optional* a concurrent.futures executor, a
+                   ProcessPoolExecutor is created and shut down by default
+        pieces - *optional* how many subtrees to cut the tree into,
+                 4 per cpu by default
+    Returns:
+        the results of func, in the traversal order
+    """
+    if order not in ORDERS:
+        raise ValueError('unknown order {order}'.format(order=order))
+    results = []
+    if not len(root):
+        return results
+    for above, value in _run(root, children, func, order, executor, pieces,
+                             None):
+        if above:
+            results.append(value)
+        else:
+            results.extend(value)
+    return results
+
+
+def map_reduce(root, children, map_fn, reduce_fn, order, initial=_MISSING,
+               executor=None, pieces=None):
+    """
+    Maps every node with map_fn and folds the results with reduce_fn, in
+    the traversal order. reduce_fn must be associative: each worker
+    reduces its own piece and only sends one value back.
+    Args:
+        initial - *optional* the value to start from, required for an
+                  empty tree
+    """
+    if order not in ORDERS:
+        raise ValueError('unknown order {order}'.format(order=order))
+    values = []
+    if len(root):
+        for _, value in _run(root, children, map_fn, order, executor, pieces,
+                             reduce_fn):
+            values.append(value)
+    if initial is _MISSING:
+        if not values:
+            raise TypeError('map_reduce of an empty tree with no initial '
+                            'value')
+        return reduce(reduce_fn, values)
+    return reduce(reduce_fn, values, initial)
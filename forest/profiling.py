@@ -0,0 +1,343 @@
+"""
+Opt-in instrumentation of the tree hot paths
+@author: Lia Nemeth
+
+instrument(cls) wraps the methods of a tree class to count comparisons,
+visited nodes, rotations and recolorings and to time every operation.
+uninstrument(cls) puts the original methods back: a class that is not
+instrumented runs exactly the code it always ran.
+"""
+
+import math
+import time
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+from functools import wraps
+from forest.BinaryTree import RedBlackTree
+
+# handed to the callback after every operation
+Event = namedtuple('Event', ['operation', 'tree', 'seconds', 'comparisons'])
+
+# timed operations, the key argument is counted while they run
+OPERATIONS = ('search', 'insert', 'remove')
+TRAVERSALS = ('iter_in_order', 'iter_pre_order', 'iter_post_order',
+              'iter_level_order')
+ROTATIONS = ('rotate_left', 'rotate_right')
+
+
+class Histogram(object):
+    """
+    Latencies in power of two buckets: bucket i holds the ones between
+    2**(i - 1) and 2**i microseconds
+    """
+    def __init__(self):
+        self.buckets = []
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds):
+        bucket = int(seconds * 1e6).bit_length()
+        if bucket >= len(self.buckets):
+            self.buckets.extend([0] * (bucket + 1 - len(self.buckets)))
+        self.buckets[bucket] += 1
+        self.count += 1
+        self.total += seconds
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, p):
+        """
+        Returns the upper bound, in seconds, of the bucket holding the
+        p-th percentile
+        """
+        rank = p / 100.0 * self.count
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return (1 << bucket) / 1e6
+        return 0.0
+
+    def __str__(self):
+        return '<{type} - {count} samples, mean {mean:.1f}us>'.format(
+            type=type(self).__name__, count=self.count,
+            mean=self.mean() * 1e6)
+
+
+class TreeStats(object):
+    """
+    Counters filled in by an instrumented class
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.calls = Counter()
+        self.latencies = {}
+        self.comparisons = 0
+        self.nodes_visited = 0
+        self.rotations = 0
+        self.recolorings = 0
+        # the longest search path seen, in nodes
+        self.deepest_search = 0
+        # nesting of the timed operations, only the outer one is recorded
+        self._active = 0
+
+    def record(self, operation, seconds):
+        self.calls[operation] += 1
+        if operation not in self.latencies:
+            self.latencies[operation] = Histogram()
+        self.latencies[operation].record(seconds)
+
+    def report(self):
+        lines = ['comparisons: {0}, nodes visited: {1}, rotations: {2}, '
+                 'recolorings: {3}, deepest search: {4}'.format(
+                     self.comparisons, self.nodes_visited, self.rotations,
+                     self.recolorings, self.deepest_search)]
+        for operation in sorted(self.latencies):
+            histogram = self.latencies[operation]
+            lines.append('{0}: {1} calls, mean {2:.1f}us, p99 < {3:.0f}us'
+                         .format(operation, histogram.count,
+                                 histogram.mean() * 1e6,
+                                 histogram.percentile(99) * 1e6))
+        return '\n'.join(lines)
+
+
+def degeneracy(tree):
+    """
+    How many times higher than a perfectly balanced tree of the same size
+    a tree is, 1.0 at best. A chain of n nodes scores n / log2(n + 1).
+    """
+    size = len(tree)
+    if not size:
+        return 1.0
+    return tree.get_height() / float(math.ceil(math.log(size + 1, 2)))
+
+
+def is_degenerate(tree, threshold=3.0):
+    """
+    True if the tree is more than threshold times higher than it needs
+    to be. Red Black Trees stay under 2, AVL Trees under 1.45.
+    """
+    return degeneracy(tree) > threshold
+
+
+class _CountingKey(object):
+    """
+    Stands for a key during an operation and counts the comparisons made
+    against it. Every node on a search path is compared for equality once.
+    """
+    __slots__ = ('key', 'stats', 'visited')
+
+    def __init__(self, key, stats):
+        self.key = key
+        self.stats = stats
+        self.visited = 0
+
+    def _compared(self, other):
+        self.stats.comparisons += 1
+        return other.key if isinstance(other, _CountingKey) else other
+
+    def __eq__(self, other):
+        self.visited += 1
+        return self.key == self._compared(other)
+
+    def __ne__(self, other):
+        return self.key != self._compared(other)
+
+    def __lt__(self, other):
+        return self.key < self._compared(other)
+
+    def __le__(self, other):
+        return self.key <= self._compared(other)
+
+    def __gt__(self, other):
+        return self.key > self._compared(other)
+
+    def __ge__(self, other):
+        return self.key >= self._compared(other)
+
+    def __hash__(self):
+        return hash(self.key)
+
+    # trees that build their keys from the one they are given, like the
+    # intervals of IntervalTree, get the real key
+    def __iter__(self):
+        return iter(self.key)
+
+    def __len__(self):
+        return len(self.key)
+
+    def __getitem__(self, index):
+        return self.key[index]
+
+
+class _RealKey(object):
+    """
+    Replaces the key attribute of the nodes, so the key a node keeps is
+    never a _CountingKey: the real key is stored instead. The value stays
+    in the node __dict__.
+    """
+    def __get__(self, node, cls):
+        if node is None:
+            return self
+        return node.__dict__['key']
+
+    def __set__(self, node, value):
+        if isinstance(value, _CountingKey):
+            value = value.key
+        node.__dict__['key'] = value
+
+
+class _CountingColor(object):
+    """
+    Replaces the black attribute of Red Black Trees, counting the nodes
+    that change color, new nodes painted red included. The value stays in
+    the node __dict__.
+    """
+    def __init__(self, stats):
+        self.stats = stats
+
+    def __get__(self, node, cls):
+        if node is None:
+            return self
+        return node.__dict__['black']
+
+    def __set__(self, node, value):
+        old = node.__dict__.get('black')
+        if old is not None and old != value:
+            self.stats.recolorings += 1
+        node.__dict__['black'] = value
+
+
+def _timed(name, method, stats, callback):
+    @wraps(method)
+    def wrapper(self, key, *args, **kwargs):
+        if name == 'search' and getattr(self, '_cache', None) is not None:
+            # the lookup cache would keep the key it is given, it gets the
+            # real one and the comparisons of the search are not counted
+            counting = key.key if isinstance(key, _CountingKey) else key
+        elif isinstance(key, _CountingKey):
+            counting = key
+        else:
+            counting = _CountingKey(key, stats)
+        outer = not stats._active
+        stats._active += 1
+        comparisons = stats.comparisons
+        start = time.perf_counter()
+        try:
+            result = method(self, counting, *args, **kwargs)
+        except KeyError as error:
+            # a missing key is reported with the key the caller gave
+            if error.args and isinstance(error.args[0], _CountingKey):
+                error.args = (error.args[0].key,) + error.args[1:]
+            raise
+        finally:
+            stats._active -= 1
+        if counting is not key and isinstance(counting, _CountingKey):
+            stats.nodes_visited += counting.visited
+            if name == 'search' and counting.visited > stats.deepest_search:
+                stats.deepest_search = counting.visited
+        if outer:
+            seconds = time.perf_counter() - start
+            stats.record(name, seconds)
+            if callback is not None:
+                callback(Event(name, self, seconds,
+                               stats.comparisons - comparisons))
+        return result
+    return wrapper
+
+
+def _counted(method, stats):
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        stats.rotations += 1
+        stats.calls[method.__name__] += 1
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _traversal(name, method, stats, callback):
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        start = time.perf_counter()
+        for node in method(self, *args, **kwargs):
+            stats.nodes_visited += 1
+            yield node
+        seconds = time.perf_counter() - start
+        stats.record(name, seconds)
+        if callback is not None:
+            callback(Event(name, self, seconds, 0))
+    return wrapper
+
+
+def _call_counted(method, stats):
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        stats.calls[method.__name__] += 1
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+def instrument(cls, stats=None, callback=None):
+    """
+    Starts counting the operations of a tree class, and its subclasses
+    that don't override them. Instrument the class you actually use.
+    Args:
+        cls - a BinarySearchTree subclass
+        stats - *optional* the TreeStats to fill, a new one by default
+        callback - *optional* called with an Event after every search,
+                   insert, remove and traversal
+    Returns:
+        the TreeStats
+    """
+    if '_instrumented' in cls.__dict__:
+        raise ValueError('{cls} is already instrumented'.format(
+            cls=cls.__name__))
+    stats = stats if stats is not None else TreeStats()
+    wrapped = {}
+    for name in OPERATIONS:
+        wrapped[name] = _timed(name, getattr(cls, name), stats, callback)
+    for name in TRAVERSALS:
+        wrapped[name] = _traversal(name, getattr(cls, name), stats, callback)
+    for name in ROTATIONS:
+        wrapped[name] = _counted(getattr(cls, name), stats)
+    wrapped['key'] = _RealKey()
+    if issubclass(cls, RedBlackTree):
+        wrapped['repair_tree'] = _call_counted(cls.repair_tree, stats)
+        wrapped['black'] = _CountingColor(stats)
+    # what to put back: the class own attribute, or nothing
+    saved = dict((name, cls.__dict__.get(name)) for name in wrapped)
+    for name, attribute in wrapped.items():
+        setattr(cls, name, attribute)
+    cls._instrumented = (stats, saved)
+    return stats
+
+
+def uninstrument(cls):
+    """
+    Puts the original methods of an instrumented class back
+    """
+    stats, saved = cls.__dict__['_instrumented']
+    for name, attribute in saved.items():
+        if attribute is None:
+            delattr(cls, name)
+        else:
+            setattr(cls, name, attribute)
+    del cls._instrumented
+    return stats
+
+
+@contextmanager
+def profiled(cls, stats=None, callback=None):
+    """
+    Instruments cls for the duration of a with block:
+        with profiled(RedBlackTree) as stats:
+            ...
+    """
+    stats = instrument(cls, stats, callback)
+    try:
+        yield stats
+    finally:
+        uninstrument(cls)
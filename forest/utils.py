@@ -1,11 +1,23 @@
+from collections import OrderedDict, deque, namedtuple
+from contextlib import contextmanager
+import threading
+
+# what cache_info returns, like functools.lru_cache
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize',
+                                     'currsize'])
+
+
 class Queue(object):
     '''Defines a Queue (en.wikipedia.org/wiki/Queue)'''
 
     def __init__(self, items=None):
-        if items is None:
-            self.items = []
+        # a deque makes both ends O(1), list.pop(0) is O(n)
+        self.items = deque(items) if items is not None else deque()
         self._queue = self.items
 
+    def __len__(self):
+        return len(self._queue)
+
     def is_empty(self):
         return len(self._queue) == 0
 
@@ -13,7 +25,7 @@ class Queue(object):
         self._queue.append(obj)
 
     def dequeue(self):
-        return self._queue.pop(0)
+        return self._queue.popleft()
 
     def access(self):
         return self._queue[0]
@@ -22,10 +34,12 @@ class Queue(object):
 class Stack(object):
     """Defines a Stack (en.wikipedia.org/wiki/stack_(data_structure))"""
     def __init__(self, items=None):
-        if items is None:
-            self.items = []
+        self.items = list(items) if items is not None else []
         self._stack = self.items
 
+    def __len__(self):
+        return len(self._stack)
+
     def is_empty(self):
         return len(self._stack) == 0
 
@@ -37,3 +51,164 @@ class Stack(object):
 
     def top(self):
         return self._stack[len(self._stack) - 1]
+
+
+class RWLock(object):
+    """
+    A readers-writer lock (en.wikipedia.org/wiki/Readers-writer_lock).
+    Any number of readers can hold it at once, a writer holds it alone.
+    Waiting writers go first, so a steady flow of readers can not starve
+    them. The lock is not reentrant.
+    """
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    def acquire_read(self):
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+
+    def release_write(self):
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+    @contextmanager
+    def read_locked(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write_locked(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class LRUCache(object):
+    """
+    A bounded mapping that evicts the least recently used key
+    (en.wikipedia.org/wiki/Cache_replacement_policies#LRU). get and put
+    are O(1) and thread safe: concurrent readers of a tree all update
+    its cache. It counts hits and misses, clear keeps the counters.
+    """
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError('capacity must be at least 1')
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            data = self._data
+            data[key] = value
+            data.move_to_end(key)
+            if len(data) > self.capacity:
+                data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def info(self):
+        return CacheInfo(self.hits, self.misses, self.capacity, len(self))
+
+
+class LFUCache(LRUCache):
+    """
+    A bounded mapping that evicts the least frequently used key, the least
+    recently used one among equals
+    (en.wikipedia.org/wiki/Least_frequently_used). Keys are kept in one
+    ordered bucket per use count, get and put are O(1).
+    """
+    def __init__(self, capacity):
+        super(LFUCache, self).__init__(capacity)
+        # key: [value, count]
+        self._data = {}
+        # count: keys used that many times, least recent first
+        self._buckets = {}
+        self._min_count = 0
+
+    def _touch(self, key, entry):
+        count = entry[1]
+        bucket = self._buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[count]
+            if self._min_count == count:
+                self._min_count = count + 1
+        entry[1] = count + 1
+        self._buckets.setdefault(count + 1, OrderedDict())[key] = None
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._touch(key, entry)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                entry[0] = value
+                self._touch(key, entry)
+                return
+            if len(self._data) >= self.capacity:
+                bucket = self._buckets[self._min_count]
+                evicted, _ = bucket.popitem(last=False)
+                if not bucket:
+                    del self._buckets[self._min_count]
+                del self._data[evicted]
+            self._data[key] = [value, 1]
+            self._buckets.setdefault(1, OrderedDict())[key] = None
+            self._min_count = 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._buckets.clear()
+            self._min_count = 0
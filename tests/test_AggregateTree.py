@@ -0,0 +1,137 @@
+import operator
+import pickle
+import random
+import unittest
+from forest.AggregateTree import (AggregateTree, SumTree, MinTree, MaxTree,
+                                  aggregate_tree)
+
+
+class TestAggregateTree(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(59)
+        self.items = dict((key, random.randrange(-50, 50))
+                          for key in random.sample(range(5000), 800))
+        self.trees = [cls() for cls in (SumTree, MinTree, MaxTree)]
+        for tree in self.trees:
+            for key, item in self.items.items():
+                tree.insert(key, item)
+
+    def brute_force(self, tree, lo, hi):
+        values = [item for key, item in sorted(self.items.items())
+                  if (lo is None or lo <= key) and (hi is None or key < hi)]
+        if not values:
+            return tree.identity
+        result = values[0]
+        for value in values[1:]:
+            result = tree.combine(result, value)
+        return result
+
+    def check(self, tree):
+        for node in tree.iter_post_order():
+            values = [child.summary for child in (node.left, node.right)
+                      if child is not None]
+            summary = node.item
+            for value in values:
+                summary = tree.combine(summary, value)
+            self.assertEqual(node.summary, summary)
+        bounds = [(None, None), (None, 2500), (1000, None), (-5, 6000),
+                  (100, 101), (3000, 2000)]
+        for _ in range(30):
+            bounds.append(tuple(sorted(random.sample(range(5000), 2))))
+        for lo, hi in bounds:
+            self.assertEqual(tree.aggregate(lo, hi),
+                             self.brute_force(tree, lo, hi))
+
+    def test_insert(self):
+        for tree in self.trees:
+            self.check(tree)
+
+    def test_remove(self):
+        removed = random.sample(sorted(self.items), 500)
+        for key in removed:
+            del self.items[key]
+        for tree in self.trees:
+            for key in removed:
+                tree.remove(key)
+            self.check(tree)
+
+    def test_update_item(self):
+        keys = random.sample(sorted(self.items), 50)
+        for key in keys:
+            self.items[key] = random.randrange(-50, 50)
+        self.items[6000] = 7
+        for tree in self.trees:
+            for key in keys:
+                tree.update_item(key, self.items[key])
+            tree.update_item(6000, 7)
+            self.check(tree)
+
+    def test_bulk_loading(self):
+        for cls in (SumTree, MinTree, MaxTree):
+            self.check(cls.from_items(self.items.items()))
+        tree = SumTree()
+        tree.insert_many(self.items.items())
+        self.check(tree)
+        tree.remove_many(list(self.items)[:100])
+        for key in list(self.items)[:100]:
+            del self.items[key]
+        self.check(tree)
+
+    def test_insert_many(self):
+        added = [(5000 + key, key % 7) for key in range(100)]
+        for tree in self.trees:
+            # small enough to be inserted one by one, not rebuilt
+            tree.insert_many(added)
+        self.items.update(added)
+        for tree in self.trees:
+            self.check(tree)
+
+    def test_remove_all(self):
+        for tree in self.trees:
+            tree.remove_many(list(self.items))
+            self.assertTrue(tree.is_empty())
+            self.assertEqual(tree.aggregate(), tree.identity)
+            tree.insert_many([(1, 4), (2, 6)])
+            self.assertEqual([node.key for node in tree], [1, 2])
+            self.assertEqual(tree.aggregate(), tree.combine(4, 6))
+
+    def test_logarithmic(self):
+        calls = []
+
+        def value(node):
+            calls.append(node)
+            return node.item
+        Counted = aggregate_tree(operator.add, 0, value)
+        tree = Counted.from_items((key, 1) for key in range(10000))
+        del calls[:]
+        self.assertEqual(tree.aggregate(17, 9000), 8983)
+        self.assertTrue(len(calls) <= 2 * tree.get_height())
+
+    def test_key_order(self):
+        Concat = aggregate_tree(operator.add, '',
+                                lambda node: '{0},'.format(node.key))
+        tree = Concat()
+        for key in [5, 3, 9, 1, 7, 8]:
+            tree.insert(key, None)
+        self.assertEqual(tree.aggregate(), '1,3,5,7,8,9,')
+        self.assertEqual(tree.aggregate(2, 8), '3,5,7,')
+
+    def test_empty(self):
+        tree = SumTree()
+        self.assertEqual(tree.aggregate(), 0)
+        tree.insert(1, 5)
+        self.assertEqual(tree.aggregate(), 5)
+        tree.remove(1)
+        self.assertEqual(tree.aggregate(), 0)
+        self.assertIsNone(MinTree().aggregate(1, 2))
+        self.assertTrue(issubclass(SumTree, AggregateTree))
+
+    def test_pickle(self):
+        tree = pickle.loads(pickle.dumps(self.trees[0]))
+        self.assertEqual(tree.aggregate(100, 4000),
+                         self.brute_force(tree, 100, 4000))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import random
+import unittest
+from forest.ArrayTree import (ArrayBinarySearchTree, ArrayRedBlackTree,
+                              ArrayNode)
+
+
+class TestArrayBinarySearchTree(unittest.TestCase):
+
+    def setUp(self):
+        self.tree = ArrayBinarySearchTree(10, 'b')
+        self.tree[15] = 'k'
+        self.tree[17] = 'm'
+        self.tree[9] = 'l'
+        self.tree[2] = 'j'
+        self.tree[1] = 'o'
+
+    def test_search(self):
+        self.assertEqual(self.tree[2].item, 'j')
+        self.assertEqual(self.tree[1].item, 'o')
+        self.assertIsNone(self.tree[219])
+        self.assertTrue(15 in self.tree)
+        self.assertFalse(16 in self.tree)
+
+    def test_node_view(self):
+        node = self.tree[9]
+        self.assertIsInstance(node, ArrayNode)
+        self.assertEqual(node.parent, self.tree.root)
+        self.assertEqual(node.left.key, 2)
+        self.assertIsNone(node.right)
+        node.item = 'z'
+        self.assertEqual(self.tree[9].item, 'z')
+
+    def test_remove(self):
+        del self.tree[1]
+        self.assertIsNone(self.tree[1])
+        del self.tree[15]
+        self.assertIsNone(self.tree[15])
+        del self.tree[10]
+        self.assertIsNone(self.tree[10])
+        self.assertEqual(self.tree.keys(), [2, 9, 17])
+        self.assertEqual(len(self.tree), 3)
+        self.assertRaises(KeyError, self.tree.remove, 10)
+
+    def test_slots_are_recycled(self):
+        slots = len(self.tree._items)
+        del self.tree[17]
+        self.tree[18] = 'n'
+        self.assertEqual(len(self.tree._items), slots)
+        self.assertEqual(self.tree[18].item, 'n')
+
+    def test_in_order(self):
+        self.assertEqual([node.key for node in self.tree.in_order()],
+                         [1, 2, 9, 10, 15, 17])
+
+    def test_typed_keys(self):
+        tree = type(self.tree)(key_typecode='q')
+        for key in [5, 3, 8, 1]:
+            tree[key] = str(key)
+        self.assertEqual(tree[8].item, '8')
+        self.assertEqual(tree.keys(), [1, 3, 5, 8])
+
+    def test_from_sorted(self):
+        items = [(key, str(key)) for key in range(100)]
+        tree = type(self.tree).from_sorted(items, key_typecode='q')
+        self.assertEqual(tree.keys(), list(range(100)))
+        self.assertEqual(tree.get_height(), 7)
+        self.assertEqual(tree[42].item, '42')
+        tree[100] = '100'
+        del tree[50]
+        self.assertEqual(len(tree), 100)
+
+    def test_from_items(self):
+        tree = type(self.tree).from_items([(5, 'a'), (1, 'b'), (3, 'c')])
+        self.assertEqual(tree.keys(), [1, 3, 5])
+        self.assertEqual(tree.root.key, 3)
+
+
+class TestArrayRedBlackTree(TestArrayBinarySearchTree):
+
+    def setUp(self):
+        self.tree = ArrayRedBlackTree(10, 'b')
+        self.tree[15] = 'k'
+        self.tree[17] = 'm'
+        self.tree[9] = 'l'
+        self.tree[2] = 'j'
+        self.tree[1] = 'o'
+
+    def test_node_view(self):
+        node = self.tree[9]
+        self.assertEqual(node.left.key, 2)
+        self.assertTrue(self.tree.root.black)
+
+    def black_height(self, node):
+        if node is None:
+            return 1
+        if not node.black:
+            self.assertTrue(node.left is None or node.left.black)
+            self.assertTrue(node.right is None or node.right.black)
+        left = self.black_height(node.left)
+        self.assertEqual(left, self.black_height(node.right))
+        return left + (1 if node.black else 0)
+
+    def test_balance(self):
+        tree = ArrayRedBlackTree()
+        keys = list(range(1000))
+        for key in keys:
+            tree[key] = key
+        self.assertTrue(tree.get_height() <= 20)
+        random.seed(7)
+        random.shuffle(keys)
+        for key in keys[:600]:
+            del tree[key]
+            self.black_height(tree.root)
+        self.assertEqual(tree.keys(), sorted(keys[600:]))
+        self.assertTrue(tree.root.black)
+
+    def test_from_sorted_colors(self):
+        for size in [1, 2, 3, 7, 8, 100]:
+            tree = ArrayRedBlackTree.from_sorted((key, key)
+                                                 for key in range(size))
+            self.assertTrue(tree.root.black)
+            self.black_height(tree.root)
+            tree[size] = size
+            self.black_height(tree.root)
+
+
+if __name__ == '__main__':
+    unittest.main()
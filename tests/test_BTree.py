@@ -0,0 +1,111 @@
+import random
+import unittest
+from forest.BTree import BTree
+
+
+class TestBTree(unittest.TestCase):
+
+    def setUp(self):
+        self.tree = BTree(order=4)
+        self.tree[10] = 'b'
+        self.tree[15] = 'k'
+        self.tree[17] = 'm'
+        self.tree[9] = 'l'
+        self.tree[2] = 'j'
+        self.tree[1] = 'o'
+
+    def check_node(self, node, lo, hi, depth, leaves_depth, root=False):
+        self.assertEqual(node.keys, sorted(node.keys))
+        for key in node.keys:
+            self.assertTrue(lo is None or key >= lo)
+            self.assertTrue(hi is None or key < hi)
+        self.assertTrue(len(node.keys) <= self.tree.order)
+        if not root:
+            self.assertTrue(len(node.keys) >= self.tree.order // 2)
+        if node.is_leaf():
+            leaves_depth.add(depth)
+            return
+        self.assertEqual(len(node.children), len(node.keys) + 1)
+        bounds = [lo] + node.keys + [hi]
+        for i, child in enumerate(node.children):
+            self.check_node(child, bounds[i], bounds[i + 1], depth + 1,
+                            leaves_depth)
+
+    def check_tree(self):
+        leaves_depth = set()
+        self.check_node(self.tree.root, None, None, 1, leaves_depth, True)
+        self.assertEqual(len(leaves_depth), 1)
+        self.assertEqual(leaves_depth.pop(), self.tree.get_height())
+
+    def test_search(self):
+        self.assertEqual(self.tree[2].item, 'j')
+        self.assertEqual(self.tree[1].item, 'o')
+        self.assertIsNone(self.tree[219])
+        self.assertTrue(15 in self.tree)
+        self.assertFalse(16 in self.tree)
+
+    def test_replace(self):
+        self.tree[15] = 'z'
+        self.assertEqual(self.tree[15].item, 'z')
+        self.assertEqual(len(self.tree), 6)
+
+    def test_remove(self):
+        del self.tree[1]
+        self.assertIsNone(self.tree[1])
+        del self.tree[15]
+        self.assertIsNone(self.tree[15])
+        del self.tree[10]
+        self.assertIsNone(self.tree[10])
+        self.assertEqual([entry.key for entry in self.tree], [2, 9, 17])
+        self.assertRaises(KeyError, self.tree.remove, 10)
+
+    def test_random_operations(self):
+        random.seed(11)
+        expected = {}
+        for _ in range(3000):
+            key = random.randrange(500)
+            if key in expected and random.random() < 0.5:
+                del self.tree[key]
+                del expected[key]
+            else:
+                self.tree[key] = -key
+                expected[key] = -key
+        self.check_tree()
+        self.assertEqual(list(self.tree), sorted(expected.items()))
+        self.assertEqual(len(self.tree), len(expected))
+        for key in list(expected):
+            del self.tree[key]
+        self.assertEqual(len(self.tree), 0)
+        self.assertEqual(list(self.tree), [])
+
+    def test_range(self):
+        for key in range(100):
+            self.tree[key] = key
+        self.assertEqual([entry.key for entry in self.tree.range(20, 30)],
+                         list(range(20, 30)))
+        self.assertEqual([entry.key for entry in self.tree.range(95)],
+                         list(range(95, 100)))
+        self.assertEqual([entry.key for entry in self.tree.range(hi=3)],
+                         [0, 1, 2])
+        self.assertEqual(list(self.tree.range(200, 300)), [])
+
+    def test_from_sorted(self):
+        for order in [3, 4, 5, 64]:
+            for size in [0, 1, 2, 7, 50, 1000]:
+                items = [(key, str(key)) for key in range(size)]
+                self.tree = BTree.from_sorted(items, order=order)
+                self.check_tree()
+                self.assertEqual(list(self.tree), items)
+                self.tree[size] = 'new'
+                self.check_tree()
+                if size:
+                    del self.tree[0]
+                    self.check_tree()
+
+    def test_height(self):
+        tree = BTree.from_sorted((key, key) for key in range(100000))
+        self.assertTrue(tree.get_height() <= 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,12 @@
+import pickle
 import unittest
-from forest.BinaryTree import BinaryTree, BinarySearchTree, RedBlackTree
+import random
+try:
+    import numpy
+except ImportError:
+    numpy = None
+from forest.BinaryTree import (BinaryTree, BinarySearchTree, RedBlackTree,
+                               AVLTree, Treap, SplayTree)
 
 
 class TestBinaryTree(unittest.TestCase):
@@ -45,6 +52,45 @@ class TestBinaryTree(unittest.TestCase):
         key_list = [i.key for i in self.tree.post_order()]
         self.assertEqual(key_list, [1,2,4,3,5,6,8,15,11,14,17,0])
 
+    def test_lazy_orders(self):
+        self.assertEqual(list(self.tree.iter_in_order()),
+                         self.tree.in_order_iterative())
+        self.assertEqual(list(self.tree.iter_pre_order()),
+                         self.tree.pre_order_iterative())
+        self.assertEqual(list(self.tree.iter_post_order()),
+                         self.tree.post_order_iterative())
+        key_list = [i.key for i in self.tree.iter_level_order()]
+        self.assertEqual(key_list, [0, 8, 17, 4, 6, 14, 1, 2, 3, 5, 15, 11])
+
+    def test_search_level_order(self):
+        odd = self.tree.search_level_order(lambda node: node.key % 2)
+        self.assertEqual([node.key for node in odd], [17, 1, 3, 5, 15, 11])
+        odd = self.tree.search_level_order(lambda node: node.key % 2,
+                                           max_depth=3)
+        self.assertEqual([node.key for node in odd], [17])
+        self.assertEqual(self.tree.breadth_first_search(14).item, 'c')
+        self.assertIsNone(self.tree.breadth_first_search(99))
+
+    def test_early_termination(self):
+        nodes = self.tree.iter_in_order()
+        self.assertEqual(next(nodes).key, 1)
+        self.assertEqual(next(nodes).key, 4)
+
+    def test_visit(self):
+        keys = []
+        self.tree.post_order(lambda node, l: l.append(node.key), keys)
+        self.assertEqual(keys, [1,2,4,3,5,6,8,15,11,14,17,0])
+
+    def test_deep_tree(self):
+        # built bottom up, each node is attached to a complete subtree
+        tree = None
+        for key in range(4999, -1, -1):
+            tree = BinaryTree(key=key, right=tree)
+        self.assertEqual([i.key for i in tree], list(range(5000)))
+        self.assertEqual(next(tree.iter_post_order()).key, 4999)
+        self.assertEqual(tree.get_height(), 5000)
+        self.assertEqual(len(tree), 5000)
+
     def test_properties(self):
         self.assertTrue(self.tree.left)
         self.assertTrue(self.tree.right)
@@ -53,6 +99,17 @@ class TestBinaryTree(unittest.TestCase):
     def test_height(self):
         self.assertEqual(self.tree.get_height(), 4)
 
+    def test_metadata(self):
+        self.assertEqual(len(self.tree), 12)
+        self.assertEqual(len(self.tree.left), 7)
+        self.assertEqual(self.tree.left.left.left.depth(), 4)
+        self.tree.left.left.left.left = BinaryTree(key=99)
+        self.assertEqual(self.tree.get_height(), 5)
+        self.assertEqual(len(self.tree), 13)
+        self.tree.left = None
+        self.assertEqual(len(self.tree), 5)
+        self.assertEqual(self.tree.get_height(), 4)
+
     def test_leaf(self):
         self.assertFalse(self.tree.is_leaf())
         self.assertTrue(self.tree.left.left.left.is_leaf())
@@ -80,6 +137,16 @@ class TestBinarySearchTree(unittest.TestCase):
         self.assertIsNone(self.tree[15])
         del self.tree[10]
         self.assertIsNone(self.tree[10])
+        self.assertEqual([node.key for node in self.tree], [2, 9, 17])
+        self.assertRaises(KeyError, self.tree.remove, 10)
+
+    def test_remove_all(self):
+        for key in [10, 15, 17, 9, 2, 1]:
+            del self.tree[key]
+        self.assertTrue(self.tree.is_empty())
+        self.assertIsNone(self.tree[10])
+        self.tree[3] = 'c'
+        self.assertEqual(self.tree[3].item, 'c')
 
     def test_sorted_tree(self):
         def is_sorted(node):
@@ -92,9 +159,350 @@ class TestBinarySearchTree(unittest.TestCase):
             return True
         self.assertTrue(self.tree.pre_order(visit=is_sorted))
 
+    def test_search_many(self):
+        self.assertEqual(self.tree.search_many([2, 3, 17, 1]),
+                         ['j', None, 'm', 'o'])
+        self.assertEqual(list(self.tree.contains_many([2, 3, 17])),
+                         [True, False, True])
+        self.assertEqual(self.tree.search_many([3], default='x'), ['x'])
+
+    def test_search_many_after_changes(self):
+        self.assertEqual(self.tree.search_many([5, 10]), [None, 'b'])
+        self.tree[5] = 'e'
+        del self.tree[10]
+        self.assertEqual(self.tree.search_many([5, 10]), ['e', None])
+        for key in [1, 2, 5, 9, 15, 17]:
+            del self.tree[key]
+        self.assertEqual(self.tree.search_many([5]), [None])
+        self.tree[5] = 'f'
+        self.assertEqual(self.tree.search_many([5]), ['f'])
+
+    def test_search_many_subtree(self):
+        subtree = self.tree.left or self.tree.right
+        self.assertEqual(subtree.search_many([subtree.key]), [subtree.item])
+        # only the root is told about changes, subtrees keep no snapshot
+        self.assertIsNone(subtree._snapshot)
+        tree = BinarySearchTree(10, 'b')
+        tree[5] = 'e'
+        self.assertEqual(tree.left.search_many([3]), [None])
+        tree[3] = 'c'
+        self.assertEqual(tree.left.search_many([3]), ['c'])
+        self.tree.search_many([3])
+        self.tree.finger_search(3)
+        state = self.tree.__getstate__()
+        self.assertNotIn('_snapshot', state)
+        self.assertNotIn('_finger', state)
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_search_many_numpy(self):
+        keys = numpy.array([2, 3, 17, 100, -5])
+        self.assertEqual(self.tree.search_many(keys),
+                         ['j', None, 'm', None, None])
+        mask = self.tree.contains_many(keys)
+        self.assertEqual(mask.tolist(), [True, False, True, False, False])
+
+    def test_min_max(self):
+        self.assertEqual(self.tree.min().key, 1)
+        self.assertEqual(self.tree.max().key, 17)
+        self.assertIsNone(type(self.tree)().min())
+
+    def test_floor_ceiling(self):
+        self.assertEqual(self.tree.floor(14).key, 10)
+        self.assertEqual(self.tree.floor(15).key, 15)
+        self.assertIsNone(self.tree.floor(0))
+        self.assertEqual(self.tree.ceiling(14).key, 15)
+        self.assertEqual(self.tree.ceiling(1).key, 1)
+        self.assertIsNone(self.tree.ceiling(18))
+
+    def test_successor_predecessor(self):
+        node = self.tree.min()
+        keys = []
+        while node is not None:
+            keys.append(node.key)
+            node = node.successor()
+        self.assertEqual(keys, [1, 2, 9, 10, 15, 17])
+        self.assertEqual(self.tree[10].predecessor().key, 9)
+        self.assertIsNone(self.tree[1].predecessor())
+
+    def test_range(self):
+        keys = [node.key for node in self.tree.range(2, 15)]
+        self.assertEqual(keys, [2, 9, 10])
+        keys = [node.key for node in self.tree.range(hi=3)]
+        self.assertEqual(keys, [1, 2])
+        keys = [node.key for node in self.tree.range(11)]
+        self.assertEqual(keys, [15, 17])
+
+    def test_rank_select(self):
+        keys = [1, 2, 9, 10, 15, 17]
+        for i, key in enumerate(keys):
+            self.assertEqual(self.tree.rank(key), i)
+            self.assertEqual(self.tree.select(i).key, key)
+        self.assertEqual(self.tree.rank(100), 6)
+        self.assertRaises(IndexError, self.tree.select, 6)
+
+    def test_sizes(self):
+        random.seed(13)
+        tree = type(self.tree)()
+        keys = list(range(300))
+        random.shuffle(keys)
+        for key in keys:
+            tree[key] = key
+        for key in keys[:150]:
+            del tree[key]
+        for node in tree:
+            children = [child for child in (node.left, node.right)
+                        if child is not None]
+            size = 1 + sum(child.size for child in children)
+            self.assertEqual(node.size, size)
+            height = 1 + max([child.height for child in children] or [0])
+            self.assertEqual(node.height, height)
+        remaining = sorted(keys[150:])
+        self.assertEqual(tree.size, 150)
+        self.assertEqual(tree.select(75).key, remaining[75])
+        self.assertEqual(tree.rank(remaining[100]), 100)
+
+    def test_cached_height(self):
+        random.seed(17)
+        tree = type(self.tree)()
+        keys = list(range(200))
+        random.shuffle(keys)
+        for key in keys:
+            tree[key] = key
+        for key in keys[:120]:
+            del tree[key]
+        for node in tree.iter_post_order():
+            heights = [child.height for child in (node.left, node.right)
+                       if child is not None]
+            self.assertEqual(node.height, max(heights + [0]) + 1)
+        self.assertEqual(len(tree), 80)
+        node = tree.min()
+        depth = 1
+        while node.parent is not None:
+            node = node.parent
+            depth += 1
+        self.assertEqual(tree.min().depth(), depth)
+
+    def test_from_sorted(self):
+        items = [(key, str(key)) for key in range(100)]
+        tree = type(self.tree).from_sorted(items)
+        self.assertEqual([node.key for node in tree], list(range(100)))
+        self.assertEqual(tree.get_height(), 7)
+        self.assertEqual(tree[42].item, '42')
+
+    def test_from_items(self):
+        items = [(key, str(key)) for key in [5, 1, 9, 3, 7]]
+        tree = type(self.tree).from_items(items)
+        self.assertEqual([node.key for node in tree], [1, 3, 5, 7, 9])
+        self.assertEqual(tree.get_height(), 3)
+
+    def check_balanced(self, tree):
+        pass
+
+    def check_tree(self, tree, keys):
+        self.assertIsInstance(tree, type(self.tree))
+        self.assertIsNone(tree.parent)
+        if tree.is_empty():
+            self.assertEqual(keys, [])
+            return
+        self.assertEqual([node.key for node in tree], keys)
+        for node in tree:
+            size = 1
+            for child in (node.left, node.right):
+                if child is not None:
+                    self.assertIs(child.parent, node)
+                    size += child.size
+            self.assertEqual(node.size, size)
+        self.check_balanced(tree)
+
+    def build(self, keys):
+        tree = type(self.tree)()
+        for key in keys:
+            tree[key] = str(key)
+        return tree
+
+    def test_insert_uncomparable(self):
+        root = self.tree.key
+
+        class Key(object):
+            # goes right of the root, and fails one level down
+            def __lt__(self, other):
+                if other == root:
+                    return False
+                raise TypeError('can not compare')
+
+        sizes = [node.size for node in self.tree]
+        self.assertRaises(TypeError, self.tree.insert, Key(), 'x')
+        self.assertEqual([node.size for node in self.tree], sizes)
+
+    def test_split_join(self):
+        random.seed(29)
+        keys = list(range(0, 400, 2))
+        for at in [-1, 0, 1, 150, 151, 398, 399, 500]:
+            random.shuffle(keys)
+            left, right = self.build(keys).split(at)
+            self.check_tree(left, sorted(k for k in keys if k < at))
+            self.check_tree(right, sorted(k for k in keys if k >= at))
+            tree = type(self.tree).join(left, right)
+            self.check_tree(tree, sorted(keys))
+            self.assertEqual(tree[150].item, '150')
+
+    def test_join_uneven(self):
+        cls = type(self.tree)
+        small = list(range(3))
+        large = list(range(3, 300))
+        self.check_tree(cls.join(self.build(small), self.build(large)),
+                        small + large)
+        self.check_tree(cls.join(self.build(large[::-1]),
+                                 self.build(range(300, 303))),
+                        large + [300, 301, 302])
+        self.check_tree(cls.join(cls(), self.build(small)), small)
+        self.check_tree(cls.join(self.build(small), cls()), small)
+        self.assertRaises(ValueError, cls.join, self.build(large),
+                          self.build(small))
+        child = self.tree.left or self.tree.right
+        self.assertRaises(ValueError, child.split, 5)
+
+    def test_set_operations(self):
+        a = self.build(range(0, 30, 2))
+        b = self.build(range(0, 30, 3))
+        b[6].item = 'six'
+        union = a.union(b)
+        self.check_tree(union, sorted(set(range(0, 30, 2)) |
+                                      set(range(0, 30, 3))))
+        self.assertEqual(union[6].item, 'six')
+        intersection = a.intersection(b)
+        self.check_tree(intersection, [0, 6, 12, 18, 24])
+        self.assertEqual(intersection[6].item, '6')
+        self.check_tree(a.difference(b), [2, 4, 8, 10, 14, 16, 20, 22, 26,
+                                          28])
+        self.check_tree(a.intersection(type(self.tree)()), [])
+        # the operands are left untouched
+        self.check_tree(a, list(range(0, 30, 2)))
+
+    def test_finger_search(self):
+        random.seed(37)
+        keys = list(range(0, 600, 3))
+        random.shuffle(keys)
+        tree = self.build(keys)
+        self.assertEqual(tree.finger_search(300).key, 300)
+        for key in list(range(300, 420)) + list(range(10, -10, -1)):
+            node = tree.finger_search(key)
+            if key % 3 or key < 0:
+                self.assertIsNone(node)
+            else:
+                self.assertEqual(node.key, key)
+        finger = tree.finger_search(99)
+        self.assertEqual(tree.finger_search(105, finger).key, 105)
+        self.assertEqual(tree.finger_search(597, tree.min()).key, 597)
+        tree[1] = 'one'
+        self.assertEqual(tree.finger_search(1).item, 'one')
+        self.assertIsNone(type(self.tree)().finger_search(1))
+
+    def test_insert_many(self):
+        random.seed(47)
+        keys = list(range(0, 1000, 2))
+        random.shuffle(keys)
+        tree = self.build(keys)
+        tree.enable_cache()
+        self.assertEqual(tree[3], None)
+        # a small batch is inserted in place, a big one rebuilds the tree
+        small = [(key, str(key)) for key in range(1, 100, 2)]
+        random.shuffle(small)
+        tree.insert_many(small)
+        expected = sorted(keys + list(range(1, 100, 2)))
+        self.check_tree(tree, expected)
+        self.assertEqual(tree[3].item, '3')
+        big = [(key, str(key)) for key in range(101, 1000, 2)] + [(4, 'x')]
+        tree.insert_many(big)
+        expected = sorted(expected + list(range(101, 1000, 2)) + [4])
+        self.check_tree(tree, expected)
+        # the new item comes after the equal key, as with insert
+        self.assertEqual([node.item for node in tree.range(4, 5)],
+                         ['4', 'x'])
+        tree.insert_many([])
+        self.assertEqual(len(tree), 1001)
+        empty = type(self.tree)()
+        empty.insert_many([(2, 'b'), (1, 'a')])
+        self.check_tree(empty, [1, 2])
+        child = tree.left or tree.right
+        self.assertRaises(ValueError, child.insert_many, [(5000, 'z')])
+        self.assertRaises(ValueError, child.remove_many, [child.key])
+
+    def test_remove_many(self):
+        random.seed(53)
+        keys = list(range(1000))
+        random.shuffle(keys)
+        tree = self.build(keys)
+        tree.enable_cache()
+        self.assertEqual(tree[10].item, '10')
+        removed = keys[:100]
+        tree.remove_many(removed)
+        remaining = sorted(keys[100:])
+        self.assertEqual([node.key for node in tree], remaining)
+        self.assertEqual(len(tree), 900)
+        for key in removed[:10] + remaining[:10]:
+            node = tree[key]
+            self.assertEqual(node is None, key in removed)
+        # a missing key leaves the tree untouched
+        self.assertRaises(KeyError, tree.remove_many, remaining[:5] + [-1])
+        self.assertRaises(KeyError, tree.remove_many, [remaining[0]] * 2)
+        self.assertRaises(KeyError, tree.remove_many, remaining + [-1])
+        self.assertEqual(len(tree), 900)
+        tree.remove_many(remaining[:800])
+        self.check_tree(tree, remaining[800:])
+        tree.remove_many(remaining[800:])
+        self.check_tree(tree, [])
+        # the emptied root keeps no children
+        self.assertIsNone(tree.left)
+        self.assertIsNone(tree.right)
+        tree.insert_many([(5, '5')])
+        self.check_tree(tree, [5])
+
+    # searches served by the lookup cache in test_lookup_cache
+    cache_hits = 40
+
+    def test_lookup_cache(self):
+        random.seed(43)
+        keys = list(range(0, 400, 2))
+        random.shuffle(keys)
+        for policy in ['lru', 'lfu']:
+            tree = self.build(keys)
+            tree.enable_cache(capacity=32, policy=policy)
+            hot = keys[:10] + [1, 3]
+            for _ in range(5):
+                for key in hot:
+                    node = tree[key]
+                    if key % 2:
+                        self.assertIsNone(node)
+                    else:
+                        self.assertEqual(node.key, key)
+            info = tree.cache_info()
+            self.assertEqual(info.hits + info.misses, 60)
+            self.assertTrue(info.hits >= self.cache_hits)
+            self.assertTrue(info.currsize <= 32)
+            # inserts, removes and their rotations leave no stale entry
+            for key in [1, 3] + list(range(401, 601, 2)):
+                tree[key] = str(key)
+            for key in keys[:5] + keys[50:100]:
+                del tree[key]
+            for key in hot + keys:
+                node = tree.search(key)
+                expected = [n for n in tree.iter_in_order() if n.key == key]
+                self.assertIs(node, expected[0] if expected else None)
+            self.assertTrue(tree.cache_info().currsize <= 32)
+        tree = pickle.loads(pickle.dumps(tree))
+        self.assertIsNone(tree.cache_info())
+        self.assertRaises(ValueError, tree.enable_cache, policy='mru')
+        child = tree.left or tree.right
+        self.assertRaises(ValueError, child.enable_cache)
+        tree.enable_cache()
+        tree.disable_cache()
+        self.assertEqual(tree[keys[10]].key, keys[10])
+
 
 class TestRedBlackTree(TestBinarySearchTree):
 
+
     def setUp(self):
         self.tree = RedBlackTree(10, 'b')
         self.tree[15] = 'k'
@@ -112,6 +520,156 @@ class TestRedBlackTree(TestBinarySearchTree):
                 self.assertTrue(self.left is None or self.left.black)
                 self.assertTrue(self.right is None or self.right.black)
 
+    def black_height(self, node):
+        if node is None:
+            return 1
+        if not node.black:
+            self.assertTrue(node.left is None or node.left.black)
+            self.assertTrue(node.right is None or node.right.black)
+        left = self.black_height(node.left)
+        self.assertEqual(left, self.black_height(node.right))
+        return left + (1 if node.black else 0)
+
+    def check_balanced(self, tree):
+        self.assertTrue(tree.black)
+        self.black_height(tree)
+
+    def test_from_sorted_colors(self):
+        for size in [1, 2, 3, 7, 8, 100]:
+            tree = RedBlackTree.from_sorted((key, key) for key in range(size))
+            self.assertTrue(tree.black)
+            self.black_height(tree)
+
+    def test_balance(self):
+        tree = RedBlackTree()
+        for key in range(1000):
+            tree[key] = key
+        self.assertTrue(tree.black)
+        self.black_height(tree)
+        self.assertTrue(tree.get_height() <= 20)
+        self.assertEqual([node.key for node in tree], list(range(1000)))
+
+
+class TestAVLTree(TestBinarySearchTree):
+
+    def setUp(self):
+        self.tree = AVLTree(10, 'b')
+        self.tree[15] = 'k'
+        self.tree[17] = 'm'
+        self.tree[9] = 'l'
+        self.tree[2] = 'j'
+        self.tree[1] = 'o'
+
+    def check_balance(self, node):
+        if node is None:
+            return 0
+        hl = self.check_balance(node.left)
+        hr = self.check_balance(node.right)
+        self.assertTrue(abs(hl - hr) <= 1)
+        self.assertEqual(node.height, max(hl, hr) + 1)
+        return node.height
+
+    def check_balanced(self, tree):
+        self.check_balance(tree)
+
+    def test_balance(self):
+        tree = type(self.tree)()
+        keys = list(range(1000))
+        for key in keys:
+            tree[key] = key
+        self.check_balance(tree)
+        random.seed(3)
+        random.shuffle(keys)
+        for key in keys[:700]:
+            del tree[key]
+        self.check_balance(tree)
+        self.assertEqual([node.key for node in tree], sorted(keys[700:]))
+
+
+class TestTreap(TestAVLTree):
+
+    def setUp(self):
+        random.seed(5)
+        self.tree = Treap(10, 'b')
+        self.tree[15] = 'k'
+        self.tree[17] = 'm'
+        self.tree[9] = 'l'
+        self.tree[2] = 'j'
+        self.tree[1] = 'o'
+
+    def check_balance(self, node):
+        for tree in node:
+            for child in (tree.left, tree.right):
+                if child:
+                    self.assertTrue(child.priority <= tree.priority)
+        self.assertTrue(node.get_height() <= 30)
+
+    def test_from_sorted_priorities(self):
+        tree = Treap.from_sorted((key, key) for key in range(100))
+        self.check_balance(tree)
+
+
+class TestSplayTree(TestBinarySearchTree):
+
+    # every splay empties the lookup cache
+    cache_hits = 0
+
+    def setUp(self):
+        self.tree = SplayTree(10, 'b')
+        self.tree[15] = 'k'
+        self.tree[17] = 'm'
+        self.tree[9] = 'l'
+        self.tree[2] = 'j'
+        self.tree[1] = 'o'
+
+    def test_splay(self):
+        self.assertIs(self.tree.search(2), self.tree)
+        self.assertEqual(self.tree.key, 2)
+        self.assertEqual(self.tree.insert(12, 'x').key, 12)
+        # a missing key splays its neighbour
+        self.assertIsNone(self.tree.search(16))
+        self.assertIn(self.tree.key, (15, 17))
+        self.check_tree(self.tree, [1, 2, 9, 10, 12, 15, 17])
+
+    def test_cache_finger_search_remove(self):
+        tree = SplayTree()
+        for key in (1, 2, 3):
+            tree.insert(key, key)
+        tree.enable_cache()
+        self.assertEqual(tree.finger_search(1).key, 1)
+        # finger_search found a node below the root, the cache must not
+        # send remove to it
+        self.assertEqual(tree.cache_info().currsize, 0)
+        tree.remove(1)
+        self.check_tree(tree, [2, 3])
+        self.assertIs(tree.search(3), tree)
+        self.assertEqual(tree.search(3).key, 3)
+        tree.remove(3)
+        self.check_tree(tree, [2])
+
+    def test_skewed_access(self):
+        random.seed(41)
+        keys = list(range(2000))
+        random.shuffle(keys)
+        tree = self.build(keys)
+        hot = keys[:5]
+        for _ in range(20):
+            for key in hot:
+                self.assertEqual(tree[key].item, str(key))
+        # the hot keys gather at the top
+        for key in hot:
+            depth = 1
+            node = tree
+            while node.key != key:
+                node = node.left if key < node.key else node.right
+                depth += 1
+            self.assertTrue(depth <= 5)
+        for key in keys[:1500]:
+            del tree[key]
+        self.check_tree(tree, sorted(keys[1500:]))
+        self.assertEqual(tree.get_height(),
+                         max(node.depth() for node in tree))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,126 @@
+import sys
+import threading
+import unittest
+from forest.BinaryTree import AVLTree, SplayTree
+from forest.ConcurrentTree import ConcurrentTree
+
+
+class TestConcurrentTree(unittest.TestCase):
+
+    def setUp(self):
+        self.tree = ConcurrentTree()
+        self.tree[10] = 'b'
+        self.tree[15] = 'k'
+        self.tree[17] = 'm'
+        self.tree[9] = 'l'
+        self.tree[2] = 'j'
+        self.tree[1] = 'o'
+
+    def test_search(self):
+        self.assertEqual(self.tree[2].item, 'j')
+        self.assertEqual(self.tree.get(1), 'o')
+        self.assertIsNone(self.tree[219])
+        self.assertEqual(self.tree.get(219, 'x'), 'x')
+        self.assertTrue(15 in self.tree)
+        self.assertFalse(16 in self.tree)
+        self.assertEqual(self.tree.search_many([2, 3]), ['j', None])
+        self.assertEqual(list(self.tree.contains_many([2, 3])),
+                         [True, False])
+
+    def test_remove(self):
+        del self.tree[1]
+        self.assertIsNone(self.tree[1])
+        self.assertEqual(len(self.tree), 5)
+        self.assertRaises(KeyError, self.tree.remove, 1)
+
+    def test_batches(self):
+        self.assertEqual(len(self.tree.snapshot()), 6)
+        self.tree.insert_many([(3, 'c'), (4, 'd')])
+        self.assertEqual(len(self.tree.snapshot()), 8)
+        self.tree.remove_many([3, 10])
+        self.assertEqual([entry.key for entry in self.tree],
+                         [1, 2, 4, 9, 15, 17])
+        self.assertRaises(KeyError, self.tree.remove_many, [4, 5])
+        self.assertEqual(self.tree.get(4), 'd')
+
+    def test_snapshot(self):
+        entries = iter(self.tree)
+        self.tree[5] = 'z'
+        del self.tree[17]
+        self.assertEqual([entry.key for entry in entries],
+                         [1, 2, 9, 10, 15, 17])
+        self.assertEqual([entry.key for entry in self.tree],
+                         [1, 2, 5, 9, 10, 15])
+        self.assertEqual([entry.key for entry in self.tree.range(2, 10)],
+                         [2, 5, 9])
+
+    def test_writing(self):
+        with self.tree.writing() as tree:
+            for key in range(20, 30):
+                tree[key] = key
+        self.assertEqual(len(list(self.tree)), 16)
+        self.assertEqual(self.tree.get(25), 25)
+
+    def test_threads(self):
+        shared = ConcurrentTree(AVLTree())
+        errors = []
+
+        def write(start):
+            for key in range(start, 2000, 4):
+                shared[key] = key
+            for key in range(start, 2000, 8):
+                del shared[key]
+
+        def read():
+            for _ in range(50):
+                keys = [entry.key for entry in shared]
+                if keys != sorted(keys):
+                    errors.append(keys)
+                for key in keys[:20]:
+                    if shared.get(key, key) != key:
+                        errors.append(key)
+
+        threads = [threading.Thread(target=write, args=(start,))
+                   for start in range(4)]
+        threads += [threading.Thread(target=read) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        expected = [key for key in range(2000) if key % 8 >= 4]
+        self.assertEqual([entry.key for entry in shared], expected)
+
+    def test_splay_tree_threads(self):
+        # every lookup splays, readers must not rotate under each other
+        shared = ConcurrentTree(SplayTree.from_sorted(
+            (key, key) for key in range(500)))
+        errors = []
+
+        def read(start):
+            for key in range(start, 500, 3):
+                if shared.get(key) != key or key not in shared:
+                    errors.append(key)
+                if 500 + key in shared:
+                    errors.append(500 + key)
+
+        threads = [threading.Thread(target=read, args=(start,))
+                   for start in range(3) for _ in range(2)]
+        # switch threads often, so the readers interleave
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+        self.assertEqual(errors, [])
+        with shared.writing() as tree:
+            self.assertEqual([node.key for node in tree], list(range(500)))
+            self.assertEqual(len(tree), 500)
+
+
+if __name__ == '__main__':
+    unittest.main()
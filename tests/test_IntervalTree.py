@@ -0,0 +1,77 @@
+import random
+import unittest
+from forest.IntervalTree import IntervalTree
+
+
+class TestIntervalTree(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(31)
+        self.intervals = []
+        for i in range(300):
+            low = random.randrange(1000)
+            self.intervals.append((low, low + random.randrange(50)))
+        self.tree = IntervalTree()
+        for i, interval in enumerate(self.intervals):
+            self.tree.insert(interval, i)
+
+    def check_max_end(self, tree):
+        for node in tree:
+            ends = [node.key[1]] + [child.max_end
+                                    for child in (node.left, node.right)
+                                    if child is not None]
+            self.assertEqual(node.max_end, max(ends))
+
+    def brute_force(self, low, high):
+        return sorted(interval for interval in self.intervals
+                      if interval[0] <= high and low <= interval[1])
+
+    def test_overlap(self):
+        self.check_max_end(self.tree)
+        for low, high in [(0, 10), (500, 520), (-5, -1), (990, 2000),
+                          (300, 300)]:
+            found = [node.key for node in self.tree.overlap(low, high)]
+            self.assertEqual(found, self.brute_force(low, high))
+
+    def test_stab(self):
+        for point in [0, 17, 500, 1048]:
+            found = [node.key for node in self.tree.stab(point)]
+            self.assertEqual(found, self.brute_force(point, point))
+
+    def test_find_overlap(self):
+        for low, high in [(0, 10), (500, 520), (-5, -1), (2000, 3000)]:
+            node = self.tree.find_overlap(low, high)
+            if self.brute_force(low, high):
+                self.assertTrue(node.key[0] <= high and low <= node.key[1])
+            else:
+                self.assertIsNone(node)
+
+    def test_remove(self):
+        random.shuffle(self.intervals)
+        for interval in self.intervals[:200]:
+            self.tree.remove(interval)
+        self.intervals = self.intervals[200:]
+        self.check_max_end(self.tree)
+        found = [node.key for node in self.tree.overlap(200, 600)]
+        self.assertEqual(found, self.brute_force(200, 600))
+
+    def test_bulk_loading(self):
+        tree = IntervalTree.from_items((interval, None)
+                                       for interval in self.intervals)
+        self.check_max_end(tree)
+        self.assertTrue(tree.black)
+        found = [node.key for node in tree.overlap(100, 400)]
+        self.assertEqual(found, self.brute_force(100, 400))
+
+    def test_empty(self):
+        tree = IntervalTree()
+        self.assertEqual(list(tree.overlap(0, 10)), [])
+        self.assertIsNone(tree.find_overlap(0, 10))
+        tree.add(3, 5, 'x')
+        self.assertEqual(tree.max_end, 5)
+        self.assertEqual(tree.find_overlap(5, 9).item, 'x')
+        self.assertRaises(ValueError, tree.add, 5, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
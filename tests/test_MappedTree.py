@@ -0,0 +1,109 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+from forest.BinaryTree import BinaryTree, BinarySearchTree, RedBlackTree
+from forest.NaryTree import NaryTree
+from forest.MappedTree import (dump, load, open_tree, MappedBinaryTree,
+                               MappedBinarySearchTree, MappedNaryTree)
+
+
+class TestMappedTree(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'tree.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_binary_search_tree(self):
+        tree = RedBlackTree()
+        for key in range(100):
+            tree[key] = str(key)
+        dump(tree, self.path)
+        with open_tree(self.path) as mapped:
+            self.assertIsInstance(mapped, MappedBinarySearchTree)
+            self.assertEqual(len(mapped), 100)
+            self.assertEqual(mapped[42].item, '42')
+            self.assertIsNone(mapped[100])
+            self.assertTrue(7 in mapped)
+            self.assertEqual([node.key for node in mapped], list(range(100)))
+            self.assertEqual(mapped.get_height(), tree.get_height())
+            self.assertEqual(mapped.root.black, tree.black)
+            self.assertEqual(mapped[42].parent.key, tree[42].parent.key)
+
+    def test_load(self):
+        tree = RedBlackTree()
+        for key in [5, 3, 8, 1, 4, 9]:
+            tree[key] = key * 2
+        dump(tree, self.path)
+        loaded = load(self.path)
+        self.assertIsInstance(loaded, RedBlackTree)
+        self.assertEqual([(node.key, node.item, node.black) for node in loaded],
+                         [(node.key, node.item, node.black) for node in tree])
+        self.assertEqual(loaded.size, 6)
+        loaded[7] = 14
+        self.assertEqual(loaded[7].item, 14)
+
+    def test_deep_tree(self):
+        tree = None
+        for key in range(4999, -1, -1):
+            tree = BinarySearchTree(key, key, right=tree)
+        dump(tree, self.path)
+        loaded = load(self.path)
+        self.assertEqual(loaded.max().key, 4999)
+        with open_tree(self.path) as mapped:
+            self.assertEqual(mapped[4998].item, 4998)
+
+    def test_binary_tree(self):
+        tree = BinaryTree(1, 'a', left=BinaryTree(2, 'b'),
+                          right=BinaryTree(3, 'c', right=BinaryTree(4, 'd')))
+        dump(tree, self.path)
+        with open_tree(self.path) as mapped:
+            self.assertIsInstance(mapped, MappedBinaryTree)
+            self.assertEqual([node.key for node in mapped], [2, 1, 3, 4])
+            self.assertEqual(mapped.root.right.right.item, 'd')
+            self.assertTrue(mapped.root.left.is_leaf())
+
+    def test_nary_tree(self):
+        tree = NaryTree(key='1')
+        branch1 = tree.add_child(key='1.1')
+        tree.add_child(key='1.2')
+        branch1.add_child(key='1.1.1', item=5)
+        dump(tree, self.path)
+        with open_tree(self.path) as mapped:
+            self.assertIsInstance(mapped, MappedNaryTree)
+            self.assertEqual([node.key for node in mapped.traversal()],
+                             ['1', '1.1', '1.1.1', '1.2'])
+            self.assertEqual(mapped.get_height(), 3)
+            self.assertEqual([c.key for c in mapped.root.children],
+                             ['1.1', '1.2'])
+        loaded = load(self.path)
+        self.assertEqual([node.key for node in loaded.traversal()],
+                         ['1', '1.1', '1.1.1', '1.2'])
+        self.assertEqual(loaded.children[0].children[0].parent.key, '1.1')
+
+    def test_empty_tree(self):
+        dump(BinarySearchTree(), self.path)
+        with open_tree(self.path) as mapped:
+            self.assertEqual(len(mapped), 0)
+            self.assertIsNone(mapped[1])
+        self.assertTrue(load(self.path).is_empty())
+
+    def test_pickle_sends_the_path(self):
+        dump(BinarySearchTree(1, 'a'), self.path)
+        with open_tree(self.path) as mapped:
+            copy = pickle.loads(pickle.dumps(mapped))
+            self.assertEqual(copy[1].item, 'a')
+            copy.close()
+
+    def test_not_a_tree_file(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'hello')
+        self.assertRaises(ValueError, open_tree, self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,15 @@
+import pickle
+import tracemalloc
 import unittest
-from forest.NaryTree import NaryTree
+from forest.NaryTree import NaryTree, CompactNaryTree, CompiledNode
 
 
 class TestNaryTree(unittest.TestCase):
 
+    cls = NaryTree
+
     def setUp(self):
-        self.tree = NaryTree(key='1')
+        self.tree = self.cls(key='1')
         branch1 = self.tree.add_child(key='1.1', item=0)
         branch2 = self.tree.add_child(key='1.2', item=0)
         branch3 = self.tree.add_child(key='1.3', item=0)
@@ -26,12 +30,246 @@ class TestNaryTree(unittest.TestCase):
         for node in self.tree:
             self.assertTrue(node in self.all_items)
 
+    def test_traversal_without_visit(self):
+        keys = [node.key for node in self.tree.traversal()]
+        self.assertEqual(keys, ['1', '1.1', '1.1.1', '1.1.2', '1.2', '1.2.1',
+                                '1.2.2', '1.3', '1.3.1'])
+
+    def test_lazy_orders(self):
+        self.assertEqual(list(self.tree.iter_pre_order()),
+                         self.tree.traversal())
+        keys = [node.key for node in self.tree.iter_post_order()]
+        self.assertEqual(keys, ['1.1.1', '1.1.2', '1.1', '1.2.1', '1.2.2',
+                                '1.2', '1.3.1', '1.3', '1'])
+        self.assertEqual(list(self.tree.iter_level_order()), self.all_items)
+
+    def test_search_level_order(self):
+        leaves = self.tree.search_level_order(lambda node: node.is_leaf())
+        self.assertEqual(list(leaves), self.all_items[4:])
+        leaves = self.tree.search_level_order(lambda node: node.is_leaf(),
+                                              max_depth=2)
+        self.assertEqual(list(leaves), [])
+        self.assertEqual(self.tree.breadth_first_search('1.2.2'),
+                         self.all_items[7])
+        self.assertIsNone(self.tree.breadth_first_search('1.2.2',
+                                                         max_depth=2))
+
+    def test_early_termination(self):
+        nodes = self.tree.iter_pre_order()
+        self.assertEqual(next(nodes), self.tree)
+        self.assertEqual(next(nodes).key, '1.1')
+
+    def test_deep_tree(self):
+        tree = node = self.cls(key=0)
+        for key in range(1, 2000):
+            node = node.add_child(key=key)
+        self.assertEqual(len(list(tree.iter_post_order())), 2000)
+        self.assertEqual(next(tree.iter_post_order()).key, 1999)
+        self.assertEqual(tree.get_height(), 2000)
+        self.assertEqual(node.depth(), 2000)
+
     def test_height(self):
         self.assertEqual(self.tree.get_height(), 3)
 
+    def test_metadata(self):
+        self.assertEqual(len(self.tree), 9)
+        self.assertEqual(len(self.all_items[1]), 3)
+        self.assertEqual(self.all_items[4].depth(), 3)
+        leaf = self.all_items[8].add_child(key='1.3.1.1')
+        self.assertEqual(leaf.depth(), 4)
+        self.assertEqual(self.tree.get_height(), 4)
+        self.assertEqual(self.all_items[1].get_height(), 2)
+        self.assertEqual(len(self.tree), 10)
+
+    def test_children_constructor(self):
+        tree = self.cls(key='root', children=[self.tree])
+        self.assertEqual(len(tree), 10)
+        self.assertEqual(tree.get_height(), 4)
+        self.assertEqual(self.all_items[4].depth(), 4)
+        self.assertEqual(self.tree.parent, tree)
+
     def test_leaf(self):
         self.assertFalse(self.tree.is_leaf())
         self.assertTrue(self.all_items[8].is_leaf())
 
+    def test_pickle(self):
+        branch = pickle.loads(pickle.dumps(self.all_items[1]))
+        self.assertIsNone(branch.parent)
+        self.assertEqual(branch.children[0].parent, branch)
+        self.assertEqual([node.key for node in branch.traversal()],
+                         ['1.1', '1.1.1', '1.1.2'])
+
+    def test_get_child(self):
+        self.assertIs(self.tree.get_child('1.2'), self.all_items[2])
+        self.assertIsNone(self.tree.get_child('1.4'))
+        wide = self.cls(key='root')
+        children = [wide.add_child(key=key % 100) for key in range(200)]
+        # indexed, the first child with a key still wins
+        self.assertIs(wide.get_child(42), children[42])
+        self.assertTrue(wide._child_index is not None)
+        new = wide.add_child(key='new')
+        self.assertIs(wide.get_child('new'), new)
+        self.assertIs(wide.get_child(42), children[42])
+        self.assertEqual(wide.get_child('missing', 0), 0)
+        self.assertRaises(ValueError, wide.add_child, 'new', unique=True)
+        # children replaced by hand are noticed
+        wide.children = wide.children[100:]
+        for child in wide.children:
+            child._set_parent(wide)
+        self.assertIs(wide.get_child(42), children[142])
+
+    def test_remove_child(self):
+        root = self.cls(key='root')
+        children = [root.add_child(key=key % 10) for key in range(20)]
+        self.assertIs(root.get_child(5), children[5])
+        self.assertIs(root.remove_child(children[5]), children[5])
+        self.assertIsNone(children[5].parent)
+        self.assertEqual(children[5].depth(), 1)
+        # the next child with the key takes its place in the index
+        self.assertIs(root.get_child(5), children[15])
+        new = root.add_child('new')
+        self.assertIs(root.get_child('new'), new)
+        self.assertEqual(len(root), 21)
+        self.assertRaises(ValueError, root.remove_child, children[5])
+        grandchild = children[0].add_child('deep')
+        self.assertEqual(root.get_height(), 3)
+        children[0].remove_child(grandchild)
+        self.assertEqual(root.get_height(), 2)
+        self.assertEqual(len(root), 21)
+        # edits of the list itself need invalidate_child_index
+        root.children.remove(children[6])
+        root.add_child('other')
+        root.invalidate_child_index()
+        self.assertIs(root.get_child(6), children[16])
+        self.assertIs(root.get_child('other'), root.children[-1])
+
+    def test_resolve(self):
+        node = self.all_items[7]
+        self.assertIs(self.tree.resolve(['1.2', '1.2.2']), node)
+        self.assertIs(self.tree.resolve('1.2/1.2.2'), node)
+        self.assertIs(self.tree.resolve('/1.2/1.2.2/'), node)
+        self.assertIs(self.tree.resolve(''), self.tree)
+        self.assertRaises(KeyError, self.tree.resolve, '1.2/1.3.1')
+        paths = ['1.1', '1.1/1.1.1', '1.1/1.1.9', '1.1/1.1.2', '1.3/1.3.1',
+                 '1.9/1.9.1', '']
+        self.assertEqual(self.tree.resolve_many(paths),
+                         [self.all_items[1], self.all_items[4], None,
+                          self.all_items[5], self.all_items[8], None,
+                          self.tree])
+
+    def test_add_paths(self):
+        tree = self.cls(key='')
+        nodes = tree.add_paths([('usr/bin/python', 1), ('usr/bin/perl', 2),
+                                ('usr/lib', 3), ('etc/hosts', 4),
+                                ('usr/bin', 5)])
+        self.assertEqual([node.item for node in nodes], [1, 2, 3, 4, 5])
+        self.assertIs(tree.resolve('usr/bin/perl'), nodes[1])
+        self.assertIs(tree.resolve('usr/bin'), nodes[4])
+        self.assertEqual(len(tree.resolve('usr').children), 2)
+        # the metadata is the one add_child would have built
+        for node in tree.iter_pre_order():
+            self.assertEqual(len(node), len(list(node.iter_pre_order())))
+            self.assertEqual(node.get_height(), 1 + max(
+                [child.get_height() for child in node.children] or [0]))
+        self.assertEqual(nodes[0].depth(), 4)
+        # below an existing subtree, its ancestors are updated too
+        tree.resolve('usr/bin').add_paths([(['sh', 'dash'], 6)])
+        self.assertEqual(len(tree), 10)
+        self.assertEqual(tree.get_height(), 5)
+        self.assertEqual(tree.resolve('usr/bin/sh/dash').item, 6)
+
+
+
+class TestCompactNaryTree(TestNaryTree):
+
+    cls = CompactNaryTree
+
+    def test_compact(self):
+        self.assertFalse(hasattr(self.tree, '__dict__'))
+        self.assertIsInstance(self.all_items[1], CompactNaryTree)
+        # leaves share one empty tuple
+        self.assertIs(self.all_items[4].children, self.all_items[5].children)
+
+    def test_memory(self):
+        def allocated(build):
+            tracemalloc.start()
+            tree = build()
+            size = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            return size
+
+        def wide(cls):
+            root = cls(key=0)
+            for key in range(20000):
+                root.add_child(key=key)
+            return root
+        regular = allocated(lambda: wide(NaryTree))
+        compact = allocated(lambda: wide(CompactNaryTree))
+        tree = wide(CompactNaryTree)
+        tree.compile()
+        compiled = allocated(tree.compile)
+        self.assertTrue(compact * 3 < regular * 2)
+        self.assertTrue(compiled * 2 < compact)
+
+
+class TestCompiledNaryTree(unittest.TestCase):
+
+    def setUp(self):
+        self.source = TestNaryTree('setUp')
+        self.source.setUp()
+        self.tree = self.source.tree.compile()
+
+    def test_orders(self):
+        for order in ['pre', 'post', 'level']:
+            name = 'iter_{order}_order'.format(order=order)
+            self.assertEqual([node.key for node in
+                              getattr(self.tree, name)()],
+                             [node.key for node in
+                              getattr(self.source.tree, name)()])
+        self.assertEqual(self.tree.traversal(), list(self.tree))
+
+    def test_nodes(self):
+        root = self.tree.root
+        self.assertIsInstance(root, CompiledNode)
+        self.assertEqual([child.key for child in root.children],
+                         ['1.1', '1.2', '1.3'])
+        self.assertIsNone(root.parent)
+        leaf = root.children[1].children[0]
+        self.assertEqual(leaf.key, '1.2.1')
+        self.assertEqual(leaf.parent.key, '1.2')
+        self.assertEqual(leaf.depth(), 3)
+        self.assertTrue(leaf.is_leaf())
+        self.assertEqual(len(root), 9)
+        self.assertEqual(len(root.children[0]), 3)
+        self.assertEqual(self.tree.get_height(), 3)
+
+    def test_search(self):
+        self.assertEqual(self.tree.breadth_first_search('1.2.2').key,
+                         '1.2.2')
+        self.assertIsNone(self.tree.breadth_first_search('1.2.2',
+                                                         max_depth=2))
+        self.assertIsNone(self.tree.breadth_first_search('nope'))
+
+    def test_to_tree(self):
+        for cls in [NaryTree, CompactNaryTree]:
+            tree = self.tree.to_tree(cls)
+            self.assertIsInstance(tree, cls)
+            self.assertEqual([node.key for node in tree.traversal()],
+                             [node.key for node in self.tree])
+            self.assertEqual(len(tree), 9)
+            self.assertEqual(tree.get_height(), 3)
+            self.assertEqual(tree.children[2].children[0].depth(), 3)
+            self.assertEqual(tree.children[2].parent, tree)
+
+    def test_deep_tree(self):
+        tree = node = CompactNaryTree(key=0)
+        for key in range(1, 2000):
+            node = node.add_child(key=key)
+        compiled = tree.compile()
+        self.assertEqual(compiled.get_height(), 2000)
+        self.assertEqual(next(compiled.iter_post_order()).key, 1999)
+        self.assertEqual(compiled.to_tree().get_height(), 2000)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,77 @@
+import random
+import unittest
+from forest.PersistentTree import PersistentTree
+
+
+class TestPersistentTree(unittest.TestCase):
+
+    def setUp(self):
+        self.tree = PersistentTree()
+        for key, item in [(10, 'b'), (15, 'k'), (17, 'm'), (9, 'l'),
+                          (2, 'j'), (1, 'o')]:
+            self.tree = self.tree.insert(key, item)
+
+    def check_balance(self, node):
+        if node is None:
+            return 0
+        hl = self.check_balance(node.left)
+        hr = self.check_balance(node.right)
+        self.assertTrue(abs(hl - hr) <= 1)
+        self.assertEqual(node.height, max(hl, hr) + 1)
+        return node.height
+
+    def test_search(self):
+        self.assertEqual(self.tree[2].item, 'j')
+        self.assertEqual(self.tree.get(1), 'o')
+        self.assertIsNone(self.tree[219])
+        self.assertTrue(15 in self.tree)
+        self.assertFalse(16 in self.tree)
+
+    def test_versions(self):
+        old = self.tree
+        new = old.insert(5, 'z').remove(17)
+        self.assertEqual([node.key for node in old], [1, 2, 9, 10, 15, 17])
+        self.assertEqual([node.key for node in new], [1, 2, 5, 9, 10, 15])
+        replaced = new.insert(5, 'y')
+        self.assertEqual(new[5].item, 'z')
+        self.assertEqual(replaced[5].item, 'y')
+        self.assertEqual(len(replaced), 6)
+        self.assertRaises(KeyError, old.remove, 5)
+
+    def test_sharing(self):
+        tree = PersistentTree.from_sorted((key, key) for key in range(1024))
+        new = tree.insert(2000, 2000)
+        old_nodes = set(id(node) for node in tree)
+        copied = [node for node in new if id(node) not in old_nodes]
+        # only the path to the new key is copied
+        self.assertTrue(len(copied) <= tree.get_height() + 1)
+
+    def test_balance(self):
+        random.seed(19)
+        tree = PersistentTree()
+        keys = list(range(1000))
+        for key in keys:
+            tree = tree.insert(key, key)
+        self.check_balance(tree.root)
+        random.shuffle(keys)
+        for key in keys[:700]:
+            tree = tree.remove(key)
+        self.check_balance(tree.root)
+        self.assertEqual([node.key for node in tree], sorted(keys[700:]))
+        self.assertEqual(len(tree), 300)
+
+    def test_ordered_queries(self):
+        tree = PersistentTree.from_items((key, str(key))
+                                         for key in range(0, 100, 2))
+        self.assertEqual([node.key for node in tree.range(10, 17)],
+                         [10, 12, 14, 16])
+        self.assertEqual(tree.min().key, 0)
+        self.assertEqual(tree.max().key, 98)
+        self.assertEqual(tree.rank(11), 6)
+        self.assertEqual(tree.select(6).key, 12)
+        self.assertRaises(IndexError, tree.select, 50)
+        self.assertEqual(PersistentTree().get_height(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
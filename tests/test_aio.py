@@ -0,0 +1,104 @@
+import asyncio
+import unittest
+from forest.BinaryTree import AVLTree
+from forest.NaryTree import NaryTree
+
+
+class Backend(object):
+    """
+    Fake store, records how many fetches run at the same time
+    """
+    def __init__(self):
+        self.running = 0
+        self.most = 0
+
+    async def fetch(self, node):
+        self.running += 1
+        self.most = max(self.most, self.running)
+        # later keys answer sooner, so completion order differs
+        await asyncio.sleep(0.001 * (node.key % 5))
+        self.running -= 1
+        return node.key * 10
+
+
+class TestAsyncBinaryTree(unittest.TestCase):
+
+    def setUp(self):
+        self.tree = AVLTree.from_sorted((key, key) for key in range(100))
+
+    def test_async_for(self):
+        async def keys():
+            return [node.key async for node in self.tree]
+        self.assertEqual(asyncio.run(keys()), list(range(100)))
+
+    def test_atraverse(self):
+        backend = Backend()
+        results = asyncio.run(self.tree.atraverse(backend.fetch,
+                                                  concurrency=5))
+        self.assertEqual(results, [key * 10 for key in range(100)])
+        self.assertTrue(1 < backend.most <= 5)
+        results = asyncio.run(self.tree.atraverse(lambda node: node.key,
+                                                  order='pre'))
+        self.assertEqual(results,
+                         [node.key for node in self.tree.pre_order()])
+
+    def test_unordered(self):
+        backend = Backend()
+
+        async def collect():
+            return [node.key async for node, _ in
+                    self.tree.aiter_visit(backend.fetch, concurrency=10,
+                                          ordered=False)]
+        keys = asyncio.run(collect())
+        self.assertEqual(sorted(keys), list(range(100)))
+        self.assertNotEqual(keys, list(range(100)))
+        self.assertTrue(backend.most <= 10)
+
+    def test_early_stop(self):
+        backend = Backend()
+
+        async def first():
+            visits = self.tree.aiter_visit(backend.fetch, concurrency=4)
+            async for node, result in visits:
+                await visits.aclose()
+                return node.key
+        self.assertEqual(asyncio.run(first()), 0)
+
+    def test_errors(self):
+        async def fail(node):
+            raise RuntimeError(node.key)
+        self.assertRaises(RuntimeError, asyncio.run,
+                          self.tree.atraverse(fail))
+        self.assertRaises(ValueError, self.tree.aiter_visit, fail,
+                          order='sideways')
+        self.assertRaises(ValueError, asyncio.run,
+                          self.tree.atraverse(fail, concurrency=0))
+
+
+class TestAsyncNaryTree(unittest.TestCase):
+
+    def setUp(self):
+        self.tree = NaryTree(key=0)
+        nodes = [self.tree]
+        for key in range(1, 40):
+            nodes.append(nodes[(key - 1) // 3].add_child(key=key))
+
+    def test_atraverse(self):
+        backend = Backend()
+        for order in ['pre', 'post', 'level']:
+            expected = [node.key * 10 for node in
+                        getattr(self.tree, 'iter_' + order + '_order')()]
+            results = asyncio.run(self.tree.atraverse(backend.fetch, 3,
+                                                      order))
+            self.assertEqual(results, expected)
+        self.assertTrue(backend.most <= 3)
+
+    def test_async_for(self):
+        async def keys():
+            return [node.key async for node in self.tree]
+        self.assertEqual(asyncio.run(keys()),
+                         [node.key for node in self.tree.traversal()])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import random
+import unittest
+from forest.BinaryTree import BinaryTree, AVLTree
+from forest.NaryTree import NaryTree, CompactNaryTree
+
+
+def climb(node):
+    path = []
+    while node is not None:
+        path.append(node)
+        node = node.parent
+    path.reverse()
+    return path
+
+
+def naive_lca(a, b):
+    lca = None
+    for x, y in zip(climb(a), climb(b)):
+        if x is not y:
+            break
+        lca = x
+    return lca
+
+
+class TestAncestorIndex(unittest.TestCase):
+
+    def random_nary(self, cls, size):
+        random.seed(23)
+        nodes = [cls(key=0)]
+        for key in range(1, size):
+            nodes.append(random.choice(nodes).add_child(key=key))
+        return nodes
+
+    def check(self, root, nodes):
+        index = root.ancestor_index()
+        self.assertEqual(len(index), len(nodes))
+        for _ in range(300):
+            a = random.choice(nodes)
+            b = random.choice(nodes)
+            self.assertIs(index.lowest_common_ancestor(a, b), naive_lca(a, b))
+            self.assertEqual(index.is_ancestor(a, b),
+                             any(node is a for node in climb(b)))
+            self.assertEqual(index.path(b), climb(b))
+            self.assertEqual(index.depth(b), len(climb(b)))
+
+    def test_nary(self):
+        for cls in [NaryTree, CompactNaryTree]:
+            nodes = self.random_nary(cls, 500)
+            self.check(nodes[0], nodes)
+
+    def test_binary(self):
+        tree = AVLTree.from_sorted((key, key) for key in range(300))
+        self.check(tree, list(tree))
+
+    def test_small(self):
+        leaf = BinaryTree(key=1)
+        tree = BinaryTree(key=0, left=leaf)
+        index = tree.ancestor_index()
+        self.assertIs(index.lowest_common_ancestor(leaf, leaf), leaf)
+        self.assertIs(index.lowest_common_ancestor(tree, leaf), tree)
+        self.assertTrue(index.is_ancestor(tree, leaf))
+        self.assertFalse(index.is_ancestor(leaf, tree))
+        self.assertRaises(ValueError, index.depth, BinaryTree(key=1))
+
+    def test_refreshed_after_changes(self):
+        tree = AVLTree()
+        for key in range(50):
+            tree[key] = key
+        index = tree.ancestor_index()
+        self.assertIs(tree.ancestor_index(), index)
+        # a rotation moves nodes without changing the size of the root
+        tree[50] = 50
+        self.assertIsNot(tree.ancestor_index(), index)
+        self.check(tree, list(tree))
+        tree.remove(20)
+        self.check(tree, list(tree))
+
+        nodes = self.random_nary(NaryTree, 50)
+        index = nodes[0].ancestor_index()
+        nodes.append(nodes[30].add_child(key=50))
+        self.assertIsNot(nodes[0].ancestor_index(), index)
+        self.check(nodes[0], nodes)
+
+    def test_subtree(self):
+        nodes = self.random_nary(NaryTree, 100)
+        branch = nodes[0].children[0]
+        index = branch.ancestor_index()
+        self.assertIs(index.path(branch)[0], branch)
+        self.assertIsNot(branch.ancestor_index(), index)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import operator
+import unittest
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from forest.BinaryTree import BinaryTree, BinarySearchTree, AVLTree
+from forest.NaryTree import NaryTree
+
+
+def square_key(node):
+    return node.key * node.key
+
+
+def add(a, b):
+    return a + b
+
+
+class TestParallelBinaryTree(unittest.TestCase):
+
+    def setUp(self):
+        self.tree = AVLTree.from_sorted((key, str(key)) for key in range(500))
+        self.executor = ThreadPoolExecutor(4)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_orders(self):
+        for order in ['pre', 'in', 'post']:
+            expected = [node.key for node in
+                        getattr(self.tree, order + '_order')()]
+            for pieces in [1, 2, 7, 64, 1000]:
+                keys = self.tree.parallel_map(lambda node: node.key,
+                                              executor=self.executor,
+                                              order=order, pieces=pieces)
+                self.assertEqual(keys, expected)
+
+    def test_unbalanced(self):
+        tree = BinaryTree(key=0, left=BinaryTree(key=1,
+                                                 right=BinaryTree(key=2)))
+        keys = tree.parallel_map(lambda node: node.key,
+                                 executor=self.executor, pieces=8)
+        self.assertEqual(keys, [1, 2, 0])
+
+    def test_map_reduce(self):
+        total = self.tree.map_reduce(square_key, add, executor=self.executor,
+                                     pieces=10)
+        self.assertEqual(total, sum(key * key for key in range(500)))
+        # the reduction keeps the traversal order
+        joined = self.tree.map_reduce(lambda node: node.item, add,
+                                      executor=self.executor)
+        self.assertEqual(joined, ''.join(str(key) for key in range(500)))
+
+    def test_empty(self):
+        tree = BinarySearchTree()
+        self.assertEqual(tree.parallel_map(square_key,
+                                           executor=self.executor), [])
+        self.assertEqual(tree.map_reduce(square_key, add, 0,
+                                         executor=self.executor), 0)
+        self.assertRaises(TypeError, tree.map_reduce, square_key, add,
+                          executor=self.executor)
+        self.assertRaises(ValueError, tree.parallel_map, square_key,
+                          executor=self.executor, order='level')
+
+    def test_processes(self):
+        with ProcessPoolExecutor(2) as executor:
+            squares = self.tree.parallel_map(square_key, executor=executor)
+            total = self.tree.map_reduce(square_key, operator.add,
+                                         executor=executor)
+        self.assertEqual(squares, [key * key for key in range(500)])
+        self.assertEqual(total, sum(squares))
+        # the tree sent to the workers is left untouched
+        self.assertEqual(self.tree.parent, None)
+        self.assertEqual(self.tree.left.parent, self.tree)
+
+
+class TestParallelNaryTree(unittest.TestCase):
+
+    def setUp(self):
+        self.tree = NaryTree(key=0)
+        nodes = [self.tree]
+        for key in range(1, 300):
+            nodes.append(nodes[(key - 1) // 3].add_child(key=key))
+
+    def test_orders(self):
+        with ThreadPoolExecutor(4) as executor:
+            for order, nodes in [('pre', self.tree.iter_pre_order()),
+                                 ('post', self.tree.iter_post_order())]:
+                keys = self.tree.parallel_map(lambda node: node.key,
+                                              executor=executor, order=order,
+                                              pieces=16)
+                self.assertEqual(keys, [node.key for node in nodes])
+            self.assertRaises(ValueError, self.tree.parallel_map, square_key,
+                              executor=executor, order='in')
+
+    def test_map_reduce_processes(self):
+        with ProcessPoolExecutor(2) as executor:
+            total = self.tree.map_reduce(square_key, add, executor=executor)
+        self.assertEqual(total, sum(key * key for key in range(300)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import unittest
+from forest.BinaryTree import (BinarySearchTree, RedBlackTree, AVLTree,
+                               Treap, SplayTree)
+from forest.IntervalTree import IntervalTree
+from forest.profiling import (instrument, uninstrument, profiled, TreeStats,
+                              Histogram, degeneracy, is_degenerate)
+
+
+class TestProfiling(unittest.TestCase):
+
+    def test_counters(self):
+        events = []
+        tree = RedBlackTree()
+        with profiled(RedBlackTree, callback=events.append) as stats:
+            for key in range(100):
+                tree[key] = key
+            self.assertEqual(tree.search(50).item, 50)
+            self.assertIsNone(tree.search(500))
+            tree.remove(10)
+            keys = [node.key for node in tree]
+        self.assertEqual(stats.calls['insert'], 100)
+        self.assertEqual(stats.calls['search'], 2)
+        self.assertEqual(stats.calls['remove'], 1)
+        self.assertEqual(stats.calls['iter_in_order'], 1)
+        self.assertTrue(stats.rotations > 0)
+        self.assertTrue(stats.recolorings > 0)
+        self.assertTrue(stats.calls['repair_tree'] >= 100)
+        self.assertTrue(0 < stats.deepest_search <= tree.get_height())
+        self.assertTrue(stats.comparisons > 0)
+        self.assertEqual(len(events), 104)
+        self.assertEqual(events[-1].operation, 'iter_in_order')
+        self.assertEqual(stats.latencies['insert'].count, 100)
+        self.assertIn('insert: 100 calls', stats.report())
+        # the keys in the tree are the real ones
+        self.assertEqual(keys, [key for key in range(100) if key != 10])
+        self.assertTrue(all(type(node.key) is int for node in tree))
+
+    def test_duplicates(self):
+        tree = AVLTree()
+        with profiled(AVLTree):
+            for key in [5, 3, 5, 5, 8, 5]:
+                tree[key] = key
+        self.assertEqual([node.key for node in tree], [3, 5, 5, 5, 5, 8])
+        self.assertTrue(all(type(node.key) is int for node in tree))
+
+    def test_off(self):
+        search = BinarySearchTree.__dict__['search']
+        insert = RedBlackTree.__dict__['insert']
+        stats = instrument(RedBlackTree)
+        self.assertRaises(ValueError, instrument, RedBlackTree)
+        self.assertIs(uninstrument(RedBlackTree), stats)
+        self.assertNotIn('search', RedBlackTree.__dict__)
+        self.assertNotIn('black', RedBlackTree.__dict__)
+        self.assertIs(BinarySearchTree.__dict__['search'], search)
+        self.assertIs(RedBlackTree.__dict__['insert'], insert)
+        tree = RedBlackTree()
+        tree[1] = 1
+        self.assertEqual(stats.calls['insert'], 0)
+
+    def test_missing_key(self):
+        for cls in (RedBlackTree, Treap, SplayTree):
+            tree = cls.from_sorted((key, key) for key in range(10))
+            with profiled(cls):
+                with self.assertRaises(KeyError) as context:
+                    tree.remove(99)
+            # the key the caller gave, not the one that counts
+            self.assertIs(type(context.exception.args[0]), int)
+            self.assertEqual(str(context.exception), '99')
+
+    def test_interval_tree(self):
+        tree = IntervalTree()
+        with profiled(IntervalTree) as stats:
+            for low in range(20):
+                tree.add(low, low + 5, low)
+            self.assertEqual(tree.search((7, 12)).item, 7)
+        self.assertEqual(stats.calls['insert'], 20)
+        self.assertEqual([node.key for node in tree],
+                         [(low, low + 5) for low in range(20)])
+        self.assertTrue(all(type(node.key) is tuple for node in tree))
+        self.assertEqual(len(list(tree.overlap(3, 4))), 5)
+
+    def test_lookup_cache(self):
+        tree = RedBlackTree.from_sorted((key, key) for key in range(50))
+        tree.enable_cache()
+        with profiled(RedBlackTree) as stats:
+            self.assertEqual(tree.search(10).item, 10)
+            self.assertEqual(tree.search(10).item, 10)
+            tree.insert(60, 60)
+            self.assertEqual(tree.search(60).item, 60)
+        self.assertEqual(stats.calls['search'], 3)
+        # the cache keeps the real keys, not the ones that count
+        self.assertTrue(all(type(key) is int for key in tree._cache._data))
+        self.assertEqual(tree.cache_info().hits, 2)
+
+    def test_degenerate(self):
+        chain = BinarySearchTree()
+        balanced = RedBlackTree()
+        for key in range(200):
+            chain[key] = key
+            balanced[key] = key
+        self.assertTrue(is_degenerate(chain))
+        self.assertFalse(is_degenerate(balanced))
+        self.assertEqual(degeneracy(BinarySearchTree()), 1.0)
+        with profiled(BinarySearchTree) as stats:
+            chain.search(199)
+        self.assertEqual(stats.deepest_search, 200)
+
+    def test_histogram(self):
+        histogram = Histogram()
+        for seconds in [1e-6, 2e-6, 3e-6, 1e-3]:
+            histogram.record(seconds)
+        self.assertEqual(histogram.count, 4)
+        self.assertTrue(histogram.percentile(50) <= 4e-6)
+        self.assertTrue(histogram.percentile(100) >= 1e-3)
+        stats = TreeStats()
+        stats.record('search', 1e-6)
+        stats.reset()
+        self.assertEqual(stats.calls['search'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
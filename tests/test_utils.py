@@ -0,0 +1,107 @@
+import threading
+import unittest
+from forest.utils import Queue, Stack, RWLock, LRUCache, LFUCache
+
+
+class TestQueue(unittest.TestCase):
+
+    def test_fifo(self):
+        queue = Queue([1, 2])
+        queue.enqueue(3)
+        self.assertEqual(len(queue), 3)
+        self.assertEqual(queue.access(), 1)
+        self.assertEqual([queue.dequeue() for _ in range(3)], [1, 2, 3])
+        self.assertTrue(queue.is_empty())
+
+
+class TestStack(unittest.TestCase):
+
+    def test_lifo(self):
+        stack = Stack([1, 2])
+        stack.push(3)
+        self.assertEqual(stack.top(), 3)
+        self.assertEqual([stack.pop() for _ in range(3)], [3, 2, 1])
+        self.assertTrue(stack.is_empty())
+
+
+class TestRWLock(unittest.TestCase):
+
+    def test_shared_readers(self):
+        lock = RWLock()
+        inside = threading.Barrier(3)
+
+        def read():
+            with lock.read_locked():
+                # only returns once all three readers hold the lock
+                inside.wait(timeout=5)
+
+        threads = [threading.Thread(target=read) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertFalse(inside.broken)
+
+    def test_exclusive_writer(self):
+        lock = RWLock()
+        counter = [0]
+
+        def write():
+            for _ in range(1000):
+                with lock.write_locked():
+                    value = counter[0]
+                    counter[0] = value + 1
+
+        threads = [threading.Thread(target=write) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(counter[0], 4000)
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_eviction(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        # b was the least recently used
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.get('x', 0), 0)
+        self.assertEqual(tuple(cache.info()), (2, 2, 2, 2))
+        cache.clear()
+        self.assertEqual(cache.info().currsize, 0)
+        self.assertEqual(cache.info().hits, 2)
+        self.assertRaises(ValueError, LRUCache, 0)
+
+
+class TestLFUCache(unittest.TestCase):
+
+    def test_eviction(self):
+        cache = LFUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.get('a')
+        cache.get('b')
+        cache.put('c', 3)
+        # b was used less often than a
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('d', 4)
+        # c is now the least frequently used
+        self.assertIsNone(cache.get('c'))
+        cache.put('a', 10)
+        self.assertEqual(cache.get('a'), 10)
+        self.assertEqual(len(cache), 2)
+        cache.clear()
+        cache.put('e', 5)
+        self.assertEqual(cache.get('e'), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()